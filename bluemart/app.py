@@ -9,6 +9,13 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 import config
+from scripts import export, processed_io
+from scripts.customers import UNKNOWN_SEGMENT, WALK_IN_SEGMENT
+from scripts.daily import DailySeries
+from scripts.filters import FilterIndex
+from scripts.result_cache import ResultCache, normalize_filters
+from scripts.rollups import LOYALTY_ROLLUP, QueryRouter, count_orders, load_rollups
+from scripts.sketches import SKU_CELL_COLUMNS, TOP_N_TOLERANCE, top_items
 
 # -------------------------------
 # 1️⃣ Streamlit Page Config & Theme
@@ -49,41 +56,23 @@ st.markdown(
 # -------------------------------
 # 2️⃣ Load Dataset with Memory Optimization
 # -------------------------------
+# Metrics are held as float32 to reduce memory footprint
+METRIC_DTYPES = {
+    'revenue': 'float32',
+    'profit': 'float32',
+    'quantity': 'float32'
+}
+
 @st.cache_data
 def load_data():
     """
     Load dashboard data with optimized memory usage.
-    Uses efficient dtypes and chunked processing for large datasets.
+    process_data writes typed columnar files, so dimensions arrive
+    dictionary-encoded and only the metrics need a cast.
     """
     try:
-        # Define optimized data types to reduce memory footprint
-        dtype_spec = {
-            'month': 'category',
-            'year': 'int16',
-            'store_id': 'category',
-            'store_name': 'category',
-            'category': 'category',
-            'channel': 'category',
-            'sku_id': 'category',
-            'sku_name': 'category',
-            'revenue': 'float32',
-            'profit': 'float32',
-            'quantity': 'float32'
-        }
-        
-        # Load data in chunks to avoid memory spike
-        chunks = []
-        chunk_size = 500000  # Process 500k rows at a time
-        
-        for chunk in pd.read_csv(
-            config.FILE_DASHBOARD_DATA,
-            dtype=dtype_spec,
-            chunksize=chunk_size
-        ):
-            chunks.append(chunk)
-        
-        # Concatenate all chunks
-        df = pd.concat(chunks, ignore_index=True)
+        df = processed_io.read_table(processed_io.DASHBOARD_TABLE, fallback=config.FILE_DASHBOARD_DATA)
+        df = df.astype(METRIC_DTYPES)
         
         # Log memory usage for monitoring
         memory_mb = df.memory_usage(deep=True).sum() / 1024 / 1024
@@ -98,51 +87,107 @@ def load_data():
         st.info("💡 Try reducing the dataset size or use data aggregation in process_data.py")
         return None
 
+@st.cache_data
+def load_dashboard_rollups():
+    """Pre-aggregated views written by process_data (empty if it has not produced them yet)."""
+    return {name: frame.astype(METRIC_DTYPES) for name, frame in load_rollups().items()}
+
+@st.cache_data
+def load_order_counts():
+    """Order counts by month/store/channel/category bitmask, or None for older processed data."""
+    entry = processed_io.table_entry(processed_io.ORDER_COUNTS_TABLE)
+    if entry is None:
+        return None, None
+    return processed_io.read_table(processed_io.ORDER_COUNTS_TABLE), entry['category_bits']
+
+@st.cache_data
+def load_customer_aggregates():
+    """Per-customer RFM table from process_data, or None when it has not been built."""
+    try:
+        return processed_io.read_table(processed_io.CUSTOMERS_TABLE)
+    except FileNotFoundError:
+        return None
+
+@st.cache_data
+def load_sku_sketch():
+    """Heavy-hitter SKU sketch and its per-cell capacity, or (None, None) for older processed data."""
+    entry = processed_io.table_entry(processed_io.SKU_SKETCH_TABLE)
+    if entry is None:
+        return None, None
+    return processed_io.read_table(processed_io.SKU_SKETCH_TABLE), entry['capacity']
+
+@st.cache_resource
+def load_daily_series():
+    """Day-sorted daily aggregate (shared, read-only), or None for older processed data."""
+    try:
+        return DailySeries(processed_io.read_table(processed_io.DAILY_TABLE).astype(METRIC_DTYPES))
+    except FileNotFoundError:
+        return None
+
+# Sidebar filter columns, answered from per-value row bitmaps instead of a query string
+FILTER_COLUMNS = ['store_id', 'category', 'channel', 'month']
+
+@st.cache_resource
+def load_filter_index():
+    """Row bitmaps for the sidebar filters over the dashboard data (shared, read-only)."""
+    data = load_data()
+    return FilterIndex(data, FILTER_COLUMNS) if data is not None else None
+
+@st.cache_resource
+def load_result_cache(built_at):
+    """Widget results shared by every session; a rebuilt dataset (new `built_at`) gets a fresh cache."""
+    return ResultCache(config.RESULT_CACHE_MB * 1024 * 1024)
+
 df = load_data()
 
 if df is None:
     st.error("❌ Data file not found. Please run `python scripts/generate_data.py` and `python scripts/process_data.py` first.")
     st.stop()
 
+# Each widget reads the smallest table that has its columns and the active filter columns
+dashboard_rollups = load_dashboard_rollups()
+filter_index = load_filter_index()
+router = QueryRouter(df, dashboard_rollups, base_index=filter_index)
+manifest = processed_io.load_manifest()
+result_cache = load_result_cache(manifest['built_at'] if manifest else None)
+
 st.sidebar.success(f"Dataset loaded: {df.shape[0]:,} rows")
 
 # -------------------------------
 # 3️⃣ Sidebar Filters
 # -------------------------------
 st.sidebar.header("Filters")
-store_filter = st.sidebar.multiselect("Select Store(s)", options=df['store_id'].unique(), default=df['store_id'].unique())
-category_filter = st.sidebar.multiselect("Select Category(ies)", options=df['category'].unique(), default=df['category'].unique())
-channel_filter = st.sidebar.multiselect("Select Channel(s)", options=df['channel'].unique(), default=df['channel'].unique())
-month_filter = st.sidebar.multiselect("Select Month(s)", options=sorted(df['month'].unique()), default=sorted(df['month'].unique()))
-
-# Apply filters using query for better memory efficiency
-# Build query string dynamically based on selected filters
-filter_conditions = []
-
-if len(store_filter) > 0 and len(store_filter) < len(df['store_id'].unique()):
-    store_list = [f"'{s}'" for s in store_filter]
-    filter_conditions.append(f"store_id in [{', '.join(store_list)}]")
-
-if len(category_filter) > 0 and len(category_filter) < len(df['category'].unique()):
-    cat_list = [f"'{c}'" for c in category_filter]
-    filter_conditions.append(f"category in [{', '.join(cat_list)}]")
-
-if len(channel_filter) > 0 and len(channel_filter) < len(df['channel'].unique()):
-    chan_list = [f"'{ch}'" for ch in channel_filter]
-    filter_conditions.append(f"channel in [{', '.join(chan_list)}]")
-
-if len(month_filter) > 0 and len(month_filter) < len(df['month'].unique()):
-    month_list = [f"'{m}'" for m in month_filter]
-    filter_conditions.append(f"month in [{', '.join(month_list)}]")
-
-# Apply query if any filters are active, otherwise use full dataset
-if filter_conditions:
-    query_str = ' and '.join(filter_conditions)
-    df_filtered = df.query(query_str)
-else:
-    df_filtered = df
-
-if df_filtered.shape[0] == 0:
+store_filter = st.sidebar.multiselect("Select Store(s)", options=filter_index.values('store_id'), default=filter_index.values('store_id'))
+category_filter = st.sidebar.multiselect("Select Category(ies)", options=filter_index.values('category'), default=filter_index.values('category'))
+channel_filter = st.sidebar.multiselect("Select Channel(s)", options=filter_index.values('channel'), default=filter_index.values('channel'))
+month_filter = st.sidebar.multiselect("Select Month(s)", options=filter_index.values('month'), default=filter_index.values('month'))
+
+# Date range for the daily views; answered by slicing the day-sorted daily table
+daily_series = load_daily_series()
+date_start = date_end = None
+if daily_series is not None and len(daily_series):
+    first_date, last_date = daily_series.date_range()
+    date_range = st.sidebar.date_input("Date Range (daily trends)", value=(first_date, last_date),
+                                       min_value=first_date, max_value=last_date)
+    # While a range is being picked the widget returns only its start
+    if not isinstance(date_range, (list, tuple)):
+        date_range = (date_range,)
+    date_start = date_range[0] if len(date_range) > 0 else first_date
+    date_end = date_range[1] if len(date_range) > 1 else last_date
+
+# A column filters only when some, but not all, of its values are selected
+selections = {'store_id': store_filter, 'category': category_filter, 'channel': channel_filter, 'month': month_filter}
+active_filters = {
+    col: values for col, values in selections.items()
+    if 0 < len(values) < len(filter_index.values(col))
+}
+
+# Combine the selected values' row bitmaps into row positions (None = every row).
+# The filtered frame itself is only gathered where it is needed (export, older data).
+filtered_rows = filter_index.select(active_filters) if active_filters else None
+filtered_count = len(df) if filtered_rows is None else len(filtered_rows)
+
+if filtered_count == 0:
     st.warning("No data matches the selected filters. Try widening filters or date range.")
     st.stop()
 
@@ -172,12 +217,7 @@ except FileNotFoundError:
 # Determine metrics source
 # If filters are active (subset of data), calculate from filtered DF
 # If NO filters are active (full dataset view), use pre-calculated globals for speed/accuracy
-is_filtered = (
-    len(store_filter) < len(df['store_id'].unique()) or
-    len(category_filter) < len(df['category'].unique()) or
-    len(channel_filter) < len(df['channel'].unique()) or
-    len(month_filter) < len(df['month'].unique())
-)
+is_filtered = any(len(values) < len(filter_index.values(col)) for col, values in selections.items())
 
 if not is_filtered and summary_metrics:
     total_revenue = summary_metrics['total_revenue']
@@ -186,12 +226,28 @@ if not is_filtered and summary_metrics:
     avg_revenue = summary_metrics['avg_revenue_per_order']
     avg_profit = summary_metrics['avg_profit_per_order']
 else:
-    total_revenue = df_filtered['revenue'].sum()
-    total_profit = df_filtered['profit'].sum()
-    total_quantity = df_filtered['quantity'].sum()
-    # Avg per order is tricky with aggregated data, approximation:
-    avg_revenue = df_filtered['revenue'].mean() 
-    avg_profit = df_filtered['profit'].mean()
+    def filtered_totals():
+        totals = router.query([], active_filters)
+        result = {metric: totals[metric].sum() for metric in ('revenue', 'profit', 'quantity')}
+        # Exact order count for the filters; a category filter counts orders with
+        # at least one line in the selected categories
+        order_counts, category_bits = load_order_counts()
+        result['orders'] = count_orders(order_counts, category_bits, active_filters) if order_counts is not None else None
+        return result
+
+    totals = result_cache.get_or_compute('totals', active_filters, filtered_totals)
+    total_revenue = totals['revenue']
+    total_profit = totals['profit']
+    total_quantity = totals['quantity']
+    if totals['orders'] is not None:
+        total_orders = totals['orders']
+        avg_revenue = total_revenue / total_orders if total_orders else 0
+        avg_profit = total_profit / total_orders if total_orders else 0
+    else:
+        # Older processed data has no order counts: approximate per aggregate row
+        df_filtered = df if filtered_rows is None else df.take(filtered_rows)
+        avg_revenue = df_filtered['revenue'].mean()
+        avg_profit = df_filtered['profit'].mean()
 
 col1, col2, col3, col4, col5 = st.columns(5, gap="large")
 col1.markdown(f'<div class="card"><div class="small-muted">Total Revenue</div><div class="kpi-value">AED {human_format(total_revenue)}</div></div>', unsafe_allow_html=True)
@@ -205,13 +261,24 @@ st.markdown("---")
 # -------------------------------
 # 5️⃣ Top 10 SKUs by Revenue
 # -------------------------------
-top_skus = (
-    df_filtered.groupby(['sku_id', 'sku_name'])
-    .agg(revenue=('revenue', 'sum'))
-    .sort_values('revenue', ascending=False)
-    .head(10)
-    .reset_index()
-)
+# Answered from the heavy-hitter sketch when its top 10 is guaranteed and
+# within tolerance; the sketch has no channel, so a channel filter goes exact
+def compute_top_skus():
+    sku_sketch, sketch_capacity = load_sku_sketch()
+    if sku_sketch is not None and 'channel' not in active_filters:
+        sketch_top, guaranteed = top_items(sku_sketch, sketch_capacity, 10, SKU_CELL_COLUMNS, 'sku_id', filters=active_filters)
+        if guaranteed and (sketch_top['error'] <= TOP_N_TOLERANCE * sketch_top['revenue']).all():
+            sku_names = sku_sketch[['sku_id', 'sku_name']].drop_duplicates('sku_id')
+            return sketch_top.merge(sku_names, on='sku_id', how='left')[['sku_id', 'sku_name', 'revenue']]
+    return (
+        router.query(['sku_id', 'sku_name'], active_filters).groupby(['sku_id', 'sku_name'], observed=True)
+        .agg(revenue=('revenue', 'sum'))
+        .sort_values('revenue', ascending=False)
+        .head(10)
+        .reset_index()
+    )
+
+top_skus = result_cache.get_or_compute('top_skus', active_filters, compute_top_skus)
 top_skus['revenue_formatted'] = top_skus['revenue'].map("AED {:,.2f}".format)
 
 st.subheader("🏆 Top 10 SKUs by Revenue")
@@ -220,13 +287,13 @@ st.dataframe(top_skus[['sku_id', 'sku_name', 'revenue_formatted']], use_containe
 # -------------------------------
 # 6️⃣ Top 10 Stores by Revenue
 # -------------------------------
-top_stores = (
-    df_filtered.groupby(['store_id', 'store_name'])
+# Revenue and profit per store, shared with the store performance section below
+store_totals = result_cache.get_or_compute('store_totals', active_filters, lambda: (
+    router.query(['store_id', 'store_name'], active_filters).groupby(['store_id', 'store_name'], observed=True)
     .agg(revenue=('revenue', 'sum'), profit=('profit', 'sum'))
-    .sort_values('revenue', ascending=False)
-    .head(10)
     .reset_index()
-)
+))
+top_stores = store_totals.sort_values('revenue', ascending=False).head(10).reset_index(drop=True)
 top_stores['revenue'] = top_stores['revenue'].map("AED {:,.2f}".format)
 top_stores['profit'] = top_stores['profit'].map("AED {:,.2f}".format)
 
@@ -236,7 +303,13 @@ st.dataframe(top_stores, use_container_width=True)
 # -------------------------------
 # 7️⃣ Revenue by Category (Horizontal Bar)
 # -------------------------------
-rev_category = df_filtered.groupby('category').agg(revenue=('revenue','sum')).reset_index().sort_values('revenue', ascending=True)
+# Revenue and profit per category, shared with the margin chart below
+category_totals = result_cache.get_or_compute('category_totals', active_filters, lambda: (
+    router.query(['category'], active_filters).groupby('category', observed=True)
+    .agg(revenue=('revenue', 'sum'), profit=('profit', 'sum'))
+    .reset_index()
+))
+rev_category = category_totals[['category', 'revenue']].sort_values('revenue', ascending=True)
 fig_category = px.bar(
     rev_category, y='category', x='revenue', orientation='h',
     text='revenue', labels={'revenue':'Revenue (AED)', 'category':'Category'},
@@ -253,7 +326,9 @@ st.subheader("📱 Channel Performance Analysis")
 col_ch1, col_ch2 = st.columns(2)
 
 with col_ch1:
-    rev_channel = df_filtered.groupby('channel').agg(revenue=('revenue','sum')).reset_index()
+    rev_channel = result_cache.get_or_compute('channel_revenue', active_filters, lambda: (
+        router.query(['channel'], active_filters).groupby('channel', observed=True).agg(revenue=('revenue','sum')).reset_index()
+    ))
     fig_channel = px.pie(rev_channel, names='channel', values='revenue', title="Revenue Distribution by Channel",
                          color_discrete_sequence=px.colors.sequential.Teal, hole=0.4)
     fig_channel.update_traces(textposition='inside', textinfo='percent+label')
@@ -273,7 +348,7 @@ with col_ch2:
 # 9️⃣ Gross Margin by Category
 # -------------------------------
 st.subheader("💰 Profitability Analysis - Margin by Category")
-margin_category = df_filtered.groupby('category').agg(revenue=('revenue','sum'), profit=('profit','sum')).reset_index()
+margin_category = category_totals.copy()
 margin_category['margin_pct'] = (margin_category['profit'] / margin_category['revenue'] * 100).round(2)
 margin_category = margin_category.sort_values('margin_pct', ascending=True)
 
@@ -319,10 +394,11 @@ st.markdown("""
 # 🔟 Monthly Revenue & Profit Trend with Promotions
 # -------------------------------
 st.subheader("📈 Monthly Revenue & Profit Trends")
-monthly_trend = df_filtered.groupby('month').agg(revenue=('revenue','sum'), profit=('profit','sum')).reset_index()
-# Sort months correctly
-month_order = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October', 'November', 'December']
-monthly_trend['month'] = pd.Categorical(monthly_trend['month'], categories=month_order, ordered=True)
+monthly_trend = result_cache.get_or_compute('monthly_trend', active_filters, lambda: (
+    router.query(['month'], active_filters).groupby('month', observed=True).agg(revenue=('revenue','sum'), profit=('profit','sum')).reset_index()
+))
+# Sort months in calendar order (CSV fallback data arrives in alphabetical order)
+monthly_trend['month'] = pd.Categorical(monthly_trend['month'], categories=processed_io.MONTH_NAMES, ordered=True)
 monthly_trend = monthly_trend.sort_values('month')
 
 fig_monthly = go.Figure()
@@ -378,6 +454,51 @@ fig_monthly.update_layout(
 )
 st.plotly_chart(fig_monthly, use_container_width=True)
 
+# -------------------------------
+# 📅 Daily Trends (date range)
+# -------------------------------
+if daily_series is not None and date_start is not None:
+    st.subheader("📅 Daily Revenue & Profit Trends")
+    # The daily table has no month column: the date range replaces the month filter here
+    daily_filters = {col: values for col, values in active_filters.items() if col != 'month'}
+    daily_totals = result_cache.get_or_compute('daily_totals', daily_filters,
+                                               lambda: daily_series.series(date_start, date_end, daily_filters),
+                                               extra=(date_start, date_end))
+
+    if len(daily_totals) == 0:
+        st.info("No sales in the selected date range.")
+    else:
+        fig_daily = go.Figure()
+        fig_daily.add_trace(go.Scatter(x=daily_totals.index, y=daily_totals['revenue'], name='Revenue',
+                                       mode='lines', line=dict(color=COLOR_PRIMARY, width=1)))
+        fig_daily.add_trace(go.Scatter(x=daily_totals.index, y=daily_totals['revenue'].rolling(7, min_periods=1).mean(),
+                                       name='Revenue (7-day avg)', mode='lines', line=dict(color=COLOR_SOFT, width=3)))
+        fig_daily.add_trace(go.Scatter(x=daily_totals.index, y=daily_totals['profit'], name='Profit',
+                                       mode='lines', line=dict(color=COLOR_ACCENT, width=1)))
+        fig_daily.update_layout(
+            title=f'Daily Revenue & Profit ({date_start:%d %b %Y} – {date_end:%d %b %Y})',
+            xaxis_title='Date',
+            yaxis_title='Amount (AED)',
+            yaxis_tickprefix="AED ",
+            yaxis_tickformat=",",
+            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1),
+            plot_bgcolor=COLOR_BG,
+            hovermode='x unified',
+            height=400
+        )
+        st.plotly_chart(fig_daily, use_container_width=True)
+
+        # Week over week: the last 7 days of the range against the 7 days before
+        if len(daily_totals) >= 14:
+            this_week = daily_totals.iloc[-7:].sum()
+            last_week = daily_totals.iloc[-14:-7].sum()
+            col_wk1, col_wk2 = st.columns(2)
+            for col, metric in ((col_wk1, 'revenue'), (col_wk2, 'profit')):
+                change = (this_week[metric] / last_week[metric] - 1) * 100 if last_week[metric] else 0
+                col.metric(f"{metric.title()} – last 7 days vs prior 7", f"AED {human_format(this_week[metric])}", f"{change:+.1f}%")
+        if 'month' in active_filters:
+            st.caption("The month filter does not apply here; use the date range instead.")
+
 # -------------------------------
 # 1️⃣1️⃣ Store Performance Analysis
 # -------------------------------
@@ -388,10 +509,7 @@ try:
     stores_df = pd.read_csv(config.FILE_STORES)
     
     # Merge with performance data
-    store_perf = df_filtered.groupby(['store_id', 'store_name']).agg(
-        revenue=('revenue', 'sum'),
-        profit=('profit', 'sum')
-    ).reset_index()
+    store_perf = store_totals.copy()
     
     # Convert store_id to same type for successful merge
     # Dashboard data has store_id as category/float, stores file has it as int
@@ -454,13 +572,7 @@ try:
     
 except FileNotFoundError:
     st.warning("Store master data not found. Showing basic store performance.")
-    top_stores = (
-        df_filtered.groupby(['store_id', 'store_name'])
-        .agg(revenue=('revenue', 'sum'), profit=('profit', 'sum'))
-        .sort_values('revenue', ascending=False)
-        .head(10)
-        .reset_index()
-    )
+    top_stores = store_totals.sort_values('revenue', ascending=False).head(10).reset_index(drop=True)
     top_stores['revenue'] = top_stores['revenue'].map("AED {:,.2f}".format)
     top_stores['profit'] = top_stores['profit'].map("AED {:,.2f}".format)
     st.dataframe(top_stores, use_container_width=True)
@@ -515,6 +627,51 @@ try:
         - 🥉 **Silver**: Base 60%, engagement focus
         """)
         
+    # Revenue by tier comes from the loyalty rollup, which has month and channel
+    # but no store or category, so only those two filters apply to it
+    if LOYALTY_ROLLUP in dashboard_rollups:
+        col_cust3, col_cust4 = st.columns(2)
+        tier_filters = {col: values for col, values in active_filters.items() if col in ('month', 'channel')}
+        tier_sales = result_cache.get_or_compute('tier_sales', tier_filters, lambda: (
+            router.query(['loyalty_segment'], tier_filters).groupby('loyalty_segment', observed=True)
+            .agg(revenue=('revenue', 'sum'), orders=('orders', 'sum'))
+            .reset_index()
+            .sort_values('revenue', ascending=False)
+        ))
+
+        with col_cust3:
+            fig_tier_revenue = px.bar(
+                tier_sales, x='loyalty_segment', y='revenue',
+                title='Revenue by Loyalty Tier',
+                color='loyalty_segment',
+                color_discrete_map={**tier_colors, WALK_IN_SEGMENT: COLOR_SOFT, UNKNOWN_SEGMENT: COLOR_ACCENT},
+                labels={'loyalty_segment': 'Loyalty Tier', 'revenue': 'Revenue (AED)'}
+            )
+            fig_tier_revenue.update_layout(showlegend=False)
+            st.plotly_chart(fig_tier_revenue, use_container_width=True)
+            if set(active_filters) - set(tier_filters):
+                st.caption("Store and category filters do not apply to the loyalty tier view.")
+
+        with col_cust4:
+            # Recency / frequency / monetary profile of each tier's active customers
+            customer_agg = load_customer_aggregates()
+            if customer_agg is not None:
+                rfm_profile = (
+                    customer_agg.groupby('loyalty_segment', observed=True)
+                    .agg(customers=('customer_id', 'size'), recency=('recency_days', 'mean'),
+                         frequency=('frequency', 'mean'), monetary=('monetary', 'mean'))
+                    .reset_index()
+                )
+                rfm_profile['recency'] = rfm_profile['recency'].map("{:,.0f} days".format)
+                rfm_profile['frequency'] = rfm_profile['frequency'].map("{:,.1f}".format)
+                rfm_profile['monetary'] = rfm_profile['monetary'].map("AED {:,.0f}".format)
+                rfm_profile.columns = ['Loyalty Tier', 'Active Customers', 'Avg Recency', 'Avg Orders', 'Avg Spend']
+                st.markdown("#### RFM Profile by Tier (all months)")
+                st.dataframe(rfm_profile, use_container_width=True, hide_index=True)
+            walk_in = tier_sales[tier_sales['loyalty_segment'] == WALK_IN_SEGMENT]
+            if len(walk_in) and tier_sales['revenue'].sum() > 0:
+                st.metric("Walk-in Share of Revenue", f"{walk_in['revenue'].iloc[0] / tier_sales['revenue'].sum() * 100:.1f}%")
+
 except FileNotFoundError:
     st.info("💡 Customer loyalty data not available. This would show Platinum/Gold/Silver tier distribution.")
 
@@ -523,8 +680,30 @@ except FileNotFoundError:
 # -------------------------------
 st.markdown("---")
 with st.expander("📥 Export Filtered Dataset"):
-    st.download_button("Download CSV", data=df_filtered.to_csv(index=False).encode('utf-8'),
-                       file_name="bluemart_filtered_data.csv", mime="text/csv")
+    # Nothing is serialized until an export is requested; it is then written to
+    # memory in chunks, so the filtered frame is never gathered as a whole
+    export_format = st.radio("Format", export.available_formats(), horizontal=True,
+                             format_func=lambda fmt: export.EXPORT_FORMATS[fmt]['label'])
+    export_key = (normalize_filters(active_filters), export_format, manifest['built_at'] if manifest else None)
+    prepared = st.session_state.get('export')
+    if st.button(f"Prepare export ({filtered_count:,} rows)"):
+        # Replaces the previous export, which is freed with the session
+        prepared = {'key': export_key, 'data': export.export_bytes(df, filtered_rows, export_format)}
+        st.session_state['export'] = prepared
+    if prepared is not None and prepared['key'] == export_key:
+        st.download_button(f"Download {export.EXPORT_FORMATS[export_format]['label']}", data=prepared['data'],
+                           file_name=f"bluemart_filtered_data.{export_format}",
+                           mime=export.EXPORT_FORMATS[export_format]['mime'])
+    elif prepared is not None:
+        st.caption("The filters or format changed since the last export; prepare it again.")
+
+# Shared widget result cache (all sessions)
+cache_stats = result_cache.stats()
+st.sidebar.caption(
+    f"Result cache: {cache_stats['hits']:,} hits / {cache_stats['misses']:,} misses "
+    f"({cache_stats['hit_rate']:.0%}), {cache_stats['entries']} entries, "
+    f"{cache_stats['bytes'] / 1024 / 1024:.1f} of {cache_stats['max_bytes'] / 1024 / 1024:.0f} MB"
+)
 
 st.markdown("""
 <div style='text-align: center; color: #6b7280; font-size: 12px; margin-top: 20px;'>
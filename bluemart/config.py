@@ -5,7 +5,7 @@ from pathlib import Path
 BASE_DIR = Path(__file__).parent.absolute()
 
 # Data directories
-DATA_DIR = BASE_DIR / "data"
+DATA_DIR = Path(os.environ.get("BLUEMART_DATA_DIR", BASE_DIR / "data"))  # Override to run against another dataset (e.g. benchmarks)
 RAW_DATA_DIR = DATA_DIR / "raw"
 PROCESSED_DATA_DIR = DATA_DIR / "processed"
 
@@ -20,7 +20,20 @@ FILE_SALES = RAW_DATA_DIR / "bm_sales.csv"
 FILE_PROMOTIONS = RAW_DATA_DIR / "bm_promotions.csv"
 FILE_CUSTOMERS = RAW_DATA_DIR / "bm_customers.csv"
 FILE_INVENTORY = RAW_DATA_DIR / "bm_inventory.csv"
+SALES_PARQUET_DIR = RAW_DATA_DIR / "bm_sales"  # Month-partitioned Parquet sales (optional)
+SALES_COLUMN_STORE_DIR = RAW_DATA_DIR / "bm_sales_columns"  # Memory-mapped binary columns (optional)
 
 # File paths - Processed
-FILE_DASHBOARD_DATA = PROCESSED_DATA_DIR / "sales_dashboard_data.csv"
+FILE_DASHBOARD_DATA = PROCESSED_DATA_DIR / "sales_dashboard_data.csv"  # CSV fallback without pyarrow
+FILE_RUN_HISTORY = PROCESSED_DATA_DIR / "run_reports.jsonl"  # One JSON run report per line
+FILE_PROCESSED_MANIFEST = PROCESSED_DATA_DIR / "manifest.json"  # Schema, row counts and build time of processed tables
 FILE_SUMMARY_METRICS = PROCESSED_DATA_DIR / "summary_metrics.json"
+ROLLUP_DIR = PROCESSED_DATA_DIR / "rollups"  # Coarser pre-aggregated views for the dashboard
+PIPELINE_STATE_DIR = PROCESSED_DATA_DIR / "state"  # Watermark + saved aggregate for incremental runs
+
+# Dashboard
+RESULT_CACHE_MB = int(os.environ.get("BLUEMART_RESULT_CACHE_MB", "256"))  # Memory budget of the shared widget result cache
+
+# Benchmarks
+BENCHMARK_DIR = BASE_DIR / "benchmarks"
+FILE_BENCHMARK_BASELINE = BENCHMARK_DIR / "baseline.json"
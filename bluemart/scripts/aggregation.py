@@ -0,0 +1,150 @@
+"""
+BlueMart Dense-Key Aggregation
+Incremental group-by for small integer dimensions.
+
+Each row's dimension codes are packed into one int64 key (mixed radix), the
+chunk is reduced with np.unique + np.bincount, and the reduced sums are
+accumulated in place into a sorted key array. Keys not seen before go to a
+small sorted delta that is folded into the main array once it grows past a
+fraction of it, so memory stays O(distinct keys) and already-reduced data is
+never grouped again.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Fold the delta into the main arrays once it holds this share of the keys
+DELTA_FRACTION = 0.125
+MIN_DELTA_KEYS = 65536
+
+
+def _accumulate_hits(keys, sums, new_keys, new_sums):
+    """Add rows whose key already exists in `keys` (sorted) and return the mask of misses."""
+    if len(keys) == 0:
+        return np.ones(len(new_keys), dtype=bool)
+    pos = np.searchsorted(keys, new_keys)
+    hit = pos < len(keys)
+    hit[hit] = keys[pos[hit]] == new_keys[hit]
+    # new_keys are unique, so each position receives at most one update
+    sums[pos[hit]] += new_sums[hit]
+    return ~hit
+
+
+def _insert_sorted(keys, sums, new_keys, new_sums):
+    """Insert unique keys that are absent from `keys`, keeping both arrays sorted."""
+    pos = np.searchsorted(keys, new_keys)
+    return np.insert(keys, pos, new_keys), np.insert(sums, pos, new_sums, axis=0)
+
+
+class DenseKeyAggregator:
+    """
+    Sum metrics by a tuple of integer dimension codes.
+    `dims` is a list of (name, cardinality); codes must lie in [0, cardinality).
+    """
+
+    def __init__(self, dims, metrics):
+        self.dim_names = [name for name, _ in dims]
+        self.radix = np.array([cardinality for _, cardinality in dims], dtype=np.int64)
+        if np.prod(self.radix.astype(float)) >= 2 ** 63:
+            raise ValueError("Dimension cardinalities are too large to pack into an int64 key")
+        self.metrics = list(metrics)
+
+        self.keys = np.empty(0, dtype=np.int64)
+        self.sums = np.empty((0, len(self.metrics)), dtype=np.float64)
+        self.delta_keys = np.empty(0, dtype=np.int64)
+        self.delta_sums = np.empty((0, len(self.metrics)), dtype=np.float64)
+
+    def __len__(self):
+        return len(self.keys) + len(self.delta_keys)
+
+    def encode(self, codes):
+        key = np.zeros(len(codes[self.dim_names[0]]), dtype=np.int64)
+        for name, radix in zip(self.dim_names, self.radix):
+            key = key * radix + np.asarray(codes[name], dtype=np.int64)
+        return key
+
+    def decode(self, keys):
+        codes = {}
+        for name, radix in zip(reversed(self.dim_names), self.radix[::-1]):
+            keys, codes[name] = np.divmod(keys, radix)
+        return {name: codes[name] for name in self.dim_names}
+
+    def add(self, codes, values):
+        """Reduce one chunk and accumulate it. `values` maps each metric to an array."""
+        keys = self.encode(codes)
+        if len(keys) == 0:
+            return
+        uniq, inverse = np.unique(keys, return_inverse=True)
+        sums = np.column_stack([
+            np.bincount(inverse, weights=np.asarray(values[m], dtype=np.float64), minlength=len(uniq))
+            for m in self.metrics
+        ])
+        self._accumulate(uniq, sums)
+
+    def _accumulate(self, uniq, sums):
+        miss = _accumulate_hits(self.keys, self.sums, uniq, sums)
+        if not miss.any():
+            return
+        uniq, sums = uniq[miss], sums[miss]
+        miss = _accumulate_hits(self.delta_keys, self.delta_sums, uniq, sums)
+        if miss.any():
+            self.delta_keys, self.delta_sums = _insert_sorted(self.delta_keys, self.delta_sums, uniq[miss], sums[miss])
+        if len(self.delta_keys) > max(MIN_DELTA_KEYS, DELTA_FRACTION * len(self.keys)):
+            self.flush()
+
+    def merge(self, other, remap=None):
+        """
+        Add another aggregator's sums into this one.
+        `remap` maps a dimension name to an array translating the other
+        aggregator's codes into ours (e.g. per-shard channel vocabularies).
+        """
+        other.flush()
+        keys, sums = other.keys, other.sums
+        if remap:
+            codes = other.decode(keys)
+            for name, mapping in remap.items():
+                codes[name] = np.asarray(mapping)[codes[name]]
+            keys = self.encode(codes)
+            order = np.argsort(keys, kind="stable")
+            keys, sums = keys[order], sums[order]
+        if len(keys):
+            self._accumulate(keys, sums.copy())
+
+    def flush(self):
+        """Fold the delta into the main sorted arrays."""
+        if len(self.delta_keys):
+            self.keys, self.sums = _insert_sorted(self.keys, self.sums, self.delta_keys, self.delta_sums)
+            self.delta_keys = self.delta_keys[:0]
+            self.delta_sums = self.delta_sums[:0]
+
+    def save(self, path):
+        """Persist the aggregate (keys, sums and layout) to an .npz file."""
+        self.flush()
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                keys=self.keys,
+                sums=self.sums,
+                radix=self.radix,
+                dim_names=np.array(self.dim_names),
+                metrics=np.array(self.metrics)
+            )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            aggregator = cls(list(zip(data["dim_names"].tolist(), data["radix"].tolist())), data["metrics"].tolist())
+            aggregator.keys = data["keys"]
+            aggregator.sums = data["sums"]
+        return aggregator
+
+    def same_layout(self, other):
+        return self.dim_names == other.dim_names and np.array_equal(self.radix, other.radix) and self.metrics == other.metrics
+
+    def to_frame(self):
+        """Decoded dimension codes plus metric sums, one row per distinct key."""
+        self.flush()
+        frame = pd.DataFrame(self.decode(self.keys))
+        for i, metric in enumerate(self.metrics):
+            frame[metric] = self.sums[:, i]
+        return frame
@@ -0,0 +1,215 @@
+"""
+BlueMart Benchmark Suite
+Time the pipeline end to end on seeded datasets of several sizes.
+
+For each scale factor a fresh dataset is generated under
+benchmarks/data/sf<scale>/ (the generator is seeded, so every run builds the
+same data) and each stage runs as its own process against it, via the
+BLUEMART_DATA_DIR override:
+
+    generate_data -> fix_sales_csv -> process_data -> extract_insights -> dashboard
+
+`dashboard` replays the app's filter-and-aggregate paths (bitmap filter
+index, routed widget aggregations, exact order counts) over a fixed set of
+filter states. Each stage records wall time, CPU time, rows, rows/s and peak
+RSS of its process. Results go to benchmarks/results-<timestamp>.json and
+are compared with benchmarks/baseline.json when it exists.
+
+    python scripts/benchmark.py --scale-factors 0.02 0.1 --save-baseline
+    python scripts/benchmark.py --scale-factors 0.02 0.1 --fail-on-regression
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path to import config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+DEFAULT_SCALE_FACTORS = [0.02, 0.1]
+REGRESSION_THRESHOLD = 1.10  # Flag stages more than 10% slower than the baseline
+
+# Filter states replayed by the dashboard benchmark: {column: how many values to keep}
+DASHBOARD_SCENARIOS = {
+    "unfiltered": {},
+    "one_store": {"store_id": 1},
+    "two_categories": {"category": 2},
+    "one_channel_quarter": {"channel": 1, "month": 3},
+    "store_category_month": {"store_id": 5, "category": 3, "month": 1},
+}
+
+
+def run_stage(name, args, data_dir):
+    """
+    Run one pipeline script in its own process and measure it.
+    os.wait4 gives the CPU time and peak RSS of exactly that child (POSIX);
+    elsewhere those fields are None.
+    """
+    env = dict(os.environ, BLUEMART_DATA_DIR=str(data_dir))
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable] + args, cwd=config.BASE_DIR, env=env,
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    cpu = peak_rss = None
+    if hasattr(os, "wait4"):
+        output = process.stdout.read()
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        cpu = round(usage.ru_utime + usage.ru_stime, 4)
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak_rss = round(usage.ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    else:
+        output = process.communicate()[0]
+    wall = time.perf_counter() - start
+    if process.returncode != 0:
+        raise RuntimeError(f"{name} failed with exit code {process.returncode}:\n{output[-2000:]}")
+    return {"wall_s": round(wall, 4), "cpu_s": cpu, "peak_rss_mb": peak_rss, "output": output}
+
+
+def stage_rows(data_dir, script, stage):
+    """Rows one stage of a pipeline script reported in its run report (see instrumentation.py)."""
+    path = Path(data_dir) / "processed" / f"run_report_{script}.json"
+    if not path.exists():
+        return None
+    with open(path) as f:
+        report = json.load(f)
+    return next((entry["rows"] for entry in report["stages"] if entry["name"] == stage), None)
+
+
+def bench_dashboard():
+    """
+    Replay the dashboard's filter-and-aggregate paths in this process and
+    print a JSON line with per-scenario timings. Runs inside a stage process
+    whose BLUEMART_DATA_DIR points at the benchmark dataset.
+    """
+    from scripts import processed_io
+    from scripts.filters import FilterIndex
+    from scripts.rollups import QueryRouter, count_orders, load_rollups
+
+    load_start = time.perf_counter()
+    df = processed_io.read_table(processed_io.DASHBOARD_TABLE, fallback=config.FILE_DASHBOARD_DATA)
+    filter_index = FilterIndex(df, ['store_id', 'category', 'channel', 'month'])
+    router = QueryRouter(df, load_rollups(), base_index=filter_index)
+    order_counts = processed_io.read_table(processed_io.ORDER_COUNTS_TABLE)
+    category_bits = processed_io.table_entry(processed_io.ORDER_COUNTS_TABLE)['category_bits']
+    load_s = time.perf_counter() - load_start
+
+    widgets = [['sku_id', 'sku_name'], ['store_id', 'store_name'], ['category'], ['channel'], ['month']]
+    scenarios = {}
+    for name, selection in DASHBOARD_SCENARIOS.items():
+        filters = {col: sorted(df[col].unique().tolist(), key=str)[:count] for col, count in selection.items()}
+        start = time.perf_counter()
+        # The app's filtered row positions (used for the empty check and export)
+        filtered = filter_index.select(filters)
+        for dims in widgets:
+            router.query(dims, filters).groupby(dims, observed=True)[['revenue', 'profit']].sum()
+        count_orders(order_counts, category_bits, filters)
+        scenarios[name] = {"wall_s": round(time.perf_counter() - start, 4), "rows": len(filtered)}
+
+    print(json.dumps({"load_s": round(load_s, 4), "rows": len(df), "scenarios": scenarios}))
+
+
+def bench_scale_factor(scale_factor, workers, bench_dir):
+    data_dir = Path(bench_dir) / "data" / f"sf{scale_factor:g}"
+    print(f"Scale factor {scale_factor:g} ({data_dir})")
+    stages = {}
+
+    def record(name, args, rows_from=None):
+        result = run_stage(name, args, data_dir)
+        output = result.pop("output")
+        rows = stage_rows(data_dir, *rows_from) if rows_from else None
+        if rows:
+            result["rows"] = rows
+            result["rows_per_s"] = round(rows / result["wall_s"], 1)
+        stages[name] = result
+        print(f"   {name:18s} {result['wall_s']:8.2f}s wall  {result['peak_rss_mb']} MB peak"
+              + (f"  {result['rows_per_s']:,.0f} rows/s" if rows else ""))
+        return output
+
+    # Throughput is per raw sales line for every stage that reads or writes them
+    record("generate_data", [str(SCRIPTS_DIR / "generate_data.py"), "--scale-factor", str(scale_factor),
+                             "--workers", str(workers)], ("generate_data", "sales"))
+    record("fix_sales_csv", [str(SCRIPTS_DIR / "fix_sales_csv.py"), "--source", "csv"], ("fix_sales_csv", "scan"))
+    record("process_data", [str(SCRIPTS_DIR / "process_data.py"), "--source", "csv", "--full-rebuild",
+                            "--workers", str(workers)], ("process_data", "aggregate"))
+    record("extract_insights", [str(SCRIPTS_DIR / "extract_insights.py")])
+    output = record("dashboard", [str(SCRIPTS_DIR / "benchmark.py"), "--dashboard-probe"])
+    stages["dashboard"]["detail"] = json.loads(output.strip().splitlines()[-1])
+    return stages
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """Print wall-time ratios against the baseline and return the regressed (size, stage) pairs."""
+    regressions = []
+    print(f"\nComparison with baseline from {baseline['created_at']} (ratio = current / baseline wall time)")
+    for size, stages in results["sizes"].items():
+        for stage, result in stages.items():
+            previous = baseline["sizes"].get(size, {}).get(stage)
+            if previous is None:
+                continue
+            ratio = result["wall_s"] / previous["wall_s"] if previous["wall_s"] else float("inf")
+            flag = "  REGRESSION" if ratio > threshold else ""
+            print(f"   sf{size:6s} {stage:18s} {previous['wall_s']:8.2f}s -> {result['wall_s']:8.2f}s  x{ratio:.2f}{flag}")
+            if flag:
+                regressions.append((size, stage))
+    return regressions
+
+
+def run_benchmarks(scale_factors, workers=1, save_baseline=False, baseline_path=None,
+                   threshold=REGRESSION_THRESHOLD):
+    bench_dir = Path(config.BENCHMARK_DIR)
+    bench_dir.mkdir(parents=True, exist_ok=True)
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": sys.platform,
+        "cpu_count": os.cpu_count(),
+        "workers": workers,
+        "sizes": {f"{sf:g}": bench_scale_factor(sf, workers, bench_dir) for sf in scale_factors},
+    }
+
+    results_path = bench_dir / f"results-{datetime.now():%Y%m%dT%H%M%S}.json"
+    with open(results_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults saved to {results_path}")
+
+    baseline_path = Path(baseline_path or config.FILE_BENCHMARK_BASELINE)
+    regressions = []
+    if baseline_path.exists():
+        with open(baseline_path) as f:
+            regressions = compare(results, json.load(f), threshold)
+    if save_baseline:
+        with open(baseline_path, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {baseline_path}")
+    return results, regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the BlueMart pipeline on seeded datasets.")
+    parser.add_argument("--scale-factors", type=float, nargs="+", default=DEFAULT_SCALE_FACTORS,
+                        help="Dataset sizes to benchmark (generate_data --scale-factor values).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for generate_data and process_data (0 = all CPU cores).")
+    parser.add_argument("--baseline", help=f"Baseline results file (default {config.FILE_BENCHMARK_BASELINE}).")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline.")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Wall-time ratio above which a stage counts as a regression.")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on any regression.")
+    parser.add_argument("--dashboard-probe", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.dashboard_probe:
+        bench_dashboard()
+        sys.exit(0)
+
+    workers = args.workers if args.workers > 0 else os.cpu_count()
+    _, regressions = run_benchmarks(args.scale_factors, workers, args.save_baseline, args.baseline, args.threshold)
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
@@ -0,0 +1,88 @@
+"""
+Convert raw sales into the memory-mapped column store
+Run once after generating (or fixing) the sales; later process_data runs and
+ad-hoc scans read the binary columns instead of re-parsing the CSV.
+"""
+import sys
+import os
+import argparse
+import warnings
+
+import pandas as pd
+
+# Add parent directory to path to import config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+from scripts import instrumentation, sales_io, validation
+from scripts.column_store import ColumnStoreWriter
+
+CHUNK_SIZE = 500000
+PROGRESS_ROWS = 5_000_000  # Print progress about this often
+
+# Text columns; everything else must parse as a number or a date
+TEXT_COLUMNS = {'channel': 'category'}
+
+
+def check_chunk(chunk, first_row):
+    """
+    Parse a raw chunk (see validation.coerce_chunk) and raise ValueError with
+    a readable message when it holds rows the column store cannot encode.
+    """
+    typed, header, _ = validation.coerce_chunk(chunk, TEXT_COLUMNS)
+    if header.any():
+        row = first_row + int(header.argmax()) + 1
+        raise ValueError(f"the raw sales repeat the header line at data row {row:,}. "
+                         "Run scripts/fix_sales_csv.py first.")
+    required = set(validation.REQUIRED_NUMERIC) | {'date'}
+    for col in typed.columns:
+        if col in TEXT_COLUMNS:
+            continue
+        # Blank customer_id is a walk-in sale; any other blank or unparsed value is an error
+        bad = (typed[col].isna() & (chunk[col].notna() | (col in required))).to_numpy()
+        if bad.any():
+            row = int(bad.argmax())
+            raise ValueError(f"invalid {col} {chunk[col].iloc[row]!r} at data row {first_row + row + 1:,}. "
+                             "process_data.py --source csv quarantines such rows; the column store needs clean sales.")
+    return typed
+
+
+def build_column_store(source="auto", report=None):
+    report = report or instrumentation.NullReport()
+    source = sales_io.resolve_sales_source(source)
+    if source == "columns":
+        print("Column store is already newer than the raw sales; nothing to convert.")
+        return
+
+    print(f"Converting {source} sales to a column store in {config.SALES_COLUMN_STORE_DIR}...")
+    with report.stage("convert") as stage:
+        shards = sales_io.plan_sales_shards(source)
+        with ColumnStoreWriter(config.SALES_COLUMN_STORE_DIR, sales_io.SALES_COLUMNS, source=source) as writer, \
+                warnings.catch_warnings():
+            # Dirty columns are read as text and reported by check_chunk instead
+            warnings.simplefilter("ignore", pd.errors.DtypeWarning)
+            for chunk in sales_io.iter_sales_chunks(sales_io.SALES_COLUMNS, CHUNK_SIZE, source=source):
+                converted = writer.rows
+                writer.append(check_chunk(chunk, converted))
+                if writer.rows // PROGRESS_ROWS > converted // PROGRESS_ROWS:
+                    print(f"   Converted {writer.rows:,} rows...")
+        stage.add(rows=writer.rows,
+                  bytes_read=sum(sales_io.shard_nbytes(shard, sales_io.SALES_COLUMNS) for shard in shards),
+                  bytes_written=instrumentation.file_size(config.SALES_COLUMN_STORE_DIR))
+
+    print(f"Column store ready: {writer.rows:,} rows, {len(sales_io.SALES_COLUMNS)} columns")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert raw sales to memory-mapped binary columns.")
+    parser.add_argument("--source", choices=["auto", "csv", "parquet"], default="auto",
+                        help="Raw sales storage to convert (auto picks the most recently written).")
+    parser.add_argument("--no-report", action="store_true",
+                        help=f"Skip the run report (also off when {instrumentation.ENV_TOGGLE}=0).")
+    args = parser.parse_args()
+    report = instrumentation.start_run("build_column_store", enabled=not args.no_report, details=vars(args))
+    try:
+        build_column_store(args.source, report)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    report.write()
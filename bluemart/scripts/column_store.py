@@ -0,0 +1,222 @@
+"""
+BlueMart Column Store
+Raw sales as memory-mapped, fixed-width binary columns.
+
+Converting the sales once (scripts/build_column_store.py) writes one file
+per column plus a metadata file:
+
+    bm_sales_columns/
+        meta.json            row count, column types, code tables, build info
+        date.col             int32 days since 1970-01-01
+        store_id.col         int32
+        channel.col          int16 codes into meta.json's code table
+        ...
+
+Each .col file is a 64-byte header (magic, dtype, row count) followed by
+the raw little-endian values, so readers np.memmap it directly: scans run
+at page-cache speed, processes share the same pages and a job only touches
+the columns it asks for. Walk-in customers are stored as -1 and missing
+dates as INT32_MIN.
+"""
+
+import json
+import os
+import shutil
+import struct
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from scripts.dimensions import Vocabulary
+
+MAGIC = b"BMCOL01\n"
+HEADER_BYTES = 64
+HEADER_FORMAT = "<8s16sQ"  # magic, numpy dtype string, row count
+
+# On-disk type of each sales column
+COLUMN_DTYPES = {
+    "date": "<i4",
+    "store_id": "<i4",
+    "sku_id": "<i4",
+    "customer_id": "<i4",
+    "quantity": "<i2",
+    "unit_price": "<f8",
+    "total_value": "<f8",
+    "channel": "<i2",
+    "discount_pct": "<i2",
+    "transaction_id": "<i8",
+}
+STRING_COLUMNS = ["channel"]
+MISSING_DATE = np.iinfo(np.int32).min
+MISSING_ID = -1
+
+# Row-range shards are searched forward this many rows at a time for an order change
+ALIGN_WINDOW = 4096
+
+
+def _column_path(base_dir, name):
+    return Path(base_dir) / f"{name}.col"
+
+
+def _write_header(f, dtype, rows):
+    header = struct.pack(HEADER_FORMAT, MAGIC, np.dtype(dtype).str.encode("ascii"), rows)
+    f.seek(0)
+    f.write(header.ljust(HEADER_BYTES, b"\0"))
+
+
+def read_header(path):
+    """(dtype, rows) of one column file."""
+    with open(path, "rb") as f:
+        magic, dtype, rows = struct.unpack(HEADER_FORMAT, f.read(struct.calcsize(HEADER_FORMAT)))
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a BlueMart column file")
+    return np.dtype(dtype.rstrip(b"\0").decode("ascii")), rows
+
+
+def encode_column(name, series, vocab=None):
+    """Fixed-width values for one column of a sales chunk."""
+    if name == "date":
+        dates = pd.to_datetime(series).to_numpy(dtype="datetime64[D]")
+        days = dates.astype(np.int64)
+        return np.where(np.isnat(dates), MISSING_DATE, days).astype(COLUMN_DTYPES[name])
+    if name in STRING_COLUMNS:
+        return vocab.encode(series).astype(COLUMN_DTYPES[name])
+    if name == "customer_id":
+        return pd.to_numeric(series).fillna(MISSING_ID).to_numpy().astype(COLUMN_DTYPES[name])
+    return series.to_numpy().astype(COLUMN_DTYPES[name])
+
+
+class ColumnStoreWriter:
+    """
+    Append sales chunks to a new column store. Files are written to a
+    temporary directory and swapped in by `close`, so readers never see a
+    half-written store.
+    """
+
+    def __init__(self, base_dir, columns, source=None):
+        self.base_dir = Path(base_dir)
+        self.temp_dir = self.base_dir.with_name(self.base_dir.name + ".tmp")
+        if self.temp_dir.exists():
+            shutil.rmtree(self.temp_dir)
+        self.temp_dir.mkdir(parents=True)
+        self.columns = list(columns)
+        self.source = source
+        self.rows = 0
+        self.vocabs = {name: Vocabulary() for name in self.columns if name in STRING_COLUMNS}
+        self.files = {}
+        for name in self.columns:
+            f = open(_column_path(self.temp_dir, name), "wb")
+            _write_header(f, COLUMN_DTYPES[name], 0)
+            self.files[name] = f
+
+    def append(self, df):
+        for name in self.columns:
+            self.files[name].write(encode_column(name, df[name], self.vocabs.get(name)).tobytes())
+        self.rows += len(df)
+
+    def close(self):
+        for name, f in self.files.items():
+            _write_header(f, COLUMN_DTYPES[name], self.rows)
+            f.close()
+        meta = {
+            "version": 1,
+            "rows": self.rows,
+            "built_at": datetime.now().isoformat(timespec="microseconds"),
+            "source": self.source,
+            "columns": {name: COLUMN_DTYPES[name] for name in self.columns},
+            "code_tables": {name: list(vocab.categories()) for name, vocab in self.vocabs.items()},
+        }
+        with open(self.temp_dir / "meta.json", "w") as f:
+            json.dump(meta, f, indent=2)
+        if self.base_dir.exists():
+            shutil.rmtree(self.base_dir)
+        os.replace(self.temp_dir, self.base_dir)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            for f in self.files.values():
+                f.close()
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+
+class ColumnStore:
+    """Read-only, memory-mapped view of a column store."""
+
+    def __init__(self, base_dir):
+        self.base_dir = Path(base_dir)
+        with open(self.base_dir / "meta.json") as f:
+            self.meta = json.load(f)
+        self.rows = self.meta["rows"]
+        self.columns = list(self.meta["columns"])
+        self._maps = {}
+
+    def column(self, name):
+        """Raw memory-mapped values (codes for string columns); mapped on first use."""
+        if name not in self._maps:
+            path = _column_path(self.base_dir, name)
+            dtype, rows = read_header(path)
+            if rows != self.rows:
+                raise ValueError(f"{path} has {rows} rows, expected {self.rows}")
+            self._maps[name] = np.memmap(path, dtype=dtype, mode="r", offset=HEADER_BYTES, shape=(rows,))
+        return self._maps[name]
+
+    def decode(self, name, start=0, stop=None):
+        """Rows [start, stop) of one column as pandas-ready values."""
+        values = np.asarray(self.column(name)[start:stop])
+        if name == "date":
+            dates = values.astype("datetime64[D]").astype("datetime64[ns]")
+            dates[values == MISSING_DATE] = np.datetime64("NaT")
+            return dates
+        if name in STRING_COLUMNS:
+            return pd.Categorical.from_codes(values.astype(np.int64), self.meta["code_tables"][name])
+        if name == "customer_id":
+            return pd.arrays.IntegerArray(values.astype(np.int32), values == MISSING_ID)
+        return values
+
+    def frame(self, columns, start=0, stop=None):
+        return pd.DataFrame({name: self.decode(name, start, stop) for name in columns})
+
+    def iter_chunks(self, columns, chunk_size, start=0, stop=None, dtype_spec=None):
+        stop = self.rows if stop is None else stop
+        for chunk_start in range(start, stop, chunk_size):
+            chunk = self.frame(columns, chunk_start, min(chunk_start + chunk_size, stop))
+            if dtype_spec:
+                chunk = chunk.astype({col: dtype for col, dtype in dtype_spec.items() if col in chunk.columns})
+            yield chunk
+
+    def order_boundary(self, row, order_column):
+        """First row at or after `row` that starts a new order."""
+        if row <= 0 or row >= self.rows:
+            return min(max(row, 0), self.rows)
+        orders = self.column(order_column)
+        current = orders[row - 1]
+        while row < self.rows:
+            window = np.asarray(orders[row:row + ALIGN_WINDOW])
+            change = np.flatnonzero(window != current)
+            if len(change):
+                return row + int(change[0])
+            row += len(window)
+        return self.rows
+
+    def plan_shards(self, shard_rows, start_row=0, order_column=None):
+        """Row ranges of about `shard_rows`, moved forward so no order is split."""
+        bounds = [start_row]
+        while bounds[-1] + shard_rows < self.rows:
+            boundary = bounds[-1] + shard_rows
+            if order_column in self.columns:
+                boundary = self.order_boundary(boundary, order_column)
+            if boundary >= self.rows:
+                break
+            bounds.append(boundary)
+        bounds.append(self.rows)
+        return [
+            {"kind": "columns", "path": str(self.base_dir), "start": start, "end": end}
+            for start, end in zip(bounds[:-1], bounds[1:]) if end > start
+        ]
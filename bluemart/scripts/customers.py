@@ -0,0 +1,204 @@
+"""
+BlueMart Customer Aggregates
+Per-customer recency, frequency, monetary value and channel mix.
+
+`customer_id` is a small dense integer, so the running totals live in
+id-indexed arrays sized by the customer master (O(customers) memory, no
+matter how many sales rows stream past):
+
+    sums            revenue, profit, quantity and lines per customer
+    channel_orders  orders per customer and channel code
+    first_day/last_day  first and last purchase (days since 1970-01-01)
+
+Walk-in sales (no customer_id) go to the lookup's missing slot, and ids
+missing from the master to one extra slot after it, so both are counted,
+apart, but never reported as a customer. The loyalty tiers likewise end with
+a `Walk-in` and an `Unknown` tier (the latter also takes registered
+customers without a segment).
+Like DenseKeyAggregator, partial aggregates from shards merge exactly and
+are saved to .npz for incremental runs.
+"""
+
+import numpy as np
+import pandas as pd
+
+LINE_METRICS = ['revenue', 'profit', 'quantity', 'lines']
+NO_FIRST_DAY = np.iinfo(np.int32).max
+NO_LAST_DAY = np.iinfo(np.int32).min
+RFM_BINS = 5
+WALK_IN_SEGMENT = 'Walk-in'
+UNKNOWN_SEGMENT = 'Unknown'
+
+
+def slot_count(customer_lookup):
+    """Aggregator slots: the lookup's, then one for ids missing from the master."""
+    return customer_lookup.size + 1
+
+
+def unknown_slot(customer_lookup):
+    return customer_lookup.size
+
+
+def customer_slots(customer_lookup, customer_ids):
+    """
+    Aggregator slots for a customer_id column: walk-ins (blank ids) go to the
+    lookup's missing slot, ids not in the master to unknown_slot.
+    """
+    slots = customer_lookup.positions(customer_ids.fillna(-1).to_numpy(dtype=np.int64))
+    unknown = customer_ids.notna().to_numpy() & ~customer_lookup.present[slots]
+    return np.where(unknown, unknown_slot(customer_lookup), slots)
+
+
+def tier_names(customer_lookup):
+    """Loyalty tiers in code order: the master's segments, then Walk-in and Unknown."""
+    return list(customer_lookup.categories['loyalty_segment']) + [WALK_IN_SEGMENT, UNKNOWN_SEGMENT]
+
+
+def tier_codes(customer_lookup, slots):
+    """Loyalty tier code (see tier_names) per aggregator slot."""
+    segments = len(customer_lookup.categories['loyalty_segment'])
+    tiers = customer_lookup.codes('loyalty_segment', slots)
+    tiers = np.where(tiers < 0, segments + 1, tiers)
+    return np.where(slots == customer_lookup.missing_slot, segments, tiers)
+
+
+class CustomerAggregator:
+    """Running RFM and channel totals for `size` customer slots (see DenseLookup)."""
+
+    def __init__(self, size, channels=0):
+        self.size = size
+        self.sums = np.zeros((size, len(LINE_METRICS)), dtype=np.float64)
+        self.channel_orders = np.zeros((size, channels), dtype=np.int64)
+        self.first_day = np.full(size, NO_FIRST_DAY, dtype=np.int32)
+        self.last_day = np.full(size, NO_LAST_DAY, dtype=np.int32)
+
+    def __len__(self):
+        """Number of slots with at least one purchase."""
+        return int((self.sums[:, LINE_METRICS.index('lines')] > 0).sum())
+
+    def _ensure_channels(self, count):
+        if count > self.channel_orders.shape[1]:
+            self.channel_orders = np.pad(self.channel_orders, ((0, 0), (0, count - self.channel_orders.shape[1])))
+
+    def add(self, slots, days, channels, values, starts):
+        """
+        Accumulate one chunk of line items. `slots`, `days` and `channels`
+        are per line, `values` maps each of LINE_METRICS to an array and
+        `starts` are the positions where each order begins.
+        """
+        if len(slots) == 0:
+            return
+        uniq, inverse = np.unique(slots, return_inverse=True)
+        self.sums[uniq] += np.column_stack([
+            np.bincount(inverse, weights=np.asarray(values[m], dtype=np.float64), minlength=len(uniq))
+            for m in LINE_METRICS
+        ])
+        days = np.asarray(days, dtype=np.int32)  # Validated dates lie within daily.DAY_RADIX days
+        np.minimum.at(self.first_day, slots, days)
+        np.maximum.at(self.last_day, slots, days)
+
+        # An order has one customer and one channel, so count it at its first line
+        order_channels = channels[starts].astype(np.int64)
+        self._ensure_channels(int(order_channels.max()) + 1)
+        pairs, counts = np.unique(slots[starts] * self.channel_orders.shape[1] + order_channels, return_counts=True)
+        order_slots, order_channels = np.divmod(pairs, self.channel_orders.shape[1])
+        self.channel_orders[order_slots, order_channels] += counts
+
+    def merge(self, other, remap=None):
+        """
+        Add another aggregator's totals into this one. `remap['channel']`
+        translates the other aggregator's channel codes into ours.
+        """
+        mapping = np.asarray(remap['channel']) if remap and 'channel' in remap else np.arange(other.channel_orders.shape[1])
+        mapping = mapping[:other.channel_orders.shape[1]]
+        if len(mapping):
+            self._ensure_channels(int(mapping.max()) + 1)
+        for source, target in enumerate(mapping):
+            self.channel_orders[:, target] += other.channel_orders[:, source]
+        self.sums += other.sums
+        np.minimum(self.first_day, other.first_day, out=self.first_day)
+        np.maximum(self.last_day, other.last_day, out=self.last_day)
+
+    def flush(self):
+        """Nothing is buffered; present so the pipeline can treat every aggregate alike."""
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, sums=self.sums, channel_orders=self.channel_orders,
+                     first_day=self.first_day, last_day=self.last_day)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            aggregator = cls(len(data["sums"]))
+            aggregator.sums = data["sums"]
+            aggregator.channel_orders = data["channel_orders"]
+            aggregator.first_day = data["first_day"]
+            aggregator.last_day = data["last_day"]
+        return aggregator
+
+    def same_layout(self, other):
+        return isinstance(other, CustomerAggregator) and self.size == other.size
+
+    def orders(self):
+        return self.channel_orders.sum(axis=1)
+
+
+def rfm_scores(values):
+    """1-5 quintile scores by rank (higher values score higher); ties share the lower score."""
+    pct = pd.Series(values).rank(method='min', pct=True).to_numpy()
+    return np.clip(np.ceil(pct * RFM_BINS), 1, RFM_BINS).astype('int8')
+
+
+def customer_table(aggregator, customer_lookup, channels):
+    """
+    One row per customer with purchases: RFM values and scores, totals and
+    the share of their orders in each channel. Recency is counted from the
+    latest purchase date in the data (returned alongside the table).
+    """
+    orders = aggregator.orders()
+    slots = np.flatnonzero(orders > 0)
+    slots = slots[slots < customer_lookup.missing_slot]
+    as_of = int(aggregator.last_day.max()) if len(aggregator.last_day) else NO_LAST_DAY
+    sums = aggregator.sums[slots]
+
+    frame = pd.DataFrame({
+        'customer_id': slots,
+        'loyalty_segment': customer_lookup.get('loyalty_segment', slots),
+        'first_purchase': aggregator.first_day[slots].astype('datetime64[D]').astype('datetime64[ns]'),
+        'last_purchase': aggregator.last_day[slots].astype('datetime64[D]').astype('datetime64[ns]'),
+        'recency_days': (as_of - aggregator.last_day[slots]).astype('int64'),
+        'frequency': orders[slots],
+        'monetary': sums[:, LINE_METRICS.index('revenue')],
+        'profit': sums[:, LINE_METRICS.index('profit')],
+        'quantity': sums[:, LINE_METRICS.index('quantity')].round().astype('int64'),
+        'lines': sums[:, LINE_METRICS.index('lines')].round().astype('int64'),
+    })
+    frame['avg_order_value'] = frame['monetary'] / frame['frequency']
+    channel_orders = aggregator.channel_orders[slots]
+    for code, channel in enumerate(channels[:channel_orders.shape[1]]):
+        frame[f'share_{channel}'] = channel_orders[:, code] / frame['frequency']
+    if channel_orders.shape[1]:
+        frame['primary_channel'] = pd.Categorical.from_codes(channel_orders.argmax(axis=1), list(channels[:channel_orders.shape[1]]))
+    frame['r_score'] = rfm_scores(-frame['recency_days'])
+    frame['f_score'] = rfm_scores(frame['frequency'])
+    frame['m_score'] = rfm_scores(frame['monetary'])
+    as_of_date = np.datetime64(as_of, 'D') if len(slots) else None
+    return frame, as_of_date
+
+
+def slot_totals(aggregator, slot):
+    """LINE_METRICS totals and order count of one aggregator slot."""
+    totals = dict(zip(LINE_METRICS, aggregator.sums[slot].tolist()))
+    totals['orders'] = int(aggregator.channel_orders[slot].sum())
+    return totals
+
+
+def walk_in_totals(aggregator, customer_lookup):
+    """Totals of the sales without a customer_id."""
+    return slot_totals(aggregator, customer_lookup.missing_slot)
+
+
+def unknown_totals(aggregator, customer_lookup):
+    """Totals of the sales whose customer_id is not in the master."""
+    return slot_totals(aggregator, unknown_slot(customer_lookup))
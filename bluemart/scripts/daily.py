@@ -0,0 +1,79 @@
+"""
+BlueMart Daily Aggregate
+Sales by day x store x category x channel, stored sorted by day.
+
+process_data accumulates the daily grain in the same pass as the monthly
+dashboard data and writes it as the `daily_sales` table. Days are stored as
+int32 offsets (days since 1970-01-01, the column store's encoding) and the
+rows come out of the aggregator in key order, which is day-major, so a date
+range is a contiguous block of rows: `DailySeries.slice` finds it with two
+binary searches instead of filtering every row.
+
+`orders` at this grain counts the orders with a line in the row's category,
+so it adds up across days, stores and channels but not across categories.
+"""
+
+import numpy as np
+import pandas as pd
+
+EPOCH = np.datetime64('1970-01-01', 'D')
+DAY_RADIX = 2 ** 16  # Day offsets up to 2149-06-06
+
+
+NO_DAY = np.iinfo(np.int64).min // 2  # Missing dates: before any real day, and safe to offset
+
+
+def day_numbers(dates):
+    """Day offsets (int64) of an array of date-likes; missing dates get NO_DAY."""
+    days = (np.asarray(pd.to_datetime(dates), dtype='datetime64[D]') - EPOCH).astype(np.int64)
+    return np.where(days == np.iinfo(np.int64).min, NO_DAY, days)
+
+
+def day_dates(days):
+    """Day offsets back to datetime64 values."""
+    return (EPOCH + np.asarray(days, dtype=np.int64)).astype('datetime64[ns]')
+
+
+class DailySeries:
+    """Read-only daily table with date-range slicing."""
+
+    def __init__(self, frame):
+        self.frame = frame.reset_index(drop=True)
+        self.days = self.frame['day'].to_numpy(dtype=np.int64)
+        if len(self.days) and (np.diff(self.days) < 0).any():
+            raise ValueError("Daily table is not sorted by day")
+
+    def __len__(self):
+        return len(self.frame)
+
+    def date_range(self):
+        """(first, last) date in the table, or None when it is empty."""
+        if len(self.days) == 0:
+            return None
+        first, last = day_dates([self.days[0], self.days[-1]])
+        return pd.Timestamp(first).date(), pd.Timestamp(last).date()
+
+    def slice(self, start=None, end=None):
+        """Rows dated from `start` through `end` (inclusive); either bound may be None."""
+        lo = 0 if start is None else np.searchsorted(self.days, day_numbers([start])[0], side='left')
+        hi = len(self.days) if end is None else np.searchsorted(self.days, day_numbers([end])[0], side='right')
+        return self.frame.iloc[lo:hi]
+
+    def query(self, start=None, end=None, filters=None):
+        """Rows in the date range restricted by `filters` ({column: selected values})."""
+        rows = self.slice(start, end)
+        if not filters:
+            return rows
+        mask = np.ones(len(rows), dtype=bool)
+        for col, values in filters.items():
+            mask &= rows[col].isin(values).to_numpy()
+        return rows[mask]
+
+    def series(self, start=None, end=None, filters=None, metrics=('revenue', 'profit')):
+        """Daily totals in the range as a date-indexed frame (days without sales are 0)."""
+        rows = self.query(start, end, filters)
+        totals = rows.groupby('day')[list(metrics)].sum()
+        totals.index = pd.DatetimeIndex(day_dates(totals.index.to_numpy()), name='date')
+        if len(totals):
+            totals = totals.reindex(pd.date_range(totals.index[0], totals.index[-1], freq='D', name='date'), fill_value=0)
+        return totals
@@ -0,0 +1,93 @@
+"""
+BlueMart Dimension Lookups
+Master tables turned into id-indexed NumPy arrays.
+
+`sku_id` and `store_id` are small dense integers, so attaching an attribute
+to a chunk of sales is a single array index instead of a DataFrame merge.
+String attributes are stored as category codes and come back as
+pandas Categoricals sharing one category list across every chunk.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class DenseLookup:
+    """
+    Id-indexed attribute arrays for one master table.
+    Slot `size - 1` is reserved for ids that are unknown or out of range:
+    numeric attributes read NaN there and string attributes read missing.
+    """
+
+    def __init__(self, df, key, columns):
+        ids = df[key].to_numpy(dtype=np.int64)
+        if len(ids) and ids.min() < 0:
+            raise ValueError(f"{key} must be non-negative to build a dense lookup")
+
+        self.key = key
+        self.size = (int(ids.max()) + 2) if len(ids) else 1
+        self.missing_slot = self.size - 1
+        self.present = np.zeros(self.size, dtype=bool)
+        self.present[ids] = True
+
+        self.values = {}
+        self.categories = {}
+        for col in columns:
+            series = df[col]
+            if pd.api.types.is_numeric_dtype(series):
+                arr = np.full(self.size, np.nan, dtype=np.float64)
+                arr[ids] = series.to_numpy(dtype=np.float64)
+            else:
+                codes, uniques = pd.factorize(series)
+                arr = np.full(self.size, -1, dtype=np.int32)
+                arr[ids] = codes
+                self.categories[col] = pd.Index(uniques)
+            self.values[col] = arr
+
+    def positions(self, ids):
+        """Map raw ids to array slots, sending unknown ids to the missing slot."""
+        ids = np.asarray(ids)
+        in_range = (ids >= 0) & (ids < self.missing_slot)
+        return np.where(in_range, ids, self.missing_slot).astype(np.int64)
+
+    def contains(self, ids):
+        return self.present[self.positions(ids)]
+
+    def codes(self, col, ids):
+        """Category codes (-1 for unknown ids) for a string attribute."""
+        return self.values[col][self.positions(ids)]
+
+    def get(self, col, ids):
+        """Attribute values for `ids`: floats for numeric columns, a Categorical for strings."""
+        values = self.values[col][self.positions(ids)]
+        if col in self.categories:
+            return pd.Categorical.from_codes(values, self.categories[col])
+        return values
+
+
+class Vocabulary:
+    """
+    Stable integer codes for a low-cardinality string column.
+    Chunked readers infer categories per chunk, so each chunk's categories are
+    mapped onto codes that stay fixed for the whole run.
+    """
+
+    def __init__(self, values=()):
+        self.codes = {}
+        for value in values:
+            self.codes.setdefault(value, len(self.codes))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def encode(self, values):
+        categorical = pd.Categorical(values)
+        mapping = np.array([self.codes.setdefault(c, len(self.codes)) for c in categorical.categories] + [-1], dtype=np.int32)
+        # Missing values have code -1, which picks the trailing -1
+        return mapping[categorical.codes]
+
+    def categories(self):
+        return pd.Index(sorted(self.codes, key=self.codes.get))
+
+    def decode(self, codes):
+        return pd.Categorical.from_codes(codes, self.categories())
@@ -0,0 +1,102 @@
+"""
+BlueMart Export
+Chunked export of a filtered selection of the dashboard data.
+
+The rows to export are given as positions into the loaded frame (see
+FilterIndex.select), and the export is written EXPORT_CHUNK_ROWS rows at a
+time: each chunk is gathered, serialized and dropped before the next one,
+so besides the (compressed) output only one chunk is held in memory. The
+filtered frame is never materialized as a whole. The dashboard serializes
+into memory (export_bytes) rather than a temporary file, since the download
+holds the whole output in memory anyway and a file would outlive the session.
+
+    csv.gz   gzip-compressed CSV
+    parquet  zstd-compressed Parquet (needs pyarrow)
+    csv      plain CSV
+"""
+
+import gzip
+import io
+import os
+import sys
+
+# Add parent directory to path to import the scripts package
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from scripts.sales_io import pa, pq, PARQUET_COMPRESSION
+
+EXPORT_CHUNK_ROWS = 200_000
+
+EXPORT_FORMATS = {
+    'csv.gz': {'label': 'CSV (gzip)', 'mime': 'application/gzip'},
+    'parquet': {'label': 'Parquet', 'mime': 'application/vnd.apache.parquet'},
+    'csv': {'label': 'CSV', 'mime': 'text/csv'},
+}
+
+
+def available_formats():
+    """Export formats usable in this environment (Parquet needs pyarrow)."""
+    return [fmt for fmt in EXPORT_FORMATS if fmt != 'parquet' or pa is not None]
+
+
+def iter_chunks(frame, rows=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Consecutive chunks of `frame` at positions `rows` (all rows when None)."""
+    total = len(frame) if rows is None else len(rows)
+    for start in range(0, total, chunk_rows):
+        if rows is None:
+            yield frame.iloc[start:start + chunk_rows]
+        else:
+            yield frame.take(rows[start:start + chunk_rows])
+
+
+def write_export(frame, rows, target, fmt, chunk_rows=EXPORT_CHUNK_ROWS):
+    """
+    Write the selected rows of `frame` in `fmt`, chunk by chunk, to `target`
+    (a path, or a binary file object that is left open); returns the row count.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    written = 0
+    if fmt == 'parquet':
+        if pa is None:
+            raise ImportError("Parquet export needs pyarrow. Install it with `pip install pyarrow`.")
+        writer = None
+        try:
+            for chunk in iter_chunks(frame, rows, chunk_rows):
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(target, table.schema, compression=PARQUET_COMPRESSION)
+                writer.write_table(table)
+                written += len(chunk)
+            if writer is None:
+                # Nothing selected: still write a valid file with the frame's columns
+                pq.write_table(pa.Table.from_pandas(frame.iloc[:0], preserve_index=False), target,
+                               compression=PARQUET_COMPRESSION)
+        finally:
+            if writer is not None:
+                writer.close()
+        return written
+
+    is_path = isinstance(target, (str, os.PathLike))
+    if fmt == 'csv.gz':
+        f = gzip.open(target, 'wb')  # Closing it leaves a file object target open
+    else:
+        f = open(target, 'wb') if is_path else target
+    try:
+        chunks = iter_chunks(frame, rows, chunk_rows)
+        first = next(chunks, frame.iloc[:0])
+        first.to_csv(f, index=False, encoding='utf-8')
+        written += len(first)
+        for chunk in chunks:
+            chunk.to_csv(f, index=False, header=False, encoding='utf-8')
+            written += len(chunk)
+    finally:
+        if f is not target:
+            f.close()
+    return written
+
+
+def export_bytes(frame, rows, fmt):
+    """The export of the selected rows as bytes, serialized chunk by chunk without a temporary file."""
+    buffer = io.BytesIO()
+    write_export(frame, rows, buffer, fmt)
+    return buffer.getvalue()
@@ -0,0 +1,119 @@
+"""
+BlueMart Filter Index
+Precomputed per-value row sets for the dashboard's sidebar filters.
+
+Every indexed column keeps, for each of its values, the set of rows holding
+that value: a packed bitmap (one bit per row) for low-cardinality columns
+such as category, channel or month, or a row-id list (an inverted index,
+positions grouped by value) once a bitmap per value would take more memory
+than the ids. A filter ({column: selected values}) is answered by combining
+these sets: per column, the selected values' rows, or the complement of the
+unselected ones when that is fewer; then a bitwise AND across columns.
+Nothing is parsed or compared row by row after the index is built.
+
+Build the index once per dataset and share it; it is read-only.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Above this many values a column keeps row ids (4 bytes a row) instead of bitmaps (values/8 bytes a row)
+BITMAP_MAX_VALUES = 32
+
+
+def _pack(rows, count):
+    """Packed bitmap with the bits of `rows` set."""
+    hits = np.zeros(count, dtype=bool)
+    hits[rows] = True
+    return np.packbits(hits)
+
+
+class FilterIndex:
+    """Per-value row sets for `columns` of `frame`; row positions follow the frame."""
+
+    def __init__(self, frame, columns):
+        self.rows = len(frame)
+        self.labels = {}
+        self.positions = {}
+        self.bitmaps = {}
+        self.row_ids = {}
+        self.valid = {}
+        for col in columns:
+            series = frame[col]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                codes = series.cat.codes.to_numpy().astype(np.int64)
+                labels = series.cat.categories
+            else:
+                codes, labels = pd.factorize(series)
+            present = pd.unique(codes[codes >= 0])
+            # Series.unique() order, except that ordered categoricals (month) keep their order
+            present = np.sort(present) if getattr(series.dtype, 'ordered', False) else present
+            self.labels[col] = [labels[code] for code in present]
+            self.positions[col] = {label: i for i, label in enumerate(self.labels[col])}
+
+            # Renumber to positions in `present` and group the rows by value with one stable sort
+            # (16-bit keys get numpy's radix sort)
+            slot = np.full(len(labels) + 1, -1, dtype=np.int16 if len(present) < 2 ** 15 else np.int32)
+            slot[present] = np.arange(len(present))
+            slots = slot[codes]
+            order = np.argsort(slots, kind='stable')
+            order = order[slots[order] >= 0]
+            bounds = np.searchsorted(slots[order], np.arange(len(present) + 1))
+            self.valid[col] = _pack(order, self.rows)
+            if len(present) > BITMAP_MAX_VALUES:
+                self.row_ids[col] = (order.astype(np.int32 if self.rows < 2 ** 31 else np.int64), bounds)
+            else:
+                self.bitmaps[col] = np.stack([_pack(order[lo:hi], self.rows) for lo, hi in zip(bounds[:-1], bounds[1:])]) \
+                    if len(present) else np.zeros((0, len(self.valid[col])), dtype=np.uint8)
+
+    def __len__(self):
+        return self.rows
+
+    def values(self, col):
+        """Distinct values of an indexed column that occur in the frame."""
+        return list(self.labels[col])
+
+    def nbytes(self):
+        return (sum(bitmaps.nbytes for bitmaps in self.bitmaps.values())
+                + sum(order.nbytes + bounds.nbytes for order, bounds in self.row_ids.values())
+                + sum(valid.nbytes for valid in self.valid.values()))
+
+    def _column_mask(self, col, values):
+        chosen = np.zeros(len(self.labels[col]), dtype=bool)
+        chosen[[self.positions[col][value] for value in values if value in self.positions[col]]] = True
+        if col in self.row_ids:
+            order, bounds = self.row_ids[col]
+            sizes = np.diff(bounds)
+            # Gather whichever side of the selection has fewer rows
+            invert = sizes[chosen].sum() > sizes.sum() / 2
+            picked = np.flatnonzero(~chosen if invert else chosen)
+            rows = np.concatenate([order[bounds[i]:bounds[i + 1]] for i in picked]) if len(picked) else []
+            mask = _pack(rows, self.rows)
+        else:
+            bitmaps = self.bitmaps[col]
+            # OR whichever side of the selection has fewer bitmaps
+            invert = chosen.sum() > len(chosen) / 2
+            mask = np.zeros(len(self.valid[col]), dtype=np.uint8)
+            for position in np.flatnonzero(~chosen if invert else chosen):
+                np.bitwise_or(mask, bitmaps[position], out=mask)
+        return self.valid[col] & ~mask if invert else mask
+
+    def mask(self, filters):
+        """Packed bitmap of the rows matching every filter ({column: selected values})."""
+        result = None
+        for col, values in filters.items():
+            column_mask = self._column_mask(col, values)
+            result = column_mask if result is None else np.bitwise_and(result, column_mask, out=result)
+        return result
+
+    def select(self, filters):
+        """Sorted row positions matching every filter; all rows when `filters` is empty."""
+        if not filters:
+            return np.arange(self.rows)
+        return np.flatnonzero(np.unpackbits(self.mask(filters), count=self.rows))
+
+    def take(self, frame, filters):
+        """Rows of `frame` (the indexed frame) matching `filters`, or `frame` itself when nothing is filtered."""
+        if not filters:
+            return frame
+        return frame.take(self.select(filters))
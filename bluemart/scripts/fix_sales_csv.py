@@ -1,45 +1,218 @@
 """
-Fix duplicate headers in sales CSV file
+Fix duplicate headers in sales CSV file and index its rows
+Parquet sales partitions are checked against the canonical schema instead.
+
+The CSV is memory-mapped and scanned in blocks of SCAN_BLOCK_BYTES: copies
+of the header line are found with a byte search and row starts with a
+vectorized newline scan of the same block. Duplicate headers are then
+removed without rewriting anything before the first one: the bytes from
+there on, minus the duplicates, go to a side file (bm_sales.csv.fix-tail)
+and a journal (bm_sales.csv.fix-journal.json) records where they belong.
+Only then are they copied over the CSV, which is truncated to its new
+size. A run interrupted after the journal is written is finished by the
+next run; one interrupted before it never touched the CSV. The same scan
+writes a sidecar row-offset index (bm_sales.csv.idx.npz, see
+sales_io.write_csv_index) that process_data uses to cut row-aligned shards
+without reading the file.
 """
 import sys
 import os
+import json
+import mmap
+import shutil
+import argparse
+from pathlib import Path
+
+import numpy as np
 
 # Add parent directory to path to import config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import config
+from scripts import instrumentation, sales_io
+
+SCAN_BLOCK_BYTES = 64 * 1024 * 1024
+
+
+def scan_sales_csv(data, header_line, every=sales_io.CSV_INDEX_ROWS):
+    """
+    One pass over the mapped CSV `data`, whose first line is `header_line`
+    (newline included). Returns the start offsets of duplicate header lines,
+    the offsets of every `every`-th data row as they will be once those lines
+    are removed, and the number of data rows.
+    """
+    size = len(data)
+    needle = b"\n" + header_line
+    # A header copy on a last line without a newline is not matched by `needle`
+    last_line = header_line.rstrip(b"\r\n")
+    end = size - len(last_line) if size > len(header_line) and data[-len(last_line) - 1:] == b"\n" + last_line else size
+    duplicates = []
+    offsets = []
+    rows = 0
+    # Blocks start at a newline position, so the rows of a block are the lines after its newlines
+    for block_start in range(len(header_line) - 1, size, SCAN_BLOCK_BYTES):
+        block_end = min(block_start + SCAN_BLOCK_BYTES, size)
+        block_duplicates = []
+        position = data.find(needle, block_start, block_end - 1 + len(needle))
+        while position != -1:
+            block_duplicates.append(position + 1)
+            position = data.find(needle, position + 1, block_end - 1 + len(needle))
+        block_duplicates = np.array(block_duplicates, dtype=np.int64)
+
+        block = np.frombuffer(data, dtype=np.uint8, count=block_end - block_start, offset=block_start)
+        starts = np.flatnonzero(block == ord("\n")) + block_start + 1
+        starts = starts[starts < end]
+        if len(block_duplicates):
+            starts = starts[~np.isin(starts, block_duplicates, assume_unique=True)]
+        indexed = starts[(-rows) % every::every]
+        # Rows move down by one header line per duplicate before them
+        removed = len(duplicates) + np.searchsorted(block_duplicates, indexed)
+        offsets.append(indexed - removed * len(header_line))
+        duplicates.extend(block_duplicates.tolist())
+        rows += len(starts)
+    if end < size:
+        duplicates.append(end)
+    return duplicates, np.concatenate(offsets) if offsets else np.empty(0, dtype=np.int64), rows
+
+
+def journal_path(path):
+    return Path(str(path) + ".fix-journal.json")
+
+
+def tail_path(path):
+    return Path(str(path) + ".fix-tail")
+
+
+def write_compacted_tail(data, duplicates, line_length, path):
+    """
+    Write the bytes of `data` from the first duplicate header on, without the
+    duplicates, to the side file of `path`, then journal where they go.
+    Returns the side file size.
+    """
+    with open(tail_path(path), "wb") as out:
+        for start, end in zip(duplicates, duplicates[1:] + [len(data)]):
+            for position in range(min(start + line_length, len(data)), end, SCAN_BLOCK_BYTES):
+                out.write(data[position:min(position + SCAN_BLOCK_BYTES, end)])
+        out.flush()
+        os.fsync(out.fileno())
+        tail_bytes = out.tell()
+
+    temp_journal = journal_path(path).with_suffix(".tmp")
+    with open(temp_journal, "w") as f:
+        json.dump({"offset": duplicates[0], "tail_bytes": tail_bytes, "size": len(data)}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_journal, journal_path(path))
+    return tail_bytes
 
-def fix_sales_csv():
+
+def replay_journal(path):
+    """
+    Copy a journaled side file over the CSV at `path` and truncate it, then
+    drop the journal. Repeating this after an interruption gives the same
+    file. Without a journal, leftovers of an unfinished run are removed.
+    Returns True when a journal was replayed.
+    """
+    journal = journal_path(path)
+    if not journal.exists():
+        tail_path(path).unlink(missing_ok=True)
+        journal.with_suffix(".tmp").unlink(missing_ok=True)
+        return False
+    with open(journal) as f:
+        entry = json.load(f)
+    # The CSV is either untouched past the copy position or already truncated
+    if tail_path(path).stat().st_size != entry["tail_bytes"] or \
+            Path(path).stat().st_size not in (entry["size"], entry["offset"] + entry["tail_bytes"]):
+        raise ValueError(f"{path} changed since {journal} was written; remove the journal and regenerate or restore the file")
+    with open(tail_path(path), "rb") as source, open(path, "r+b") as target:
+        target.seek(entry["offset"])
+        shutil.copyfileobj(source, target, SCAN_BLOCK_BYTES)
+        target.truncate(entry["offset"] + entry["tail_bytes"])
+        target.flush()
+        os.fsync(target.fileno())
+    journal.unlink()
+    tail_path(path).unlink()
+    return True
+
+
+def fix_sales_csv(report=None):
     print("Fixing duplicate headers in sales CSV...")
+    report = report or instrumentation.NullReport()
     
     input_file = str(config.FILE_SALES)
-    temp_file = input_file + ".tmp"
+    if replay_journal(input_file):
+        print("   Finished removing duplicate headers from an interrupted run")
+    size = instrumentation.file_size(input_file)
+    if size == 0:
+        print("Sales CSV is empty, nothing to fix.")
+        return
     
-    header_line = "date,store_id,sku_id,customer_id,quantity,unit_price,total_value,channel,discount_pct,transaction_id"
-    
-    with open(input_file, 'r') as infile, open(temp_file, 'w') as outfile:
-        # Write header once
-        outfile.write(header_line + '\n')
-        
-        # Skip first line (original header)
-        next(infile)
+    with open(input_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        header_end = data.find(b"\n")
+        header_line = data[:header_end + 1] if header_end != -1 else data[:] + b"\n"
+        with report.stage("scan") as stage:
+            duplicates, offsets, lines_written = scan_sales_csv(data, header_line)
+            stage.add(rows=lines_written, bytes_read=size)
         
-        lines_written = 0
-        for line in infile:
-            # Skip any duplicate headers
-            if line.strip() == header_line:
-                print(f"   Skipped duplicate header at line {lines_written + 2}")
+        if duplicates:
+            with report.stage("compact") as stage:
+                tail_bytes = write_compacted_tail(data, duplicates, len(header_line), input_file)
+                stage.add(bytes_written=tail_bytes)
+    if duplicates:
+        with report.stage("apply") as stage:
+            replay_journal(input_file)
+            stage.add(bytes_read=tail_bytes, bytes_written=tail_bytes)
+    
+    sales_io.write_csv_index(input_file, offsets, lines_written)
+    print(f"   Removed {len(duplicates)} duplicate header(s)")
+    print(f"   Indexed every {sales_io.CSV_INDEX_ROWS:,} rows in {sales_io.csv_index_path(input_file).name}")
+    print(f"Fixed! Total data lines: {lines_written:,}")
+
+def fix_sales_parquet(report=None):
+    """
+    Typed partitions cannot contain embedded header rows, so the only repair
+    needed is schema drift: any part file whose schema differs from the
+    canonical one is cast and rewritten. Untouched files are only read for
+    their footer metadata.
+    """
+    print("Checking Parquet sales partitions...")
+    report = report or instrumentation.NullReport()
+    sales_io.require_pyarrow()
+    pq = sales_io.pq
+    schema = sales_io.sales_schema()
+    
+    total_rows = 0
+    files_fixed = 0
+    partitions = sales_io.list_sales_partitions()
+    with report.stage("check_partitions") as stage:
+        for path in partitions:
+            parquet_file = pq.ParquetFile(path)
+            total_rows += parquet_file.metadata.num_rows
+            if parquet_file.schema_arrow.equals(schema):
                 continue
-            outfile.write(line)
-            lines_written += 1
             
-            if lines_written % 1000000 == 0:
-                print(f"   Processed {lines_written:,} lines...")
+            print(f"   Rewriting {path.parent.name}/{path.name} with canonical schema")
+            stage.add(bytes_read=path.stat().st_size)
+            table = parquet_file.read().select(sales_io.SALES_COLUMNS).cast(schema)
+            temp_file = path.with_suffix(".tmp")
+            pq.write_table(table, temp_file, compression=sales_io.PARQUET_COMPRESSION)
+            os.replace(temp_file, path)
+            stage.add(bytes_written=path.stat().st_size)
+            files_fixed += 1
+        stage.add(rows=total_rows)
     
-    # Replace original with fixed file
-    import shutil
-    shutil.move(temp_file, input_file)
-    
-    print(f"Fixed! Total data lines: {lines_written:,}")
+    print(f"Checked {len(partitions)} files, fixed {files_fixed}. Total data rows: {total_rows:,}")
+
 
 if __name__ == "__main__":
-    fix_sales_csv()
+    parser = argparse.ArgumentParser(description="Repair the raw sales file.")
+    parser.add_argument("--source", choices=["auto", "csv", "parquet"], default="auto",
+                        help="Raw sales storage to repair (auto picks the most recently written).")
+    parser.add_argument("--no-report", action="store_true",
+                        help=f"Skip the run report (also off when {instrumentation.ENV_TOGGLE}=0).")
+    args = parser.parse_args()
+    report = instrumentation.start_run("fix_sales_csv", enabled=not args.no_report, details=vars(args))
+    if sales_io.resolve_sales_source(args.source) == "parquet":
+        fix_sales_parquet(report)
+    else:
+        fix_sales_csv(report)
+    report.write()
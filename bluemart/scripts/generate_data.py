@@ -8,40 +8,94 @@ import numpy as np
 import random
 import sys
 import os
+import argparse
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from pathlib import Path
 
 # Add parent directory to path to import config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import config
+from scripts import instrumentation
+from scripts.promotions import PromotionIndex
+from scripts.sales_io import SALES_COLUMNS, MonthlyPartitionWriter
 
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
-np.random.seed(42)
-random.seed(42)
+SEED = 42
+np.random.seed(SEED)
+random.seed(SEED)
 
 START_DATE = "2025-01-01"
 END_DATE = "2025-12-31"
-BASE_DAILY_TRANSACTIONS = 150
+BASE_DAILY_TRANSACTIONS = 150  # Per store per day
 QUICK_MODE = False
 
+# Scale factor (TPC-style): SF 1 is production volume. Stores, SKUs and
+# customers grow linearly with SF, and daily sales volume follows the store
+# count. Per-entity overrides on the command line take precedence.
+SCALE_FACTOR = 1
+BASE_STORES = 50
+BASE_SKUS = 5000
+BASE_CUSTOMERS = 5000
+INVENTORY_SKUS_PER_STORE = 1500
+INVENTORY_BLOCK_ELEMENTS = 4_000_000  # Random keys ranked per block of stores
+REORDER_POINT = 20
+
+# Basket engine parameters
+BASKET_SIZES = [1, 2, 3, 4, 5]
+BASKET_SIZE_WEIGHTS = [0.3, 0.3, 0.2, 0.1, 0.1]
+SAME_CATEGORY_PROB = 0.5  # Chance a follow-up item shares the first item's category
+WALK_IN_RATE = 0.2
+CHANNELS = ["Store", "Website", "MobileApp", "Amazon.ae", "Noon"]
+CHANNEL_WEIGHTS = [0.5, 0.25, 0.15, 0.07, 0.03]
+
+# Sales sharding: each shard covers SHARD_DAYS days with its own RNG stream
+SHARD_DAYS = 7
+
 # ============================================================================
 # 1️⃣ STORE MASTER
 # ============================================================================
-def generate_stores():
+def resolve_scale(scale_factor=SCALE_FACTOR, stores=None, skus=None, customers=None,
+                  daily_transactions=None, start_date=None, end_date=None):
+    """Resolve entity counts and date range for a scale factor plus optional per-entity overrides."""
+    def scaled(base):
+        return max(1, int(round(base * scale_factor)))
+
+    return {
+        "scale_factor": scale_factor,
+        "stores": stores or scaled(BASE_STORES),
+        "skus": skus or scaled(BASE_SKUS),
+        "customers": customers or scaled(BASE_CUSTOMERS),
+        "daily_transactions": daily_transactions or BASE_DAILY_TRANSACTIONS,
+        "start_date": start_date or START_DATE,
+        "end_date": end_date or END_DATE
+    }
+
+
+def generate_stores(n_stores=BASE_STORES):
     print("Generating Store Master...")
+    # Opening dates every 30 days from 2017-06-01; anything past 2018-01-01 is
+    # spread evenly over 2017 instead. Computed as day offsets so large store
+    # counts cannot overflow the datetime range.
+    days_open = pd.Series(30 * np.arange(n_stores))
+    late = days_open > (pd.Timestamp("2018-01-01") - pd.Timestamp("2017-06-01")).days
+    opening_date = pd.Timestamp("2017-06-01") + pd.to_timedelta(days_open.where(~late, 0), unit="D")
+    opening_date[late] = pd.date_range("2017-01-01", "2018-01-01", periods=int(late.sum()))
+    
     stores = pd.DataFrame({
-        "store_id": range(1, 51),
-        "store_name": [f"BlueMart Store {i:02d}" for i in range(1, 51)],
-        "city": np.random.choice(["Dubai", "Abu Dhabi", "Sharjah"], 50, p=[0.5, 0.3, 0.2]),
-        "store_type": np.random.choice(["Mall", "High Street", "Community"], 50, p=[0.4, 0.4, 0.2]),
-        "opening_date": pd.date_range("2017-06-01", periods=50, freq="30D")[:50]
+        "store_id": range(1, n_stores + 1),
+        "store_name": [f"BlueMart Store {i:02d}" for i in range(1, n_stores + 1)],
+        "city": np.random.choice(["Dubai", "Abu Dhabi", "Sharjah"], n_stores, p=[0.5, 0.3, 0.2]),
+        "store_type": np.random.choice(["Mall", "High Street", "Community"], n_stores, p=[0.4, 0.4, 0.2]),
+        "opening_date": opening_date
     })
     
-    stores.loc[stores["opening_date"] > "2018-01-01", "opening_date"] = pd.date_range("2017-01-01", "2018-01-01", periods=len(stores[stores["opening_date"] > "2018-01-01"]))
-    stores["opening_date"] = pd.to_datetime(stores["opening_date"])
     stores = stores.sort_values("opening_date").reset_index(drop=True)
-    stores.loc[0:9, "opening_date"] = pd.date_range("2017-01-01", periods=10, freq="30D")
+    n_early = min(10, n_stores)
+    stores.loc[0:n_early - 1, "opening_date"] = pd.date_range("2017-01-01", periods=n_early, freq="30D")
     
     print(f"Generated {len(stores)} stores")
     return stores
@@ -49,7 +103,7 @@ def generate_stores():
 # ============================================================================
 # 2️⃣ SKU MASTER
 # ============================================================================
-def generate_skus():
+def generate_skus(n_skus=BASE_SKUS):
     print("Generating SKU Master...")
     categories = ["Grocery", "Beverages", "Personal Care", "Household", "Snacks", "Dairy", "Electronics"]
     subcategories = {
@@ -62,29 +116,35 @@ def generate_skus():
         "Electronics": ["Mobile Accessories", "Cables", "Batteries", "Chargers"]
     }
     
-    sku_records = []
-    for i, sku_id in enumerate(range(1001, 6001)):
-        category = np.random.choice(categories)
-        subcategory = np.random.choice(subcategories[category])
-        
-        price_ranges = {
-            "Grocery": (5, 50), "Beverages": (3, 30), "Personal Care": (10, 80),
-            "Household": (8, 60), "Snacks": (2, 25), "Dairy": (5, 40), "Electronics": (15, 250)
-        }
-        
-        min_price, max_price = price_ranges[category]
-        unit_price = np.round(np.random.uniform(min_price, max_price), 2)
-        cost_price = np.round(unit_price * np.random.uniform(0.55, 0.80), 2)
-        
-        sku_records.append({
-            "sku_id": sku_id,
-            "sku_name": f"{category}_{subcategory}_{sku_id}",
-            "category": category,
-            "subcategory": subcategory,
-            "unit_price": unit_price,
-            "cost_price": cost_price,
-            "brand": np.random.choice(["BlueMart", "Premium", "Budget", "Local", "International"], p=[0.2, 0.3, 0.2, 0.15, 0.15])
-        })
+    price_ranges = {
+        "Grocery": (5, 50), "Beverages": (3, 30), "Personal Care": (10, 80),
+        "Household": (8, 60), "Snacks": (2, 25), "Dairy": (5, 40), "Electronics": (15, 250)
+    }
+    brands = ["BlueMart", "Premium", "Budget", "Local", "International"]
+    
+    # Whole-array draws: category, then a subcategory index bounded by that category's list
+    sku_ids = np.arange(1001, 1001 + n_skus)
+    cat_idx = np.random.randint(0, len(categories), n_skus)
+    sub_counts = np.array([len(subcategories[c]) for c in categories])
+    sub_idx = (np.random.random(n_skus) * sub_counts[cat_idx]).astype(np.int64)
+    sub_table = np.array([subcategories[c] + [""] * (sub_counts.max() - len(subcategories[c])) for c in categories])
+    
+    min_price = np.array([price_ranges[c][0] for c in categories])[cat_idx]
+    max_price = np.array([price_ranges[c][1] for c in categories])[cat_idx]
+    unit_price = np.round(np.random.uniform(min_price, max_price), 2)
+    cost_price = np.round(unit_price * np.random.uniform(0.55, 0.80, n_skus), 2)
+    
+    category = pd.Series(np.array(categories)[cat_idx])
+    subcategory = pd.Series(sub_table[cat_idx, sub_idx])
+    sku_records = {
+        "sku_id": sku_ids,
+        "sku_name": category + "_" + subcategory + "_" + pd.Series(sku_ids).astype(str),
+        "category": category,
+        "subcategory": subcategory,
+        "unit_price": unit_price,
+        "cost_price": cost_price,
+        "brand": np.random.choice(brands, n_skus, p=[0.2, 0.3, 0.2, 0.15, 0.15])
+    }
     
     sku_master = pd.DataFrame(sku_records)
     print(f"Generated {len(sku_master)} SKUs")
@@ -117,15 +177,15 @@ def generate_promotions(start_date, end_date):
 # ============================================================================
 # 4️⃣ CUSTOMERS
 # ============================================================================
-def generate_customers():
+def generate_customers(n_customers=BASE_CUSTOMERS, registration_date=START_DATE):
     print("Generating Customer Master...")
     customers = pd.DataFrame({
-        "cust_id": range(1, 5001),
-        "age": np.random.choice([20, 30, 40, 50, 60], 5000),
-        "gender": np.random.choice(["Male", "Female"], 5000),
-        "city": np.random.choice(["Dubai", "Abu Dhabi", "Sharjah"], 5000),
-        "loyalty_segment": np.random.choice(["Silver", "Gold", "Platinum"], 5000, p=[0.6, 0.3, 0.1]),
-        "registration_date": pd.to_datetime(START_DATE)
+        "cust_id": range(1, n_customers + 1),
+        "age": np.random.choice([20, 30, 40, 50, 60], n_customers),
+        "gender": np.random.choice(["Male", "Female"], n_customers),
+        "city": np.random.choice(["Dubai", "Abu Dhabi", "Sharjah"], n_customers),
+        "loyalty_segment": np.random.choice(["Silver", "Gold", "Platinum"], n_customers, p=[0.6, 0.3, 0.1]),
+        "registration_date": pd.to_datetime(registration_date)
     })
     print(f"Generated {len(customers)} customers")
     return customers
@@ -133,157 +193,331 @@ def generate_customers():
 # ============================================================================
 # 5️⃣ SALES TRANSACTIONS (WITH BASKET LOGIC)
 # ============================================================================
-def generate_sales(stores, sku_master, customers, promotions_df, output_path):
+def build_basket_catalog(sku_master):
+    """
+    Precompute the SKU arrays used by the basket engine.
+    SKUs are grouped by category so a same-category pick is a single
+    offset + random index into `by_category` instead of a DataFrame filter.
+    """
+    cat_codes, categories = pd.factorize(sku_master["category"])
+    by_category = np.argsort(cat_codes, kind="stable")
+    cat_counts = np.bincount(cat_codes, minlength=len(categories))
+    cat_offsets = np.concatenate(([0], np.cumsum(cat_counts)[:-1]))
+    return {
+        "sku_ids": sku_master["sku_id"].to_numpy(),
+        "prices": sku_master["unit_price"].to_numpy(dtype="float64"),
+        "cat_codes": cat_codes,
+        "by_category": by_category,
+        "cat_offsets": cat_offsets,
+        "cat_counts": cat_counts,
+    }
+
+
+def generate_day_baskets(rng, catalog, store_ids, cust_ids, current_date, num_transactions, promo_index, first_transaction_id):
+    """
+    Build one day of basket line items as whole arrays.
+    Statistical shape matches the original per-transaction loop: basket sizes,
+    uniform first item, 50% same-category follow-up items, 20% walk-ins and
+    1-3 units per line. Channel is drawn once per transaction so every line
+    of an order shares it. The discount comes from the promotion winning for
+    each transaction's store on `current_date`.
+    """
+    n_skus = len(catalog["sku_ids"])
+
+    # Transaction-level draws
+    sizes = rng.choice(BASKET_SIZES, num_transactions, p=BASKET_SIZE_WEIGHTS)
+    tx_store = store_ids[rng.integers(0, len(store_ids), num_transactions)]
+    tx_cust = cust_ids[rng.integers(0, len(cust_ids), num_transactions)]
+    tx_walk_in = rng.random(num_transactions) < WALK_IN_RATE
+    tx_channel = rng.choice(len(CHANNELS), num_transactions, p=CHANNEL_WEIGHTS)
+    tx_first = rng.integers(0, n_skus, num_transactions)
+    tx_discount = promo_index.discounts(np.full(num_transactions, np.datetime64(current_date, "D")), tx_store)
+
+    # Expand to line level
+    n_lines = int(sizes.sum())
+    line_tx = np.repeat(np.arange(num_transactions), sizes)
+    basket_starts = np.cumsum(sizes) - sizes
+    is_first = np.arange(n_lines) == np.repeat(basket_starts, sizes)
+
+    # Follow-up items: same category as the first item, or any SKU
+    line_cat = catalog["cat_codes"][tx_first][line_tx]
+    same_cat_pos = catalog["cat_offsets"][line_cat] + (rng.random(n_lines) * catalog["cat_counts"][line_cat]).astype(np.int64)
+    same_cat_pick = catalog["by_category"][same_cat_pos]
+    random_pick = rng.integers(0, n_skus, n_lines)
+    is_same_cat = rng.random(n_lines) < SAME_CATEGORY_PROB
+    items = np.where(is_first, tx_first[line_tx], np.where(is_same_cat, same_cat_pick, random_pick))
+
+    quantity = rng.integers(1, 4, n_lines)
+    discount = tx_discount[line_tx]
+    unit_price = np.round(catalog["prices"][items] * (1 - discount / 100), 2)
+
+    return pd.DataFrame({
+        "date": current_date,
+        "store_id": tx_store[line_tx],
+        "sku_id": catalog["sku_ids"][items],
+        "customer_id": pd.arrays.IntegerArray(tx_cust[line_tx].astype("int64"), tx_walk_in[line_tx]),
+        "quantity": quantity,
+        "unit_price": unit_price,
+        "total_value": np.round(unit_price * quantity, 2),
+        "channel": pd.Categorical.from_codes(tx_channel[line_tx], CHANNELS),
+        "discount_pct": discount,
+        "transaction_id": first_transaction_id + line_tx
+    })
+
+
+def plan_sales_shards(dates, promo_index, daily_tx_count, shard_days=SHARD_DAYS):
+    """
+    Split the date range into fixed-size day shards.
+    Daily transaction counts are known up front, so each shard gets a contiguous
+    transaction_id block and its own spawned seed. The plan depends only on the
+    date range, never on the worker count, which keeps the output identical
+    however many processes run it. Chain-wide promotion days get 50% more
+    transactions.
+    """
+    is_promo = promo_index.tag(dates) >= 0
+    tx_per_day = (daily_tx_count * np.where(is_promo, 1.5, 1.0)).astype(np.int64)
+    first_ids = 1 + np.concatenate(([0], np.cumsum(tx_per_day)[:-1]))
+
+    starts = range(0, len(dates), shard_days)
+    seeds = np.random.SeedSequence(SEED).spawn(len(starts))
+    shards = []
+    for shard_id, (start, seed) in enumerate(zip(starts, seeds)):
+        stop = start + shard_days
+        shards.append({
+            "shard_id": shard_id,
+            "seed": seed,
+            "dates": dates[start:stop],
+            "tx_per_day": tx_per_day[start:stop],
+            "first_transaction_id": int(first_ids[start])
+        })
+    return shards
+
+
+def generate_sales_shard(shard, catalog, store_ids, cust_ids, promo_index, part_path, output_format="csv"):
+    """
+    Generate one shard of days with its own RNG stream.
+    CSV shards go to a headerless part file; Parquet shards append to month
+    partitions under `part_path` using the shard id as the file number.
+    """
+    rng = np.random.default_rng(shard["seed"])
+    transaction_id_counter = shard["first_transaction_id"]
+    total_lines = 0
+
+    if output_format == "parquet":
+        sink = MonthlyPartitionWriter(part_path, shard["shard_id"])
+        write_day = sink.write
+    else:
+        sink = open(part_path, "w", newline="")
+        write_day = lambda df, date: df.to_csv(sink, header=False, index=False)
+
+    with sink:
+        for current_date, num_transactions in zip(shard["dates"], shard["tx_per_day"]):
+            df_chunk = generate_day_baskets(
+                rng, catalog, store_ids, cust_ids, current_date,
+                int(num_transactions), promo_index, transaction_id_counter
+            )
+            transaction_id_counter += int(num_transactions)
+            total_lines += len(df_chunk)
+            write_day(df_chunk, current_date)
+
+    return total_lines
+
+
+def generate_sales(stores, sku_master, customers, promotions_df, output_path, workers=1,
+                   start_date=START_DATE, end_date=END_DATE, daily_transactions=BASE_DAILY_TRANSACTIONS,
+                   output_format="csv"):
     print("Generating Sales Transactions with Basket Logic...")
     
-    dates = pd.date_range(START_DATE, END_DATE, freq="D")
+    dates = pd.date_range(start_date, end_date, freq="D")
     
     # Basket Logic: Define related categories
     # If you buy Pasta (Grocery), you might buy Sauce (Grocery) or Cheese (Dairy)
     # If you buy Shampoo (Personal Care), you might buy Conditioner (Personal Care)
+    catalog = build_basket_catalog(sku_master)
+    store_ids = stores["store_id"].to_numpy()
+    cust_ids = customers["cust_id"].to_numpy()
     
-    sku_list = sku_master["sku_id"].values
-    sku_cats = dict(zip(sku_master["sku_id"], sku_master["category"]))
-    sku_prices = dict(zip(sku_master["sku_id"], sku_master["unit_price"]))
+    # Interval index over the promo calendar (handles overlapping and store-scoped promos)
+    promo_index = PromotionIndex(promotions_df)
     
-    # Pre-compute promo dates
-    promo_map = {}
-    for _, row in promotions_df.iterrows():
-        for d in pd.date_range(row["start_date"], row["end_date"]):
-            promo_map[d] = row["discount_pct"]
-
-    transaction_id_counter = 1
+    # User requested 100-150 transactions PER STORE.
+    # So total daily transactions = daily_transactions * number of stores
+    daily_tx_count = daily_transactions * len(stores)
     
-    total_days = len(dates)
-    print(f"   Processing {total_days} days...")
+    shards = plan_sales_shards(dates, promo_index, daily_tx_count)
+    print(f"   Processing {len(dates)} days in {len(shards)} shards with {workers} worker(s)...")
     
-    # Optimization: Generate fewer days or sample if needed, but we'll do full range
-    # User requested 100-150 transactions PER STORE. There are 50 stores.
-    # So total daily transactions = BASE_DAILY_TRANSACTIONS * 50
-    daily_tx_count = BASE_DAILY_TRANSACTIONS * 50 
+    if output_format == "parquet":
+        # Every shard writes straight into the month partitions of the dataset
+        if Path(output_path).exists():
+            shutil.rmtree(output_path)
+        part_paths = [Path(output_path)] * len(shards)
+    else:
+        parts_dir = Path(output_path).parent / f"{Path(output_path).stem}_parts"
+        parts_dir.mkdir(parents=True, exist_ok=True)
+        part_paths = [parts_dir / f"part-{shard['shard_id']:05d}.csv" for shard in shards]
     
-    # Initialize CSV with headers
-    first_chunk = True
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(generate_sales_shard, shard, catalog, store_ids, cust_ids, promo_index, part_path, output_format)
+                for shard, part_path in zip(shards, part_paths)
+            ]
+            line_counts = []
+            for shard, future in zip(shards, futures):
+                line_counts.append(future.result())
+                print(f"   Shard {shard['shard_id'] + 1}/{len(shards)} done ({shard['dates'][-1].date()})...")
+    else:
+        line_counts = []
+        for shard, part_path in zip(shards, part_paths):
+            line_counts.append(generate_sales_shard(shard, catalog, store_ids, cust_ids, promo_index, part_path, output_format))
+            print(f"   Shard {shard['shard_id'] + 1}/{len(shards)} done ({shard['dates'][-1].date()})...")
     
-    for current_date in dates:
-        sales_data = [] # Reset buffer for each day
-        is_promo = current_date in promo_map
-        num_transactions = int(daily_tx_count * (1.5 if is_promo else 1.0))
-        
-        # Vectorized generation for the day's transactions
-        day_store_ids = np.random.choice(stores["store_id"], num_transactions)
-        day_cust_ids = np.random.choice(customers["cust_id"], num_transactions)
-        
-        for i in range(num_transactions):
-            store_id = day_store_ids[i]
-            cust_id = day_cust_ids[i] if np.random.random() > 0.2 else None # 20% walk-ins
-            
-            # Start Basket
-            basket_size = np.random.choice([1, 2, 3, 4, 5], p=[0.3, 0.3, 0.2, 0.1, 0.1])
-            
-            # Pick first item
-            first_item = np.random.choice(sku_list)
-            basket_items = [first_item]
-            
-            # Pick related items based on category of first item
-            first_cat = sku_cats[first_item]
-            
-            # Simple correlation: 50% chance next item is same category
-            for _ in range(basket_size - 1):
-                if np.random.random() < 0.5:
-                    # Same category
-                    same_cat_skus = sku_master[sku_master["category"] == first_cat]["sku_id"].values
-                    if len(same_cat_skus) > 0:
-                        basket_items.append(np.random.choice(same_cat_skus))
-                    else:
-                        basket_items.append(np.random.choice(sku_list))
-                else:
-                    # Random other item
-                    basket_items.append(np.random.choice(sku_list))
-            
-            # Record transactions
-            for item_id in basket_items:
-                price = sku_prices[item_id]
-                discount = promo_map.get(current_date, 0)
-                final_price = price * (1 - discount/100)
-                
-                sales_data.append({
-                    "date": current_date,
-                    "store_id": store_id,
-                    "sku_id": item_id,
-                    "customer_id": cust_id,
-                    "quantity": np.random.randint(1, 4),
-                    "unit_price": round(final_price, 2),
-                    "total_value": round(final_price * np.random.randint(1, 4), 2), # simplified qty mult
-                    "channel": np.random.choice(["Store", "Website", "MobileApp", "Amazon.ae", "Noon"], p=[0.5, 0.25, 0.15, 0.07, 0.03]),
-                    "discount_pct": discount,
-                    "transaction_id": transaction_id_counter
-                })
-            
-            transaction_id_counter += 1
-            
-        # Write daily chunk to CSV
-        if sales_data:
-            df_chunk = pd.DataFrame(sales_data)
-            mode = 'w' if first_chunk else 'a'
-            header = first_chunk
-            df_chunk.to_csv(output_path, mode=mode, header=header, index=False)
-            first_chunk = False
-            
-            # Explicitly clean up to ensure memory is freed
-            del df_chunk
-            del sales_data
-            import gc
-            gc.collect()
+    if output_format == "csv":
+        # Stitch part files in shard order behind a single header
+        print("   Concatenating shard files...")
+        header = ",".join(SALES_COLUMNS) + "\n"
+        with open(output_path, "w", newline="") as outfile:
+            outfile.write(header)
+            for part_path in part_paths:
+                with open(part_path, "r", newline="") as part_file:
+                    shutil.copyfileobj(part_file, outfile, 16 * 1024 * 1024)
+                part_path.unlink()
+        parts_dir.rmdir()
             
-        if current_date.day % 10 == 0:
-            print(f"   Processed {current_date.date()}...")
-            
-    print(f"Sales data generation complete. Saved to {output_path}")
+    print(f"Sales data generation complete ({sum(line_counts):,} line items). Saved to {output_path}")
+    return sum(line_counts)
 
 # ============================================================================
 # 6️⃣ INVENTORY
 # ============================================================================
-def generate_inventory(stores, sku_master):
+def build_store_assortment(stores, sku_master, skus_per_store=INVENTORY_SKUS_PER_STORE):
+    """
+    Pick a random SKU range for every store without replacement.
+    Random sort keys are ranked with argpartition a block of stores at a time,
+    which keeps the key matrix at roughly INVENTORY_BLOCK_ELEMENTS floats.
+    """
+    store_ids = stores["store_id"].to_numpy()
+    sku_ids = sku_master["sku_id"].to_numpy()
+    n_pick = min(skus_per_store, len(sku_ids))
+    block = max(1, INVENTORY_BLOCK_ELEMENTS // len(sku_ids))
+    
+    picks = np.empty((len(store_ids), n_pick), dtype=np.int64)
+    for start in range(0, len(store_ids), block):
+        keys = np.random.random((min(block, len(store_ids) - start), len(sku_ids)))
+        picks[start:start + len(keys)] = np.argpartition(keys, n_pick - 1, axis=1)[:, :n_pick]
+    
+    return np.repeat(store_ids, n_pick), sku_ids[picks.ravel()]
+
+
+def generate_inventory(stores, sku_master, snapshot_date=END_DATE, skus_per_store=INVENTORY_SKUS_PER_STORE):
     print("Generating Inventory...")
-    # Simplified inventory generation
-    inventory_records = []
-    for store_id in stores["store_id"]:
-        # Random 1500 SKUs per store (increased from 100 for realistic omnichannel inventory)
-        store_skus = np.random.choice(sku_master["sku_id"], 1500, replace=False)
-        for sku_id in store_skus:
-            inventory_records.append({
-                "store_id": store_id,
-                "sku_id": sku_id,
-                "stock_on_hand": np.random.randint(10, 200),
-                "reorder_point": 20,
-                "snapshot_date": END_DATE
-            })
-    inventory = pd.DataFrame(inventory_records)
+    # Random 1500 SKUs per store (increased from 100 for realistic omnichannel inventory)
+    inv_store_ids, inv_sku_ids = build_store_assortment(stores, sku_master, skus_per_store)
+    inventory = pd.DataFrame({
+        "store_id": inv_store_ids,
+        "sku_id": inv_sku_ids,
+        "stock_on_hand": np.random.randint(10, 200, len(inv_sku_ids)),
+        "reorder_point": REORDER_POINT,
+        "snapshot_date": snapshot_date
+    })
     print(f"Generated {len(inventory)} inventory records")
     return inventory
 
+
+def generate_inventory_history(stores, sku_master, snapshot_dates, output_path, skus_per_store=INVENTORY_SKUS_PER_STORE):
+    """
+    Stream one inventory snapshot per date to CSV.
+    Stock starts at 10-199 units, each period sells 0-29 units and any
+    position below the reorder point is replenished with 100-199 units.
+    Only one snapshot is held in memory at a time.
+    """
+    print(f"Generating Inventory History ({len(snapshot_dates)} snapshots)...")
+    inv_store_ids, inv_sku_ids = build_store_assortment(stores, sku_master, skus_per_store)
+    stock = np.random.randint(10, 200, len(inv_sku_ids))
+    
+    for i, snapshot_date in enumerate(snapshot_dates):
+        if i > 0:
+            stock = np.maximum(stock - np.random.randint(0, 30, len(stock)), 0)
+            reorder = stock < REORDER_POINT
+            stock[reorder] += np.random.randint(100, 200, int(reorder.sum()))
+        
+        snapshot = pd.DataFrame({
+            "store_id": inv_store_ids,
+            "sku_id": inv_sku_ids,
+            "stock_on_hand": stock,
+            "reorder_point": REORDER_POINT,
+            "snapshot_date": snapshot_date.date()
+        })
+        snapshot.to_csv(output_path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+    
+    print(f"Generated {len(inv_sku_ids) * len(snapshot_dates):,} inventory records")
+    return len(inv_sku_ids) * len(snapshot_dates)
+
 # ============================================================================
 # MAIN EXECUTION
 # ============================================================================
 if __name__ == "__main__":
-    print(f"Starting Data Generation... Saving to {config.RAW_DATA_DIR}")
+    parser = argparse.ArgumentParser(description="Generate the BlueMart synthetic dataset.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes used for sales generation (0 = all CPU cores). Output is identical for any value.")
+    parser.add_argument("--scale-factor", type=float, default=SCALE_FACTOR,
+                        help="Grow stores, SKUs, customers and sales volume together (1 = production volume).")
+    parser.add_argument("--stores", type=int, help="Override the scaled store count.")
+    parser.add_argument("--skus", type=int, help="Override the scaled SKU count.")
+    parser.add_argument("--customers", type=int, help="Override the scaled customer count.")
+    parser.add_argument("--daily-transactions", type=int, help="Override transactions per store per day.")
+    parser.add_argument("--start-date", help=f"First sales date (default {START_DATE}).")
+    parser.add_argument("--end-date", help=f"Last sales date (default {END_DATE}).")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv",
+                        help="Sales output: text CSV or month-partitioned Parquet (needs pyarrow).")
+    parser.add_argument("--inventory-freq", choices=["snapshot", "D", "W"], default="snapshot",
+                        help="Inventory history: a single end-date snapshot, or daily/weekly snapshots over the date range.")
+    parser.add_argument("--no-report", action="store_true",
+                        help=f"Skip the run report (also off when {instrumentation.ENV_TOGGLE}=0).")
+    args = parser.parse_args()
+    report = instrumentation.start_run("generate_data", enabled=not args.no_report, details=vars(args))
+    workers = args.workers if args.workers > 0 else os.cpu_count()
+    scale = resolve_scale(args.scale_factor, args.stores, args.skus, args.customers,
+                          args.daily_transactions, args.start_date, args.end_date)
     
-    stores = generate_stores()
-    skus = generate_skus()
-    promos = generate_promotions(START_DATE, END_DATE)
-    customers = generate_customers()
+    print(f"Starting Data Generation... Saving to {config.RAW_DATA_DIR}")
+    print(f"   Scale: SF {scale['scale_factor']:g} -> {scale['stores']:,} stores, {scale['skus']:,} SKUs, "
+          f"{scale['customers']:,} customers, {scale['daily_transactions']} tx/store/day, "
+          f"{scale['start_date']} to {scale['end_date']}")
     
-    # Save masters first
-    stores.to_csv(config.FILE_STORES, index=False)
-    skus.to_csv(config.FILE_SKUS, index=False)
-    promos.to_csv(config.FILE_PROMOTIONS, index=False)
-    customers.to_csv(config.FILE_CUSTOMERS, index=False)
+    with report.stage("masters") as stage:
+        stores = generate_stores(scale["stores"])
+        skus = generate_skus(scale["skus"])
+        promos = generate_promotions(scale["start_date"], scale["end_date"])
+        customers = generate_customers(scale["customers"], scale["start_date"])
+        
+        # Save masters first
+        stores.to_csv(config.FILE_STORES, index=False)
+        skus.to_csv(config.FILE_SKUS, index=False)
+        promos.to_csv(config.FILE_PROMOTIONS, index=False)
+        customers.to_csv(config.FILE_CUSTOMERS, index=False)
+        stage.add(rows=len(stores) + len(skus) + len(promos) + len(customers),
+                  bytes_written=sum(instrumentation.file_size(path) for path in (
+                      config.FILE_STORES, config.FILE_SKUS, config.FILE_PROMOTIONS, config.FILE_CUSTOMERS)))
     
     # Generate and save sales (streaming)
-    generate_sales(stores, skus, customers, promos, config.FILE_SALES)
+    sales_output = config.SALES_PARQUET_DIR if args.format == "parquet" else config.FILE_SALES
+    with report.stage("sales") as stage:
+        sales_rows = generate_sales(stores, skus, customers, promos, sales_output, workers=workers,
+                                    start_date=scale["start_date"], end_date=scale["end_date"],
+                                    daily_transactions=scale["daily_transactions"], output_format=args.format)
+        stage.add(rows=sales_rows, bytes_written=instrumentation.file_size(sales_output))
     
-    inventory = generate_inventory(stores, skus)
-    inventory.to_csv(config.FILE_INVENTORY, index=False)
+    with report.stage("inventory") as stage:
+        if args.inventory_freq == "snapshot":
+            inventory = generate_inventory(stores, skus, snapshot_date=scale["end_date"])
+            inventory.to_csv(config.FILE_INVENTORY, index=False)
+            inventory_rows = len(inventory)
+        else:
+            snapshot_dates = pd.date_range(scale["start_date"], scale["end_date"], freq=args.inventory_freq)
+            inventory_rows = generate_inventory_history(stores, skus, snapshot_dates, config.FILE_INVENTORY)
+        stage.add(rows=inventory_rows, bytes_written=instrumentation.file_size(config.FILE_INVENTORY))
     
+    report.write({"scale": scale})
     print("Data Generation Complete!")
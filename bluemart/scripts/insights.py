@@ -0,0 +1,184 @@
+"""
+BlueMart Insights
+Report sections (category, channel, city, month, top SKUs) from the processed tables.
+
+Every section is derived from a few small shared groupings:
+
+    segments  revenue, profit and quantity by month x category x channel
+    stores    revenue by store
+    skus      revenue by SKU (only when the heavy-hitter sketch cannot answer)
+
+They come from the rollups process_data writes when those exist. Otherwise
+the dashboard table is read once, with only the columns the report needs,
+and grouped once by month x category x channel x store; `segments` and
+`stores` are re-aggregated from that result. Paths come from config, so
+BLUEMART_DATA_DIR points the report at another dataset.
+"""
+
+import json
+import os
+import sys
+
+import pandas as pd
+
+# Add parent directory to path to import config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+from scripts import processed_io, rollups
+from scripts.sketches import SKU_CELL_COLUMNS, TOP_N_TOLERANCE, top_items
+
+SEGMENT_COLUMNS = ['month', 'category', 'channel']
+METRICS = ['revenue', 'profit', 'quantity']
+TOP_MONTHS = 3
+TOP_SKUS = 10
+OUTPUT_FORMATS = ['text', 'json']
+
+
+def _read_rollup(name, columns):
+    try:
+        return processed_io.read_table(rollups.rollup_table(name), columns=columns)
+    except FileNotFoundError:
+        return None
+
+
+def sketch_top_skus(n=TOP_SKUS):
+    """
+    Top `n` SKUs by revenue from the heavy-hitter sketch, or None when there
+    is no sketch or its answer is not guaranteed within tolerance.
+    """
+    entry = processed_io.table_entry(processed_io.SKU_SKETCH_TABLE)
+    if entry is None:
+        return None
+    sketch = processed_io.read_table(processed_io.SKU_SKETCH_TABLE)
+    top, guaranteed = top_items(sketch, entry['capacity'], n, SKU_CELL_COLUMNS, 'sku_id')
+    if not guaranteed or not (top['error'] <= TOP_N_TOLERANCE * top['revenue']).all():
+        return None
+    names = sketch[['sku_id', 'sku_name']].drop_duplicates('sku_id')
+    return top.merge(names, on='sku_id', how='left')[['sku_id', 'sku_name', 'revenue']]
+
+
+def load_groupings():
+    """The shared groupings (see module docstring) plus where they came from."""
+    segments = _read_rollup("category_channel_month", SEGMENT_COLUMNS + METRICS)
+    stores = _read_rollup("store_month", ['store_id', 'revenue'])
+    top_skus = sketch_top_skus()
+    skus = _read_rollup("sku_month", ['sku_id', 'sku_name', 'revenue']) if top_skus is None else None
+    source = "rollups"
+
+    if segments is None or stores is None or (top_skus is None and skus is None):
+        columns = SEGMENT_COLUMNS + ['store_id'] + METRICS + (['sku_id', 'sku_name'] if top_skus is None else [])
+        base = processed_io.read_table(processed_io.DASHBOARD_TABLE, columns=columns,
+                                       fallback=config.FILE_DASHBOARD_DATA)
+        cube = base.groupby(SEGMENT_COLUMNS + ['store_id'], observed=True)[METRICS].sum()
+        segments = cube.groupby(level=SEGMENT_COLUMNS, observed=True).sum().reset_index()
+        stores = cube.groupby(level='store_id', observed=True)['revenue'].sum().reset_index()
+        if top_skus is None:
+            skus = base[['sku_id', 'sku_name', 'revenue']]
+        source = processed_io.DASHBOARD_TABLE
+
+    if top_skus is None:
+        top_skus = (skus.groupby(['sku_id', 'sku_name'], observed=True)['revenue'].sum()
+                    .sort_values(ascending=False).head(TOP_SKUS).reset_index())
+        sku_source = "exact"
+    else:
+        sku_source = "sketch"
+    return {"segments": segments, "stores": stores, "top_skus": top_skus,
+            "source": source, "sku_source": sku_source}
+
+
+def _shares(totals):
+    return (totals / totals.sum() * 100).round(1)
+
+
+def compute_insights(groupings, summary_metrics=None):
+    """
+    Every report section from the shared groupings, as a dict of frames
+    (plus the summary metrics when given).
+    """
+    segments = groupings["segments"]
+
+    category = segments.groupby('category', observed=True)[METRICS].sum().sort_values('revenue', ascending=False)
+    category['margin_pct'] = (category['profit'] / category['revenue'] * 100).round(1)
+    category['revenue_share'] = _shares(category['revenue'])
+
+    channel = segments.groupby('channel', observed=True)['revenue'].sum().sort_values(ascending=False)
+    channel = pd.DataFrame({'revenue': channel, 'share_pct': _shares(channel)})
+
+    cities = pd.read_csv(config.FILE_STORES, usecols=['store_id', 'city'], dtype={'store_id': str})
+    stores = groupings["stores"].groupby('store_id', observed=True)['revenue'].sum().reset_index()
+    stores['store_id'] = stores['store_id'].astype(str)
+    city = stores.merge(cities, on='store_id').groupby('city')['revenue'].sum().sort_values(ascending=False)
+    city = pd.DataFrame({'revenue': city, 'share_pct': _shares(city)})
+
+    month = segments.groupby('month', observed=True)['revenue'].sum().sort_values(ascending=False).head(TOP_MONTHS)
+
+    return {
+        "category": category,
+        "channel": channel,
+        "city": city,
+        "top_months": month.to_frame(),
+        "top_skus": groupings["top_skus"].set_index(['sku_id', 'sku_name']),
+        "summary": summary_metrics,
+        "source": groupings["source"],
+        "sku_source": groupings["sku_source"],
+    }
+
+
+def load_summary_metrics():
+    if not config.FILE_SUMMARY_METRICS.exists():
+        return None
+    with open(config.FILE_SUMMARY_METRICS, 'r') as f:
+        return json.load(f)
+
+
+def extract_insights():
+    """Load the groupings and summary metrics and compute every section."""
+    return compute_insights(load_groupings(), load_summary_metrics())
+
+
+def _banner(title, first=False):
+    return ("" if first else "\n") + "=" * 60 + "\n" + title + "\n" + "=" * 60
+
+
+def format_text(insights):
+    """The plain-text report."""
+    lines = [_banner("CATEGORY PERFORMANCE", first=True), insights["category"].to_string()]
+
+    lines.append(_banner("CHANNEL DISTRIBUTION"))
+    for channel, row in insights["channel"].iterrows():
+        lines.append(f"{channel:15s}: {row['share_pct']:5.1f}% (AED {row['revenue']/1e6:,.1f}M)")
+
+    lines.append(_banner("CITY PERFORMANCE"))
+    for city, row in insights["city"].iterrows():
+        lines.append(f"{city:15s}: {row['share_pct']:5.1f}% (AED {row['revenue']/1e6:,.1f}M)")
+
+    lines.append(_banner(f"TOP {TOP_MONTHS} REVENUE MONTHS"))
+    for month, rev in insights["top_months"]['revenue'].items():
+        lines.append(f"{month:15s}: AED {rev/1e6:,.1f}M")
+
+    lines.append(_banner(f"TOP {TOP_SKUS} SKUs BY REVENUE"))
+    for (sku_id, sku_name), rev in insights["top_skus"]['revenue'].items():
+        lines.append(f"{sku_name[:40]:40s}: AED {rev/1e6:,.2f}M")
+
+    metrics = insights["summary"]
+    if metrics is not None:
+        lines.append(_banner("SUMMARY METRICS"))
+        lines.append(f"Total Revenue:     AED {metrics['total_revenue']/1e6:,.1f}M")
+        lines.append(f"Total Profit:      AED {metrics['total_profit']/1e6:,.1f}M")
+        lines.append(f"Gross Margin:      {metrics['total_profit']/metrics['total_revenue']*100:.1f}%")
+        lines.append(f"Total Units Sold:  {metrics['total_quantity']/1e6:,.1f}M")
+        lines.append(f"Avg Order Value:   AED {metrics['avg_revenue_per_order']:.2f}")
+        lines.append(f"Avg Order Profit:  AED {metrics['avg_profit_per_order']:.2f}")
+    return "\n".join(lines)
+
+
+def to_json(insights):
+    """The report as a JSON document: one list of records per section."""
+    document = {}
+    for key, value in insights.items():
+        if isinstance(value, pd.DataFrame):
+            document[key] = json.loads(value.reset_index().to_json(orient='records'))
+        else:
+            document[key] = value
+    document["data_dir"] = str(config.DATA_DIR)
+    return json.dumps(document, indent=2)
@@ -0,0 +1,166 @@
+"""
+BlueMart Run Instrumentation
+Per-stage timings, throughput and memory for the pipeline scripts.
+
+A script opens a report, wraps each stage in `report.stage(name)` and tells
+the stage how much it did:
+
+    report = instrumentation.start_run("process_data", enabled=not args.no_report)
+    with report.stage("aggregate") as stage:
+        ...
+        stage.add(rows=len(chunk), bytes_read=n)
+    report.write()
+
+Each stage records wall time, CPU time (including finished worker
+processes), rows per second, bytes read and written and peak RSS. The report
+is written to data/processed/run_report_<script>.json and appended as one
+line to run_reports.jsonl, so runs can be compared over time.
+
+When disabled (`--no-report` or BLUEMART_REPORT=0) `start_run` returns a
+report whose stages are a shared no-op context manager.
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is then omitted
+    resource = None
+
+# Add parent directory to path to import config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+
+ENV_TOGGLE = "BLUEMART_REPORT"
+
+
+def reporting_enabled(enabled=True):
+    return enabled and os.environ.get(ENV_TOGGLE, "1") != "0"
+
+
+def _cpu_seconds():
+    """CPU time of this process plus any worker processes that have exited."""
+    if resource is None:
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process or its largest finished worker."""
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def file_size(path):
+    """Size of a file, or the total size of the files under a directory."""
+    path = Path(path)
+    if path.is_dir():
+        return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+    return path.stat().st_size if path.exists() else 0
+
+
+class Stage:
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def add(self, rows=0, bytes_read=0, bytes_written=0):
+        self.rows += rows
+        self.bytes_read += bytes_read
+        self.bytes_written += bytes_written
+
+
+class RunReport:
+    def __init__(self, script, details=None):
+        self.script = script
+        self.details = details or {}
+        self.started_at = datetime.now()
+        self.wall_start = time.perf_counter()
+        self.cpu_start = _cpu_seconds()
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        stage = Stage(name)
+        wall_start, cpu_start = time.perf_counter(), _cpu_seconds()
+        try:
+            yield stage
+        finally:
+            wall = time.perf_counter() - wall_start
+            self.stages.append({
+                "name": name,
+                "wall_s": round(wall, 4),
+                "cpu_s": round(_cpu_seconds() - cpu_start, 4),
+                "rows": stage.rows,
+                "rows_per_s": round(stage.rows / wall, 1) if wall > 0 else None,
+                "bytes_read": stage.bytes_read,
+                "bytes_written": stage.bytes_written,
+                "peak_rss_mb": peak_rss_mb(),
+            })
+
+    def to_dict(self):
+        return {
+            "script": self.script,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "details": self.details,
+            "wall_s": round(time.perf_counter() - self.wall_start, 4),
+            "cpu_s": round(_cpu_seconds() - self.cpu_start, 4),
+            "rows": sum(stage["rows"] for stage in self.stages),
+            "bytes_read": sum(stage["bytes_read"] for stage in self.stages),
+            "bytes_written": sum(stage["bytes_written"] for stage in self.stages),
+            "peak_rss_mb": peak_rss_mb(),
+            "stages": self.stages,
+        }
+
+    def write(self, extra=None):
+        """Write the latest report for this script and append it to the run history."""
+        report = self.to_dict()
+        report.update(extra or {})
+        Path(config.PROCESSED_DATA_DIR).mkdir(parents=True, exist_ok=True)
+        path = Path(config.PROCESSED_DATA_DIR) / f"run_report_{self.script}.json"
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+        with open(config.FILE_RUN_HISTORY, "a") as f:
+            f.write(json.dumps(report) + "\n")
+        print(f"Run report saved to {path} ({report['wall_s']:.1f}s wall, peak RSS {report['peak_rss_mb']} MB)")
+        return report
+
+
+class NullStage:
+    def add(self, rows=0, bytes_read=0, bytes_written=0):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class NullReport:
+    """Report used when instrumentation is off: every hook is a no-op."""
+    _stage = NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def write(self, extra=None):
+        return None
+
+
+def start_run(script, enabled=True, details=None):
+    return RunReport(script, details) if reporting_enabled(enabled) else NullReport()
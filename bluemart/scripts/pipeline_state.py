@@ -0,0 +1,209 @@
+"""
+BlueMart Pipeline State
+Watermarks and saved aggregates for incremental processing.
+
+After each run process_data saves its aggregates (line items, order
+counts and, with a customer master, customer totals), the channel vocabulary and the global metric totals, plus a watermark describing how
+much raw sales it has consumed:
+
+- CSV: the byte offset reached, with hashes of the file's first block and
+  of the block just before the offset to detect a rewritten file. Rows
+  appended later may continue the file's last order, so the offset stops
+  at that order's first line: the saved state leaves it out and the next
+  run reads it again, whole (see sales_io.split_trailing_order).
+- Parquet: the part files read, with their sizes and modification times.
+- Column store: the rows read and the store's build time. Conversion always
+  writes a fresh store, so a reconverted store means a full rebuild.
+
+The next run only reads data past the watermark and merges it into the saved
+state. Anything that would make the saved state wrong (different masters,
+rewritten or removed data, another source format) forces a full rebuild.
+"""
+
+import hashlib
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add parent directory to path to import config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+from scripts import sales_io
+
+STATE_VERSION = 6
+FINGERPRINT_BYTES = 64 * 1024
+
+
+def watermark_path():
+    return Path(config.PIPELINE_STATE_DIR) / "watermark.json"
+
+
+def masters_signature():
+    """
+    Hash of the master files the aggregates depend on; saved aggregates are
+    only valid against the same masters. The customer master is optional,
+    so adding or removing it changes the hash as well.
+    """
+    digest = hashlib.sha1()
+    for path in (config.FILE_SKUS, config.FILE_STORES, config.FILE_CUSTOMERS):
+        if not os.path.exists(path):
+            digest.update(f"no {Path(path).name}".encode())
+            continue
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def _block_hash(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(max(start, 0))
+        return hashlib.sha1(f.read(length)).hexdigest()
+
+
+def csv_watermark(path, offset):
+    return {
+        "offset": offset,
+        "head_hash": _block_hash(path, 0, min(offset, FINGERPRINT_BYTES)),
+        "tail_hash": _block_hash(path, offset - FINGERPRINT_BYTES, min(offset, FINGERPRINT_BYTES)),
+    }
+
+
+def parquet_watermark(shards, previous=None):
+    files = dict(previous["files"]) if previous else {}
+    for shard in shards:
+        stat = Path(shard["path"]).stat()
+        files[shard["path"]] = [stat.st_size, stat.st_mtime_ns]
+    return {"files": files}
+
+
+def column_store_watermark(rows):
+    with open(sales_io.column_store_meta_path()) as f:
+        return {"rows": rows, "built_at": json.load(f)["built_at"]}
+
+
+def build_watermark(source, shards, previous=None):
+    """Watermark after reading `shards` on top of an optional previous watermark."""
+    if source == "parquet":
+        return parquet_watermark(shards, previous)
+    if source == "columns":
+        return column_store_watermark(shards[-1]["end"]) if shards else previous
+    if shards:
+        last = shards[-1]
+        return csv_watermark(last["path"], last["start"] if last.get("held_back") else last["end"])
+    return previous
+
+
+def plan_delta_shards(source, watermark):
+    """
+    Shards holding data past the watermark, or None when the raw data no
+    longer matches it and a full rebuild is needed.
+    """
+    if source == "parquet":
+        seen = watermark["files"]
+        for path, (size, mtime_ns) in seen.items():
+            if not Path(path).exists():
+                return None
+            stat = Path(path).stat()
+            if [stat.st_size, stat.st_mtime_ns] != [size, mtime_ns]:
+                return None
+        return [shard for shard in sales_io.plan_sales_shards("parquet") if shard["path"] not in seen]
+
+    if source == "columns":
+        if not sales_io.column_store_meta_path().exists():
+            return None
+        if column_store_watermark(watermark["rows"]) != watermark:
+            return None
+        return sales_io.plan_column_shards(start_row=watermark["rows"])
+
+    path = config.FILE_SALES
+    offset = watermark["offset"]
+    if not Path(path).exists() or Path(path).stat().st_size < offset:
+        return None
+    if csv_watermark(path, offset) != watermark:
+        return None
+    return sales_io.plan_csv_shards(path, start_offset=offset)
+
+
+def load_state(source, templates, total_tolerance):
+    """
+    Saved (aggregators, channels, metrics, watermark) for `source`, or None if
+    there is no usable state. `templates` maps each aggregate name to an
+    empty aggregator with the layout the current masters produce; the state
+    must also have been built with the same total_value check.
+    """
+    if not watermark_path().exists():
+        return None
+    with open(watermark_path()) as f:
+        state = json.load(f)
+    if state.get("version") != STATE_VERSION or state["source"] != source:
+        return None
+    if state["masters_signature"] != masters_signature() or state.get("total_tolerance") != total_tolerance:
+        return None
+    if set(state["aggregate_files"]) != set(templates):
+        return None
+
+    aggregators = {}
+    for name, template in templates.items():
+        aggregate_path = watermark_path().parent / state["aggregate_files"][name]
+        if not aggregate_path.exists():
+            return None
+        aggregators[name] = type(template).load(aggregate_path)
+        if not aggregators[name].same_layout(template):
+            return None
+    return {
+        "aggregators": aggregators,
+        "channels": state["channels"],
+        "metrics": state["metrics"],
+        "watermark": state["watermark"],
+        "rejects_bytes": state["rejects_bytes"],
+    }
+
+
+def write_state(source, aggregators, channels, metrics, watermark, total_tolerance):
+    """
+    Write new aggregate files and return the state that points at them.
+    Nothing changes for the next run until the state is committed.
+    """
+    state_dir = watermark_path().parent
+    state_dir.mkdir(parents=True, exist_ok=True)
+
+    stamp = f"{datetime.now():%Y%m%dT%H%M%S%f}"
+    aggregate_files = {}
+    for name, aggregator in aggregators.items():
+        aggregate_files[name] = f"{name}_aggregate-{stamp}.npz"
+        aggregator.save(state_dir / aggregate_files[name])
+
+    return {
+        "version": STATE_VERSION,
+        "source": source,
+        "updated_at": datetime.now().isoformat(timespec="seconds"),
+        "masters_signature": masters_signature(),
+        "total_tolerance": total_tolerance,
+        "aggregate_files": aggregate_files,
+        "channels": list(channels),
+        "metrics": {key: value.item() if hasattr(value, "item") else value for key, value in metrics.items()},
+        "watermark": watermark,
+        "rejects_bytes": None,
+    }
+
+
+def commit_state(state, rejects_bytes=None):
+    """
+    Atomically swap the watermark to a state from write_state, then remove
+    the aggregate files it no longer uses. A crash at any point leaves the
+    previous state intact. `rejects_bytes` is how much of the quarantine
+    file the state accounts for (see validation.collect_rejects).
+    """
+    state_dir = watermark_path().parent
+    state = dict(state, rejects_bytes=rejects_bytes)
+    temp_watermark = watermark_path().with_suffix(".tmp")
+    with open(temp_watermark, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_watermark, watermark_path())
+
+    current = set(state["aggregate_files"].values())
+    for path in state_dir.glob("*_aggregate-*.npz"):
+        if path.name not in current:
+            path.unlink()
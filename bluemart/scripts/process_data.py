@@ -7,183 +7,511 @@ import pandas as pd
 import numpy as np
 import sys
 import os
+import argparse
+import calendar
+from concurrent.futures import ProcessPoolExecutor
 
 # Add parent directory to path to import config
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import config
+from scripts import customers, daily, instrumentation, pipeline_state, processed_io, rollups, sales_io, sketches, validation
+from scripts.aggregation import DenseKeyAggregator
+from scripts.dimensions import DenseLookup, Vocabulary
 
-def process_data():
-    print("Starting Data Processing...")
-    
-    # 1. Load Master Data (Small enough for memory)
-    try:
-        print("   Loading master data...")
-        skus = pd.read_csv(config.FILE_SKUS)
-        stores = pd.read_csv(config.FILE_STORES)
-        promos = pd.read_csv(config.FILE_PROMOTIONS, parse_dates=['start_date', 'end_date'])
-    except FileNotFoundError as e:
-        print(f"Error loading files: {e}")
-        print("   Please run scripts/generate_data.py first.")
-        return
+# Dashboard grain: (year, month) period, store, category, channel, sku
+BASE_YEAR = 2000
+PERIOD_RADIX = 12 * 200  # Months from BASE_YEAR through BASE_YEAR + 199
+MAX_CHANNELS = 256
+# Dates every key can encode (half-open): the period key from BASE_YEAR and the daily key from daily.EPOCH
+DATE_RANGE = (max(np.datetime64(f'{BASE_YEAR}-01-01'), daily.EPOCH),
+              min(np.datetime64(f'{BASE_YEAR + PERIOD_RADIX // 12}-01-01'), daily.EPOCH + daily.DAY_RADIX))
+# `lines` counts line items; `orders` counts distinct orders per key, which
+# at this grain is the number of orders that contain the SKU
+AGG_METRICS = ['revenue', 'profit', 'quantity', 'lines', 'orders']
 
-    # Pre-process promos for faster lookup
-    promos = promos.sort_values('start_date')
-    promo_lookup = {}
-    for _, row in promos.iterrows():
-        for d in pd.date_range(row['start_date'], row['end_date']):
-            promo_lookup[d] = row['promo_name']
 
-    # Initialize aggregation containers
-    partial_aggregates = []
-    
-    # Global metrics counters
-    global_metrics = {
+def period_codes(dates):
+    """Encode dates as months since January of BASE_YEAR."""
+    return (dates.dt.year.to_numpy() - BASE_YEAR) * 12 + dates.dt.month.to_numpy() - 1
+
+
+def build_dashboard_aggregator(sku_lookup, store_lookup):
+    return DenseKeyAggregator(
+        [('period', PERIOD_RADIX),
+         ('store', store_lookup.size),
+         ('category', len(sku_lookup.categories['category'])),
+         ('channel', MAX_CHANNELS),
+         ('sku', sku_lookup.size)],
+        AGG_METRICS
+    )
+
+
+def build_order_aggregator(sku_lookup, store_lookup):
+    """
+    Order counts by (period, store, channel, category bitmask). Period, store
+    and channel are fixed per order and the mask records which categories the
+    order contains, so this counts orders exactly under any filter on those
+    dimensions, including category filters (mask & selected != 0).
+    """
+    return DenseKeyAggregator(
+        [('period', PERIOD_RADIX),
+         ('store', store_lookup.size),
+         ('channel', MAX_CHANNELS),
+         ('category_mask', 2 ** len(sku_lookup.categories['category']))],
+        ['orders']
+    )
+
+
+def build_daily_aggregator(sku_lookup, store_lookup):
+    """Sales by (day, store, category, channel); keys are day-major, so output is sorted by day."""
+    return DenseKeyAggregator(
+        [('day', daily.DAY_RADIX),
+         ('store', store_lookup.size),
+         ('category', len(sku_lookup.categories['category'])),
+         ('channel', MAX_CHANNELS)],
+        AGG_METRICS
+    )
+
+
+def build_sku_sketch(sku_lookup, store_lookup):
+    """Heavy-hitter SKUs by revenue for every (period, store, category) cell."""
+    return sketches.HeavyHitterSketch(
+        [('period', PERIOD_RADIX),
+         ('store', store_lookup.size),
+         ('category', len(sku_lookup.categories['category']))],
+        sku_lookup.size
+    )
+
+
+def build_loyalty_aggregator(customer_lookup):
+    """Sales by (period, loyalty tier, channel); the last two tiers hold walk-in sales and unknown ids."""
+    return DenseKeyAggregator(
+        [('period', PERIOD_RADIX),
+         ('tier', len(customers.tier_names(customer_lookup))),
+         ('channel', MAX_CHANNELS)],
+        AGG_METRICS
+    )
+
+
+def build_aggregators(sku_lookup, store_lookup, customer_lookup=None):
+    aggregators = {
+        'lines': build_dashboard_aggregator(sku_lookup, store_lookup),
+        'orders': build_order_aggregator(sku_lookup, store_lookup),
+        'daily': build_daily_aggregator(sku_lookup, store_lookup),
+        'sku_sketch': build_sku_sketch(sku_lookup, store_lookup),
+    }
+    # Customer aggregates need the customer master to size their arrays
+    if customer_lookup is not None:
+        aggregators['customers'] = customers.CustomerAggregator(customers.slot_count(customer_lookup))
+        aggregators['loyalty'] = build_loyalty_aggregator(customer_lookup)
+    return aggregators
+
+
+def decode_dashboard_aggregate(aggregator, sku_lookup, channel_vocab):
+    """Turn aggregated key codes back into the dashboard's month/year/id columns."""
+    codes = aggregator.to_frame()
+    year, month = np.divmod(codes['period'].to_numpy(), 12)
+    return pd.DataFrame({
+        'month': np.array(calendar.month_name[1:])[month],
+        'year': BASE_YEAR + year,
+        'store_id': codes['store'],
+        'category': pd.Categorical.from_codes(codes['category'], sku_lookup.categories['category']),
+        'channel': channel_vocab.decode(codes['channel'].to_numpy()),
+        'sku_id': codes['sku'],
+        'revenue': codes['revenue'],
+        'profit': codes['profit'],
+        'quantity': codes['quantity'].round().astype('int64'),
+        'lines': codes['lines'].round().astype('int64'),
+        'orders': codes['orders'].round().astype('int64')
+    })
+
+
+def decode_order_counts(aggregator, channel_vocab):
+    """Order counts with the dashboard's month/year/id columns and the raw category bitmask."""
+    codes = aggregator.to_frame()
+    year, month = np.divmod(codes['period'].to_numpy(), 12)
+    return pd.DataFrame({
+        'month': np.array(calendar.month_name[1:])[month],
+        'year': BASE_YEAR + year,
+        'store_id': codes['store'],
+        'channel': channel_vocab.decode(codes['channel'].to_numpy()),
+        'category_mask': codes['category_mask'],
+        'orders': codes['orders'].round().astype('int64')
+    })
+
+
+def decode_daily_aggregate(aggregator, sku_lookup, channel_vocab):
+    """Daily rows with integer day offsets, in day order."""
+    codes = aggregator.to_frame()
+    return pd.DataFrame({
+        'day': codes['day'].astype('int32'),
+        'store_id': codes['store'],
+        'category': pd.Categorical.from_codes(codes['category'], sku_lookup.categories['category']),
+        'channel': channel_vocab.decode(codes['channel'].to_numpy()),
+        'revenue': codes['revenue'],
+        'profit': codes['profit'],
+        'quantity': codes['quantity'].round().astype('int64'),
+        'lines': codes['lines'].round().astype('int64'),
+        'orders': codes['orders'].round().astype('int64')
+    })
+
+
+def decode_sku_sketch(sketch, sku_lookup):
+    """Tracked SKUs per month/store/category cell with their revenue estimate and error."""
+    codes = sketch.to_frame()
+    year, month = np.divmod(codes['period'].to_numpy(), 12)
+    return pd.DataFrame({
+        'month': np.array(calendar.month_name[1:])[month],
+        'year': BASE_YEAR + year,
+        'store_id': codes['store'],
+        'category': pd.Categorical.from_codes(codes['category'], sku_lookup.categories['category']),
+        'sku_id': codes['item'],
+        'revenue': codes['estimate'],
+        'error': codes['error']
+    })
+
+
+def decode_loyalty_aggregate(aggregator, customer_lookup, channel_vocab):
+    """Sales by month, loyalty tier and channel, with walk-in sales and unknown ids as their own tiers."""
+    codes = aggregator.to_frame()
+    year, month = np.divmod(codes['period'].to_numpy(), 12)
+    tiers = customers.tier_names(customer_lookup)
+    return pd.DataFrame({
+        'month': np.array(calendar.month_name[1:])[month],
+        'year': BASE_YEAR + year,
+        'loyalty_segment': pd.Categorical.from_codes(codes['tier'], tiers),
+        'channel': channel_vocab.decode(codes['channel'].to_numpy()),
+        'revenue': codes['revenue'],
+        'profit': codes['profit'],
+        'quantity': codes['quantity'].round().astype('int64'),
+        'lines': codes['lines'].round().astype('int64'),
+        'orders': codes['orders'].round().astype('int64')
+    })
+
+
+# Raw sales columns and types read by the pipeline
+USE_COLS = ['date', 'store_id', 'sku_id', 'customer_id', 'quantity', 'unit_price', 'total_value', 'channel', 'transaction_id']
+DTYPE_SPEC = {
+    'transaction_id': 'int64',
+    'customer_id': 'Int64',  # Nullable: walk-in sales have no customer
+    'store_id': 'int32',
+    'sku_id': 'int32',
+    'quantity': 'int32',
+    'unit_price': 'float64',
+    'total_value': 'float32',
+    'channel': 'category'
+}
+CHUNK_SIZE = 50000  # Reduced from 100,000 to prevent OOM
+
+
+def new_global_metrics():
+    return {
         "total_revenue": 0.0,
         "total_profit": 0.0,
         "total_quantity": 0,
-        "count": 0
+        "count": 0,
+        "orders": 0,
+        "rejected_rows": 0,
+        **validation.reject_counts(None)
     }
+
+
+def order_starts(order_ids):
+    """Row positions where a new order begins (lines of an order are contiguous)."""
+    if len(order_ids) == 0:
+        return np.empty(0, dtype=np.int64)
+    return np.flatnonzero(np.r_[True, order_ids[1:] != order_ids[:-1]])
+
+
+def process_chunk(chunk, context, aggregators, channel_vocab, metrics):
+    """
+    Validate one chunk, update the running metrics and accumulate its valid
+    rows into the line, order, daily, sketch and (with a customer master)
+    customer aggregates. The chunk must hold whole orders. Returns the
+    rejected rows (or None).
+    """
+    sku_lookup = context["sku_lookup"]
+    store_lookup = context["store_lookup"]
     
-    chunk_size = 50000  # Reduced from 100,000 to prevent OOM
-    print(f"   Processing sales data in chunks of {chunk_size}...")
+    # Data quality: bad rows (unknown ids, bad dates, embedded headers, ...) are
+    # split off here, so everything below only sees valid, typed rows
+    chunk, rejects = validation.validate_chunk(chunk, sku_lookup, store_lookup, DTYPE_SPEC, context["total_tolerance"],
+                                               channel_vocab, MAX_CHANNELS, DATE_RANGE)
+    if rejects is not None:
+        metrics["rejected_rows"] += len(rejects)
+        for key, count in validation.reject_counts(rejects).items():
+            metrics[key] += count
     
-    try:
-        # Process Sales in Chunks
-        # Optimization: Read only necessary columns and specify types
-        use_cols = ['date', 'store_id', 'sku_id', 'quantity', 'total_value', 'channel']
-        dtype_spec = {
-            'store_id': 'int32',
-            'sku_id': 'int32',
-            'quantity': 'int32',
-            'total_value': 'float32',
-            'channel': 'category'
-        }
-        
-        chunk_iter = pd.read_csv(
-            config.FILE_SALES, 
-            chunksize=chunk_size, 
-            usecols=use_cols, 
-            dtype=dtype_spec,
-            parse_dates=['date'] # Parse dates directly to avoid later conversion overhead
+    # Attach SKU attributes by array indexing (names are merged once at the end)
+    sku_ids = chunk['sku_id'].to_numpy()
+    chunk['category'] = sku_lookup.get('category', sku_ids)
+    chunk['cost_price'] = sku_lookup.get('cost_price', sku_ids)
+    chunk['revenue'] = chunk['total_value'].astype('float64')  # float64 so totals don't depend on chunk boundaries
+    chunk['profit'] = chunk['revenue'] - (chunk['cost_price'] * chunk['quantity'])
+    
+    # Update Global Metrics
+    metrics["total_revenue"] += chunk['revenue'].sum()
+    metrics["total_profit"] += chunk['profit'].sum()
+    metrics["total_quantity"] += int(chunk['quantity'].sum())
+    metrics["count"] += len(chunk)
+    metrics["orders"] += len(order_starts(chunk['transaction_id'].to_numpy()))
+    
+    # Accumulate into the dashboard aggregate
+    store_ids = chunk['store_id'].to_numpy()
+    codes = {
+        'period': period_codes(chunk['date']),
+        'store': store_lookup.positions(store_ids),
+        'category': sku_lookup.codes('category', sku_ids),
+        'channel': channel_vocab.encode(chunk['channel']),
+        'sku': sku_lookup.positions(sku_ids)
+    }
+    order_ids = chunk['transaction_id'].to_numpy()
+
+    # An order counts once per SKU key: flag the first line of each (order, SKU) pair
+    first_in_order = np.zeros(len(order_ids))
+    first_in_order[np.unique(order_ids * sku_lookup.size + codes['sku'], return_index=True)[1]] = 1
+    values = {metric: chunk[metric].to_numpy() for metric in ['revenue', 'profit', 'quantity']}
+    values['lines'] = np.ones(len(order_ids))
+    values['orders'] = first_in_order
+    aggregators['lines'].add(codes, values)
+
+    # Daily grain: an order counts once per category it has a line in
+    days = daily.day_numbers(chunk['date'])
+    first_in_category = np.zeros(len(order_ids))
+    first_in_category[np.unique(order_ids * len(sku_lookup.categories['category']) + codes['category'], return_index=True)[1]] = 1
+    aggregators['daily'].add(
+        {'day': days, 'store': codes['store'], 'category': codes['category'], 'channel': codes['channel']},
+        dict(values, orders=first_in_category)
+    )
+
+    # Bounded-memory top SKUs per cell; SpaceSaving weights must not be negative
+    aggregators['sku_sketch'].add(
+        {'period': codes['period'], 'store': codes['store'], 'category': codes['category']},
+        codes['sku'], np.maximum(values['revenue'], 0)
+    )
+
+    # One row per order with the OR of its lines' category bits
+    starts = order_starts(order_ids)
+    if len(starts):
+        category_bits = np.left_shift(np.int64(1), codes['category'].astype(np.int64))
+        aggregators['orders'].add(
+            {
+                'period': codes['period'][starts],
+                'store': codes['store'][starts],
+                'channel': codes['channel'][starts],
+                'category_mask': np.bitwise_or.reduceat(category_bits, starts)
+            },
+            {'orders': np.ones(len(starts))}
         )
+
+    # Per-customer RFM and channel mix plus sales by loyalty tier, in the same pass
+    customer_lookup = context["customer_lookup"]
+    if customer_lookup is not None:
+        slots = customers.customer_slots(customer_lookup, chunk['customer_id'])
+        line_values = {metric: values[metric] for metric in customers.LINE_METRICS}
+        aggregators['customers'].add(slots, days, codes['channel'], line_values, starts)
+        first_line = np.zeros(len(slots))
+        first_line[starts] = 1
+        aggregators['loyalty'].add(
+            {'period': codes['period'], 'tier': customers.tier_codes(customer_lookup, slots), 'channel': codes['channel']},
+            dict(line_values, orders=first_line)
+        )
+    return rejects
+
+
+def process_shard(shard, context):
+    """
+    Map step: aggregate one shard of raw sales on its own.
+    Returns the partial aggregates, the channel names behind their codes and
+    partial global metrics, all small enough to ship back from a worker.
+    Shards hold whole orders, and chunks are re-cut so orders never straddle them.
+    Rejected rows are appended to this shard's quarantine part file with
+    every raw sales column as stored, not just the columns read here.
+    """
+    aggregators = build_aggregators(context["sku_lookup"], context["store_lookup"], context["customer_lookup"])
+    channel_vocab = Vocabulary()
+    metrics = new_global_metrics()
+    raw_rows = sales_io.ShardRows(shard)
+    row = 0
+    chunks = sales_io.iter_shard_chunks(shard, USE_COLS, CHUNK_SIZE, DTYPE_SPEC, lenient=True)
+    for chunk in sales_io.iter_whole_orders(chunks):
+        rejects = process_chunk(chunk, context, aggregators, channel_vocab, metrics)
+        if rejects is not None:
+            quarantined = raw_rows.take(row + rejects.index.to_numpy())
+            quarantined['reason'] = rejects['reason'].to_numpy()
+            validation.write_rejects(validation.part_path(config.PROCESSED_DATA_DIR, shard["index"]), quarantined)
+        row += len(chunk)
+    for aggregator in aggregators.values():
+        aggregator.flush()
+    return {"aggregators": aggregators, "channels": list(channel_vocab.categories()), "metrics": metrics}
+
+
+def reduce_shard(result, aggregators, channel_vocab, global_metrics):
+    """Reduce step: fold one shard result into the run totals."""
+    channel_remap = channel_vocab.encode(result["channels"])
+    if len(channel_vocab) > MAX_CHANNELS:
+        # Each shard keeps to MAX_CHANNELS on its own, but together they may not
+        raise ValueError(f"Sales hold more than {MAX_CHANNELS} distinct channels; the aggregates key at most {MAX_CHANNELS}")
+    for name, aggregator in aggregators.items():
+        aggregator.merge(result["aggregators"][name], remap={'channel': channel_remap})
+    for key, value in result["metrics"].items():
+        global_metrics[key] += value
+
+
+def run_shards(shards, context, workers=1):
+    """
+    Yield shard results in plan order. Results are always reduced in that
+    order, so a parallel run is identical to a serial one.
+    """
+    if workers > 1 and len(shards) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            yield from executor.map(process_shard, shards, [context] * len(shards))
+    else:
+        for shard in shards:
+            yield process_shard(shard, context)
+
+
+def process_data(source="auto", months=None, workers=1, full_rebuild=False, report=None,
+                 total_tolerance=validation.TOTAL_TOLERANCE):
+    print("Starting Data Processing...")
+    report = report or instrumentation.NullReport()
+    if total_tolerance is None:
+        print("   Warning: the total_value check is off; rows whose total_value does not match "
+              "unit_price x quantity are aggregated as they are.")
+    elif total_tolerance != validation.TOTAL_TOLERANCE:
+        print(f"   Warning: total_value may differ from unit_price x quantity by up to {total_tolerance} "
+              f"(default {validation.TOTAL_TOLERANCE}).")
+    
+    # 1. Load Master Data (Small enough for memory)
+    with report.stage("load_masters") as stage:
+        try:
+            print("   Loading master data...")
+            skus = pd.read_csv(config.FILE_SKUS)
+            stores = pd.read_csv(config.FILE_STORES)
+            # Optional: without it the customer aggregates are skipped
+            customers_master = pd.read_csv(config.FILE_CUSTOMERS) if os.path.exists(config.FILE_CUSTOMERS) else None
+        except FileNotFoundError as e:
+            print(f"Error loading files: {e}")
+            print("   Please run scripts/generate_data.py first.")
+            return
+        stage.add(rows=len(skus) + len(stores) + (len(customers_master) if customers_master is not None else 0),
+                  bytes_read=sum(instrumentation.file_size(path) for path in (config.FILE_SKUS, config.FILE_STORES, config.FILE_CUSTOMERS)))
+
+        # Dense id-indexed attribute arrays replace per-chunk merges with the masters
+        sku_lookup = DenseLookup(skus, 'sku_id', ['cost_price', 'category'])
+        store_lookup = DenseLookup(stores, 'store_id', [])
+        customer_lookup = DenseLookup(customers_master, 'cust_id', ['loyalty_segment']) if customers_master is not None else None
+
+    context = {"sku_lookup": sku_lookup, "store_lookup": store_lookup, "customer_lookup": customer_lookup,
+               "total_tolerance": total_tolerance}
+
+    # Initialize aggregation containers
+    # One integer key per (period, store, category, channel, sku), summed in
+    # place, plus order counts by (period, store, channel, category bitmask)
+    # and, with a customer master, per-customer totals and sales by loyalty tier
+    aggregators = build_aggregators(sku_lookup, store_lookup, customer_lookup)
+    channel_vocab = Vocabulary()
+    global_metrics = new_global_metrics()
+    
+    try:
+        # Process Sales in shards (CSV byte ranges or Parquet part files),
+        # each read in chunks with only the necessary columns and types
+        source = sales_io.resolve_sales_source(source)
         
-        for i, chunk in enumerate(chunk_iter):
-            # Data Cleaning & Type Enforcement not needed as much with dtype_spec, 
-            # but good to be safe on IDs if they were somehow NaN (though int32 would fail on NaN)
-            # If we have NaNs, read_csv with int32 might fail. 
-            # Safe approach: Let read_csv handle it, if it fails we might need Int32 (nullable)
-            # But generated data shouldn't have NaNs in IDs.
-            
-            # Merge
-            chunk = chunk.merge(skus, on='sku_id', how='left').merge(stores, on='store_id', how='left')
-            
-            # Feature Engineering
-            # Date is already parsed by read_csv
-            # Drop rows with invalid dates
-            chunk = chunk.dropna(subset=['date'])
-            chunk['promo_name'] = chunk['date'].map(promo_lookup).fillna('No Promotion')
-            chunk['month'] = chunk['date'].dt.month_name()
-            chunk['year'] = chunk['date'].dt.year
-            chunk['revenue'] = chunk['total_value']
-            chunk['profit'] = chunk['revenue'] - (chunk['cost_price'] * chunk['quantity'])
-            
-            # Update Global Metrics
-            global_metrics["total_revenue"] += chunk['revenue'].sum()
-            global_metrics["total_profit"] += chunk['profit'].sum()
-            global_metrics["total_quantity"] += int(chunk['quantity'].sum())
-            global_metrics["count"] += len(chunk)
+        # Incremental mode: resume from the saved aggregate and read only data
+        # past the watermark. Month-filtered runs are ad hoc and keep no state.
+        with report.stage("plan"):
+            track_state = not months
+            state = None
+            if track_state and not full_rebuild:
+                state = pipeline_state.load_state(source, aggregators, total_tolerance)
+            shards = pipeline_state.plan_delta_shards(source, state["watermark"]) if state else None
             
-            # Partial Aggregation for Dashboard
-            # Group by key dimensions to reduce size immediately
-            # OPTIMIZATION: Group by IDs only to avoid string overhead and Cartesian product issues
-            # We will merge names back at the very end.
-            grouped_chunk = chunk.groupby(
-                ['month', 'year', 'store_id', 'category', 'channel', 'sku_id'],
-                observed=True # CRITICAL: Only group observed combinations, not all categoricals
-            ).agg(
-                revenue=('revenue', 'sum'),
-                profit=('profit', 'sum'),
-                quantity=('quantity', 'sum')
-            ).reset_index()
-            
-            partial_aggregates.append(grouped_chunk)
-            
-            # OPTIMIZATION: Iterative Aggregation
-            # Instead of accumulating thousands of DataFrames in partial_aggregates,
-            # we merge them into a main accumulator every few chunks to keep memory usage low.
-            if len(partial_aggregates) >= 10:
-                print("   Compacting partial aggregates...")
-                temp_df = pd.concat(partial_aggregates)
-                
-                # Group again to reduce size
-                temp_df = temp_df.groupby(
-                    ['month', 'year', 'store_id', 'category', 'channel', 'sku_id'],
-                    observed=True
-                ).agg(
-                    revenue=('revenue', 'sum'),
-                    profit=('profit', 'sum'),
-                    quantity=('quantity', 'sum')
-                ).reset_index()
-                
-                # If we already have a main accumulator, merge with it
-                if 'dashboard_df' in locals():
-                    dashboard_df = pd.concat([dashboard_df, temp_df])
-                    dashboard_df = dashboard_df.groupby(
-                        ['month', 'year', 'store_id', 'category', 'channel', 'sku_id'],
-                        observed=True
-                    ).agg(
-                        revenue=('revenue', 'sum'),
-                        profit=('profit', 'sum'),
-                        quantity=('quantity', 'sum')
-                    ).reset_index()
+            if shards is None:
+                if track_state and not full_rebuild:
+                    print("   No usable watermark for this data; running a full rebuild...")
+                state = None
+                shards = sales_io.plan_sales_shards(source, months)
+            else:
+                print(f"   Incremental run from saved watermark ({state['metrics']['count']:,} rows already processed)...")
+                aggregators = state["aggregators"]
+                channel_vocab = Vocabulary(state["channels"])
+                global_metrics.update(state["metrics"])
+            if track_state:
+                # The last order may continue in rows appended later, so it is kept out of the saved state
+                shards = sales_io.split_trailing_order(shards)
+        
+        print(f"   Processing {source} sales data: {len(shards)} shards, {workers} worker(s), chunks of {CHUNK_SIZE}...")
+        
+        # Shard positions name the quarantine part files, so they are collected in plan order
+        shards = [dict(shard, index=i) for i, shard in enumerate(shards)]
+        validation.reset_parts(config.PROCESSED_DATA_DIR)
+        held_back = None
+        with report.stage("aggregate") as stage:
+            for i, (shard, result) in enumerate(zip(shards, run_shards(shards, context, workers))):
+                if shard.get("held_back"):
+                    held_back = result
                 else:
-                    dashboard_df = temp_df
-                
-                # Clear the list to free memory
-                partial_aggregates = []
-                import gc
-                gc.collect()
-            
-            if (i + 1) % 5 == 0:
-                print(f"   Processed {i + 1} chunks...")
-                import gc
-                gc.collect()
+                    reduce_shard(result, aggregators, channel_vocab, global_metrics)
+                stage.add(rows=result["metrics"]["count"] + result["metrics"]["rejected_rows"],
+                          bytes_read=sales_io.shard_nbytes(shard, USE_COLS))
+                print(f"   Processed shard {i + 1}/{len(shards)} ({len(aggregators['lines']):,} groups)...")
                 
     except FileNotFoundError:
          print(f"Error: {config.FILE_SALES} not found.")
          return
 
+    # Write the state for the next incremental run without the held-back
+    # order, then fold that order in for this run's outputs. The state is only
+    # committed after the outputs, so a failed write never advances the watermark.
+    new_state = None
+    if track_state:
+        watermark = pipeline_state.build_watermark(source, shards, state["watermark"] if state else None)
+        if watermark is not None:
+            with report.stage("save_state") as stage:
+                new_state = pipeline_state.write_state(source, aggregators, channel_vocab.categories(),
+                                                       global_metrics, watermark, total_tolerance)
+                stage.add(bytes_written=sum(instrumentation.file_size(config.PIPELINE_STATE_DIR / name)
+                                            for name in new_state["aggregate_files"].values()))
+    if held_back is not None:
+        reduce_shard(held_back, aggregators, channel_vocab, global_metrics)
+
     # 4. Final Aggregation
     print("   Performing final aggregation...")
-    
-    # Process any remaining chunks in partial_aggregates
-    if partial_aggregates:
-        temp_df = pd.concat(partial_aggregates)
-        if 'dashboard_df' in locals():
-            dashboard_df = pd.concat([dashboard_df, temp_df])
-        else:
-            dashboard_df = temp_df
+    # Incremental runs add this run's rejects to those of earlier runs, after
+    # dropping those of the order they read again
+    rejects_path, rejects_bytes = validation.collect_rejects(
+        config.PROCESSED_DATA_DIR, append=state is not None, keep_bytes=state["rejects_bytes"] if state else None,
+        held_back=shards[-1]["index"] if held_back is not None else None)
+    rejected = {reason: global_metrics[f"rejected_{reason}"] for reason in validation.REJECT_REASONS}
+    if global_metrics["rejected_rows"]:
+        details = ", ".join(f"{count:,} {reason}" for reason, count in rejected.items() if count)
+        print(f"   Quarantined {global_metrics['rejected_rows']:,} invalid rows ({details}) to {rejects_path}")
             
-    if 'dashboard_df' not in locals() or dashboard_df.empty:
+    if len(aggregators['lines']) == 0:
         print("No data processed.")
         return
 
-    # Final Groupby to ensure uniqueness
-    dashboard_df = dashboard_df.groupby(
-        ['month', 'year', 'store_id', 'category', 'channel', 'sku_id'],
-        observed=True
-    ).agg(
-        revenue=('revenue', 'sum'),
-        profit=('profit', 'sum'),
-        quantity=('quantity', 'sum')
-    ).reset_index()
-
-    # Merge names back
-    print("   Merging names back...")
-    # We need to reload masters briefly or keep them in memory (they are small)
-    # skus and stores are already in memory from start of script
-    dashboard_df = dashboard_df.merge(skus[['sku_id', 'sku_name']], on='sku_id', how='left')
-    dashboard_df = dashboard_df.merge(stores[['store_id', 'store_name']], on='store_id', how='left')
+    with report.stage("decode") as stage:
+        dashboard_df = decode_dashboard_aggregate(aggregators['lines'], sku_lookup, channel_vocab)
+        order_counts = decode_order_counts(aggregators['orders'], channel_vocab)
+        daily_df = decode_daily_aggregate(aggregators['daily'], sku_lookup, channel_vocab)
+        sku_sketch_df = decode_sku_sketch(aggregators['sku_sketch'], sku_lookup)
+        category_bits = list(sku_lookup.categories['category'])
+        if customer_lookup is not None:
+            customer_df, customers_as_of = customers.customer_table(aggregators['customers'], customer_lookup, channel_vocab.categories())
+            loyalty_df = decode_loyalty_aggregate(aggregators['loyalty'], customer_lookup, channel_vocab)
+            walk_in = customers.walk_in_totals(aggregators['customers'], customer_lookup)
+            unknown_customers = customers.unknown_totals(aggregators['customers'], customer_lookup)
+
+        # Merge names back
+        print("   Merging names back...")
+        # We need to reload masters briefly or keep them in memory (they are small)
+        # skus and stores are already in memory from start of script
+        dashboard_df = dashboard_df.merge(skus[['sku_id', 'sku_name']], on='sku_id', how='left')
+        dashboard_df = dashboard_df.merge(stores[['store_id', 'store_name']], on='store_id', how='left')
+        sku_sketch_df = sku_sketch_df.merge(skus[['sku_id', 'sku_name']], on='sku_id', how='left')
+        stage.add(rows=len(dashboard_df))
 
     # DEBUG: Print monthly revenue to verify Ramadan (April) sales
     print("\n   [DEBUG] Monthly Revenue Check:")
@@ -193,23 +521,89 @@ def process_data():
     
     # 5. Save Summary Metrics
     print("   Calculating final global metrics...")
+    total_orders = global_metrics["orders"]
     summary_metrics = {
         "total_revenue": float(global_metrics["total_revenue"]),
         "total_profit": float(global_metrics["total_profit"]),
         "total_quantity": int(global_metrics["total_quantity"]),
-        "avg_revenue_per_order": float(global_metrics["total_revenue"] / global_metrics["count"]) if global_metrics["count"] > 0 else 0,
-        "avg_profit_per_order": float(global_metrics["total_profit"] / global_metrics["count"]) if global_metrics["count"] > 0 else 0
+        "total_orders": int(total_orders),
+        "total_lines": int(global_metrics["count"]),
+        "avg_revenue_per_order": float(global_metrics["total_revenue"] / total_orders) if total_orders > 0 else 0,
+        "avg_profit_per_order": float(global_metrics["total_profit"] / total_orders) if total_orders > 0 else 0,
+        "avg_basket_lines": float(global_metrics["count"] / total_orders) if total_orders > 0 else 0,
+        "avg_basket_units": float(global_metrics["total_quantity"] / total_orders) if total_orders > 0 else 0,
+        "rejected_rows": int(global_metrics["rejected_rows"])
     }
+    if customer_lookup is not None:
+        summary_metrics["active_customers"] = int(len(customer_df))
+        summary_metrics["walk_in_orders"] = walk_in["orders"]
+        summary_metrics["walk_in_revenue"] = float(walk_in["revenue"])
+        summary_metrics["unknown_customer_orders"] = unknown_customers["orders"]
+        summary_metrics["unknown_customer_revenue"] = float(unknown_customers["revenue"])
     
-    import json
-    print(f"Saving summary metrics to {config.FILE_SUMMARY_METRICS}")
-    with open(config.FILE_SUMMARY_METRICS, 'w') as f:
-        json.dump(summary_metrics, f)
+    with report.stage("write_outputs") as stage:
+        import json
+        print(f"Saving summary metrics to {config.FILE_SUMMARY_METRICS}")
+        with open(config.FILE_SUMMARY_METRICS, 'w') as f:
+            json.dump(summary_metrics, f)
+        
+        # 6. Save Dashboard Data (typed columnar files + manifest)
+        print(f"Saving processed data to {config.PROCESSED_DATA_DIR}")
+        manifest_entries = {
+            processed_io.DASHBOARD_TABLE: processed_io.write_table(dashboard_df, config.FILE_DASHBOARD_DATA.with_suffix('')),
+            processed_io.ORDER_COUNTS_TABLE: processed_io.write_table(order_counts, config.PROCESSED_DATA_DIR / processed_io.ORDER_COUNTS_TABLE)
+        }
+        manifest_entries[processed_io.DAILY_TABLE] = processed_io.write_table(daily_df, config.PROCESSED_DATA_DIR / processed_io.DAILY_TABLE)
+        manifest_entries[processed_io.SKU_SKETCH_TABLE] = processed_io.write_table(sku_sketch_df, config.PROCESSED_DATA_DIR / processed_io.SKU_SKETCH_TABLE)
+        # Cells holding this many SKUs are full; top_items needs it to bound untracked SKUs
+        manifest_entries[processed_io.SKU_SKETCH_TABLE]['capacity'] = aggregators['sku_sketch'].capacity
+        # Bit i of category_mask is set when the order has a line in category_bits[i]
+        manifest_entries[processed_io.ORDER_COUNTS_TABLE]['category_bits'] = category_bits
+
+        # 7. Save coarser rollups so most dashboard views skip the SKU grain
+        print(f"Saving rollups to {config.ROLLUP_DIR}")
+        manifest_entries.update(rollups.save_rollups(rollups.build_rollups(dashboard_df, order_counts, category_bits)))
+        if customer_lookup is not None:
+            manifest_entries.update(rollups.save_rollups({rollups.LOYALTY_ROLLUP: loyalty_df}))
+            manifest_entries[processed_io.CUSTOMERS_TABLE] = processed_io.write_table(customer_df, config.PROCESSED_DATA_DIR / processed_io.CUSTOMERS_TABLE)
+            # Recency is counted in days back from this date
+            manifest_entries[processed_io.CUSTOMERS_TABLE]['as_of'] = str(customers_as_of)
+        processed_io.write_manifest(manifest_entries)
+        stage.add(rows=sum(entry['rows'] for entry in manifest_entries.values()),
+                  bytes_written=sum(entry['bytes'] for entry in manifest_entries.values())
+                  + instrumentation.file_size(config.FILE_SUMMARY_METRICS))
     
-    # 6. Save Dashboard Data
-    print(f"Saving processed data to {config.FILE_DASHBOARD_DATA}")
-    dashboard_df.to_csv(config.FILE_DASHBOARD_DATA, index=False)
+    # 8. Commit the state written above for the next incremental run
+    if new_state is not None:
+        pipeline_state.commit_state(new_state, rejects_bytes)
+
+    report.write({"source": source, "shards": len(shards), "workers": workers,
+                  "incremental": state is not None, "summary_metrics": summary_metrics,
+                  "rejected_rows": rejected, "quarantine_file": str(rejects_path) if rejects_path else None})
     print("Data Processing Complete!")
 
 if __name__ == "__main__":
-    process_data()
+    parser = argparse.ArgumentParser(description="Aggregate raw sales into dashboard data.")
+    parser.add_argument("--source", choices=["auto"] + sales_io.SALES_SOURCES, default="auto",
+                        help="Raw sales storage to read (auto picks the most recently written).")
+    parser.add_argument("--months", nargs="+", metavar="YYYY-MM",
+                        help="Only read these month partitions (Parquet source only).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes for the map step (0 = all CPU cores). Results are identical for any value.")
+    parser.add_argument("--full-rebuild", action="store_true",
+                        help="Ignore the saved watermark and rescan all raw sales (reconciliation).")
+    parser.add_argument("--total-tolerance", type=float, default=validation.TOTAL_TOLERANCE, metavar="AMOUNT",
+                        help="Quarantine rows whose total_value differs from unit_price x quantity by more than this "
+                             "(default %(default)s).")
+    parser.add_argument("--no-total-check", action="store_true",
+                        help="Skip the total_value check. Sales from the generator before it derived total_value "
+                             "from quantity fail it on about 2/3 of their rows.")
+    parser.add_argument("--no-report", action="store_true",
+                        help=f"Skip the run report (also off when {instrumentation.ENV_TOGGLE}=0).")
+    args = parser.parse_args()
+    if args.total_tolerance < 0:
+        parser.error("--total-tolerance must not be negative")
+    workers = args.workers if args.workers > 0 else os.cpu_count()
+    report = instrumentation.start_run("process_data", enabled=not args.no_report, details=vars(args))
+    process_data(source=args.source, months=args.months, workers=workers, full_rebuild=args.full_rebuild, report=report,
+                 total_tolerance=None if args.no_total_check else args.total_tolerance)
@@ -0,0 +1,185 @@
+"""
+BlueMart Processed Storage
+Typed columnar files for the processed dashboard tables.
+
+process_data writes each table (the dashboard data and its rollups) as
+Parquet with dictionary-encoded string dimensions, integer ids and an int8
+month number instead of the month name. A manifest next to them records the
+file, schema and row count of every table plus the build time:
+
+    data/processed/manifest.json
+    data/processed/sales_dashboard_data.parquet
+    data/processed/rollups/channel_month.parquet
+    ...
+
+Readers get pandas frames that are ready to use: dimensions as categoricals,
+ids as string categories and `month` as an ordered categorical of month names.
+Without pyarrow the same tables are written and read as CSV.
+"""
+
+import calendar
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path to import config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+from scripts.sales_io import pa, pq, PARQUET_COMPRESSION
+
+MONTH_NAMES = list(calendar.month_name)[1:]
+DASHBOARD_TABLE = 'sales_dashboard_data'
+ORDER_COUNTS_TABLE = 'order_counts'
+CUSTOMERS_TABLE = 'customer_aggregates'
+DAILY_TABLE = 'daily_sales'
+SKU_SKETCH_TABLE = 'sku_revenue_sketch'
+
+# Dimension columns stored as dictionary<int32, string>
+DICTIONARY_COLUMNS = ['store_name', 'category', 'channel', 'sku_name', 'loyalty_segment', 'primary_channel']
+# Integer ids the dashboard treats as labels
+ID_COLUMNS = ['store_id', 'sku_id']
+
+# dtypes for reading the CSV fallback (and CSVs written before the manifest)
+CSV_DTYPES = {
+    'month': 'category',
+    'year': 'int16',
+    'store_id': 'category',
+    'store_name': 'category',
+    'category': 'category',
+    'channel': 'category',
+    'sku_id': 'category',
+    'sku_name': 'category',
+    'loyalty_segment': 'category',
+    'primary_channel': 'category',
+}
+
+
+def manifest_path():
+    return Path(config.FILE_PROCESSED_MANIFEST)
+
+
+def column_type(name, series):
+    """Arrow type for one processed column."""
+    if name == 'month':
+        return pa.int8()
+    if name == 'year':
+        return pa.int16()
+    if name == 'day':
+        return pa.int32()
+    if name in ID_COLUMNS:
+        return pa.int32()
+    if name in DICTIONARY_COLUMNS:
+        return pa.dictionary(pa.int32(), pa.string())
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return pa.date32()
+    if pd.api.types.is_integer_dtype(series):
+        return pa.int64()
+    return pa.float64()
+
+
+def frame_to_table(df):
+    """Encode a processed frame: month names to 1-12, dimensions to dictionaries."""
+    arrays, fields = [], []
+    for name in df.columns:
+        series = df[name]
+        if name == 'month' and not pd.api.types.is_integer_dtype(series):
+            series = pd.Series(pd.Categorical(series, categories=MONTH_NAMES).codes + 1, index=df.index)
+        if name in DICTIONARY_COLUMNS:
+            series = series.astype('category')
+        arrow_type = column_type(name, series)
+        arrays.append(pa.array(series, from_pandas=True).cast(arrow_type))
+        fields.append(pa.field(name, arrow_type))
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields))
+
+
+def decode_frame(df):
+    """Turn stored columns back into the dashboard's dtypes."""
+    if 'month' in df.columns and pd.api.types.is_integer_dtype(df['month']):
+        df['month'] = pd.Categorical.from_codes(df['month'].to_numpy(np.int64) - 1, MONTH_NAMES, ordered=True)
+    for name in ID_COLUMNS:
+        if name in df.columns and not isinstance(df[name].dtype, pd.CategoricalDtype):
+            ids = pd.Categorical(df[name])
+            df[name] = ids.rename_categories(ids.categories.astype(str))
+    return df
+
+
+def write_table(df, path):
+    """
+    Write one table to `path` (without suffix) and return its manifest entry.
+    Parquet when pyarrow is available, CSV otherwise.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if pa is not None:
+        table = frame_to_table(df)
+        file = path.with_suffix('.parquet')
+        pq.write_table(table, file, compression=PARQUET_COMPRESSION)
+        schema = {field.name: str(field.type) for field in table.schema}
+        fmt = 'parquet'
+    else:
+        file = path.with_suffix('.csv')
+        df.to_csv(file, index=False)
+        schema = {name: str(dtype) for name, dtype in df.dtypes.items()}
+        fmt = 'csv'
+    # Drop the other format's copy from an earlier run so only one is on disk
+    stale = path.with_suffix('.csv' if fmt == 'parquet' else '.parquet')
+    if stale.exists():
+        stale.unlink()
+    return {
+        'file': file.relative_to(config.PROCESSED_DATA_DIR).as_posix(),
+        'format': fmt,
+        'rows': len(df),
+        'bytes': file.stat().st_size,
+        'schema': schema,
+    }
+
+
+def write_manifest(entries):
+    """Atomically replace the manifest with the given {table name: entry} map."""
+    manifest = {'built_at': datetime.now().isoformat(timespec='seconds'), 'tables': entries}
+    temp_path = manifest_path().with_suffix('.tmp')
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_path, manifest_path())
+
+
+def load_manifest():
+    if not manifest_path().exists():
+        return None
+    with open(manifest_path()) as f:
+        return json.load(f)
+
+
+def table_entry(name):
+    """Manifest entry for one table, or None."""
+    manifest = load_manifest()
+    return manifest['tables'].get(name) if manifest else None
+
+
+def read_table(name, columns=None, fallback=None):
+    """
+    Read a processed table by manifest name. `fallback` is a CSV path used
+    when the manifest does not list the table (output of an older run).
+    Raises FileNotFoundError when neither exists.
+    """
+    entry = table_entry(name)
+    if entry is None:
+        if fallback is None or not Path(fallback).exists():
+            raise FileNotFoundError(f"Processed table '{name}' not found. Run scripts/process_data.py first.")
+        entry = {'file': Path(fallback), 'format': 'csv'}
+
+    file = Path(config.PROCESSED_DATA_DIR) / entry['file']
+    if entry['format'] == 'parquet':
+        df = pq.read_table(file, columns=columns).to_pandas(date_as_object=False)
+    else:
+        df = pd.read_csv(
+            file,
+            usecols=columns,
+            dtype={col: dtype for col, dtype in CSV_DTYPES.items() if columns is None or col in columns}
+        )
+    return decode_frame(df)
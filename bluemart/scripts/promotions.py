@@ -0,0 +1,86 @@
+"""
+BlueMart Promotion Index
+Tag whole arrays of sales dates with the promotion running on each day.
+
+Promotion start/end dates (both inclusive) are cut into elementary day
+intervals at every boundary. Each interval stores the winning promotion per
+scope, so tagging a chunk is one binary search over the sorted boundaries
+plus an array index, whatever the number of promotions or rows.
+
+Promotions may overlap. The optional `store_id` column scopes a promotion to
+one store (blank means every store). When several promotions cover the same
+day and store, the winner is decided by, in order:
+
+1. `priority` (higher wins, when the column is present)
+2. store-scoped over chain-wide
+3. higher `discount_pct`
+4. later `start_date`
+5. later position in the calendar
+"""
+
+import numpy as np
+import pandas as pd
+
+from scripts.daily import day_numbers
+
+
+class PromotionIndex:
+    """Interval index over a promotion calendar (see module docstring for overlap rules)."""
+
+    def __init__(self, promotions):
+        promos = promotions.reset_index(drop=True)
+        starts = day_numbers(promos["start_date"])
+        ends = day_numbers(promos["end_date"]) + 1  # Exclusive
+        if (ends <= starts).any():
+            raise ValueError("Promotion end_date must not be before start_date")
+
+        store_scope = promos["store_id"] if "store_id" in promos.columns else pd.Series(np.nan, index=promos.index)
+        scoped = store_scope.notna().to_numpy()
+        scope_stores = np.unique(store_scope[scoped].astype(np.int64))
+
+        self.names = pd.Index(promos["promo_name"].astype(str))
+        self.discount_pct = promos["discount_pct"].to_numpy(dtype=np.int64)
+        self.boundaries = np.unique(np.concatenate((starts, ends)))
+
+        # Row 0 holds chain-wide winners; each scoped store gets its own row
+        # that starts from the chain-wide promos and adds its own on top
+        self.store_rows = np.zeros(int(scope_stores.max()) + 2 if len(scope_stores) else 1, dtype=np.int64)
+        self.store_rows[scope_stores] = np.arange(1, len(scope_stores) + 1)
+        self.winners = np.full((len(scope_stores) + 1, max(len(self.boundaries) - 1, 0)), -1, dtype=np.int64)
+
+        # Paint promotions from lowest to highest priority so the winner is painted last
+        priority = promos["priority"].fillna(0).to_numpy() if "priority" in promos.columns else np.zeros(len(promos))
+        order = np.lexsort((np.arange(len(promos)), starts, self.discount_pct, scoped, priority))
+        first = np.searchsorted(self.boundaries, starts)
+        last = np.searchsorted(self.boundaries, ends)
+        for i in order:
+            rows = self.store_rows[int(store_scope.iloc[i])] if scoped[i] else slice(None)
+            self.winners[rows, first[i]:last[i]] = i
+
+    def __len__(self):
+        return len(self.names)
+
+    def tag(self, dates, store_ids=None):
+        """
+        Position of the winning promotion for each row (-1 for none).
+        Without `store_ids` only chain-wide promotions are considered.
+        """
+        days = day_numbers(dates)
+        if self.winners.shape[1] == 0:
+            return np.full(len(days), -1, dtype=np.int64)
+        segment = np.searchsorted(self.boundaries, days, side="right") - 1
+        inside = (segment >= 0) & (segment < self.winners.shape[1])
+        segment = np.where(inside, segment, 0)
+
+        if store_ids is None:
+            rows = 0
+        else:
+            store_ids = np.asarray(store_ids, dtype=np.int64)
+            known = (store_ids >= 0) & (store_ids < len(self.store_rows))
+            rows = np.where(known, self.store_rows[np.where(known, store_ids, 0)], 0)
+        return np.where(inside, self.winners[rows, segment], -1)
+
+    def discounts(self, dates, store_ids=None):
+        """Discount percentage per row (0 outside promotions)."""
+        tags = self.tag(dates, store_ids)
+        return np.where(tags >= 0, self.discount_pct[tags], 0)
@@ -0,0 +1,105 @@
+"""
+BlueMart Result Cache
+Memory-bounded LRU cache for dashboard widget results.
+
+Entries are keyed by widget name plus the normalized filter state (columns
+and selected values sorted), so the same selection made in any order, or in
+another session, finds the same entry. Once the estimated size of the stored
+results passes the budget, the least recently used entries are evicted; a
+result larger than the whole budget is returned but not kept. Hit, miss and
+eviction counters show how well the cache is doing.
+
+The cache is thread-safe, so the dashboard keeps one instance for all
+sessions (st.cache_resource). Results are computed outside the lock, and
+frames are handed out as copies so callers can format them freely.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def normalize_filters(filters):
+    """Hashable, order-independent form of {column: selected values}."""
+    return tuple(sorted((col, tuple(sorted(map(str, values)))) for col, values in (filters or {}).items()))
+
+
+def estimate_nbytes(value):
+    """Approximate memory held by a cached result."""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_nbytes(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_nbytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def _copy(value):
+    return value.copy() if isinstance(value, (pd.DataFrame, pd.Series)) else value
+
+
+class ResultCache:
+    """LRU cache of widget results holding at most `max_bytes` (estimated)."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (value, nbytes), least recently used first
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get_or_compute(self, widget, filters, compute, extra=None):
+        """
+        The cached result of `widget` under `filters` ({column: values}),
+        calling `compute()` on a miss. `extra` adds any other state the
+        result depends on (e.g. a date range) to the key.
+        """
+        key = (widget, normalize_filters(filters), extra)
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return _copy(self.entries[key][0])
+            self.misses += 1
+
+        value = compute()
+        nbytes = estimate_nbytes(value)
+        with self.lock:
+            if nbytes <= self.max_bytes and key not in self.entries:
+                self.entries[key] = (value, nbytes)
+                self.nbytes += nbytes
+                while self.nbytes > self.max_bytes:
+                    _, (_, evicted) = self.entries.popitem(last=False)
+                    self.nbytes -= evicted
+                    self.evictions += 1
+        return _copy(value)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "bytes": self.nbytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,150 @@
+"""
+BlueMart Rollups
+Coarser pre-aggregated views of the dashboard data and a query router.
+
+process_data writes the finest grain (month x store x category x channel x
+sku) plus the rollups below. The dashboard answers each widget from the
+smallest table that still has every column the widget groups by and every
+column an active filter touches, so most views never read the SKU grain.
+
+Every table carries `orders`, the number of distinct orders behind each row.
+Month, store and channel are fixed per order, so order counts add up across
+them, but not across categories or SKUs (one order can contain several).
+Order counts for an arbitrary filter come from the order-counts table
+instead (see `count_orders`).
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path to import config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+from scripts import processed_io
+
+# Additive metrics; `orders` is handled separately
+METRICS = ['revenue', 'profit', 'quantity', 'lines']
+
+ROLLUP_DIMENSIONS = {
+    "channel_month": ['month', 'year', 'channel'],
+    "category_channel_month": ['month', 'year', 'category', 'channel'],
+    "store_month": ['month', 'year', 'store_id', 'store_name'],
+    "sku_month": ['month', 'year', 'sku_id', 'sku_name', 'category'],
+}
+
+# Sales by loyalty tier, built from the customer aggregates in process_data
+# rather than from the dashboard frame (which has no customer dimension)
+LOYALTY_ROLLUP = "loyalty_month"
+
+
+def orders_by_category(order_counts, category_bits, categories):
+    """One order-counts row per category present in each order's bitmask."""
+    masks = order_counts['category_mask'].to_numpy()
+    parts = []
+    for bit, category in enumerate(category_bits):
+        part = order_counts[(masks >> bit) & 1 == 1].drop(columns='category_mask')
+        part['category'] = pd.Categorical([category] * len(part), categories=categories)
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
+
+
+def build_rollups(dashboard_df, order_counts, category_bits):
+    """
+    Aggregate the finest-grain dashboard frame into every rollup.
+    SKU rollups sum the SKU-grain order counts (a SKU has one category, and
+    different stores or channels are different orders); the others count
+    orders from the order-counts table.
+    """
+    categories = dashboard_df['category'].cat.categories if isinstance(dashboard_df['category'].dtype, pd.CategoricalDtype) else None
+    by_category = orders_by_category(order_counts, category_bits, categories)
+    rollups = {}
+    for name, dims in ROLLUP_DIMENSIONS.items():
+        metrics = METRICS + ['orders'] if 'sku_id' in dims else METRICS
+        frame = dashboard_df.groupby(dims, observed=True, sort=False)[metrics].sum().reset_index()
+        if 'sku_id' not in dims:
+            source = by_category if 'category' in dims else order_counts
+            keys = [dim for dim in dims if dim in source.columns]
+            orders = source.groupby(keys, observed=True)['orders'].sum().reset_index()
+            frame = frame.merge(orders, on=keys, how='left')
+            frame['orders'] = frame['orders'].fillna(0).astype('int64')
+        rollups[name] = frame
+    return rollups
+
+
+def count_orders(order_counts, category_bits, filters=None):
+    """
+    Exact number of orders matching `filters` ({column: selected values}).
+    A category filter matches orders with at least one line in a selected category.
+    """
+    filters = dict(filters or {})
+    mask = np.ones(len(order_counts), dtype=bool)
+    selected_categories = filters.pop('category', None)
+    if selected_categories is not None:
+        selected_bits = np.int64(0)
+        for bit, category in enumerate(category_bits):
+            if category in set(selected_categories):
+                selected_bits |= np.int64(1) << bit
+        mask &= (order_counts['category_mask'].to_numpy() & selected_bits) != 0
+    for col, values in filters.items():
+        mask &= order_counts[col].isin(values).to_numpy()
+    return int(order_counts.loc[mask, 'orders'].sum())
+
+
+def rollup_table(name):
+    return f"rollups/{name}"
+
+
+def save_rollups(rollups):
+    """Write every rollup and return their manifest entries."""
+    return {
+        rollup_table(name): processed_io.write_table(frame, Path(config.ROLLUP_DIR) / name)
+        for name, frame in rollups.items()
+    }
+
+
+def load_rollups():
+    """Load whichever rollups exist; a missing one just means the router falls back further."""
+    rollups = {}
+    for name in list(ROLLUP_DIMENSIONS) + [LOYALTY_ROLLUP]:
+        try:
+            rollups[name] = processed_io.read_table(rollup_table(name))
+        except FileNotFoundError:
+            continue
+    return rollups
+
+
+class QueryRouter:
+    """Pick the smallest table that can answer a widget under the active filters."""
+
+    def __init__(self, base_df, rollups, base_index=None):
+        # Smallest first; the finest-grain frame is always the last resort
+        self.tables = sorted(rollups.items(), key=lambda item: len(item[1]))
+        self.tables.append(("base", base_df))
+        # Optional FilterIndex over base_df: filters on its columns skip the row-by-row isin
+        self.base_index = base_index
+
+    def table_for(self, columns):
+        for name, frame in self.tables:
+            if set(columns) <= set(frame.columns):
+                return name, frame
+        raise KeyError(f"No table has columns {sorted(columns)}")
+
+    def query(self, columns, filters=None):
+        """
+        Rows of the chosen table restricted by `filters` ({column: selected values}).
+        Only pass filters that actually narrow the data.
+        """
+        filters = filters or {}
+        name, frame = self.table_for(list(columns) + list(filters))
+        if not filters:
+            return frame
+        if name == "base" and self.base_index is not None and set(filters) <= set(self.base_index.labels):
+            return self.base_index.take(frame, filters)
+        mask = pd.Series(True, index=frame.index)
+        for col, values in filters.items():
+            mask &= frame[col].isin(values)
+        return frame[mask]
@@ -0,0 +1,483 @@
+"""
+BlueMart Sales Storage
+Readers and writers shared by the generator and the processing scripts.
+
+Raw sales live in the text CSV (config.FILE_SALES), in a month-partitioned
+Parquet dataset (config.SALES_PARQUET_DIR) or in a memory-mapped column store
+converted from either (config.SALES_COLUMN_STORE_DIR, see column_store.py):
+
+    bm_sales/month=2025-01/part-00000.parquet
+    bm_sales/month=2025-01/part-00001.parquet
+    ...
+
+Parquet files use typed numeric columns, a dictionary-encoded `channel`
+and zstd compression, so consumers skip the CSV parse and can read only
+the months and columns they need.
+"""
+
+import hashlib
+import io
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet support is optional; CSV keeps working without it
+    pa = None
+    pq = None
+
+# Add parent directory to path to import config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import config
+from scripts.column_store import ColumnStore
+
+SALES_COLUMNS = ["date", "store_id", "sku_id", "customer_id", "quantity", "unit_price",
+                 "total_value", "channel", "discount_pct", "transaction_id"]
+
+PARQUET_COMPRESSION = "zstd"
+
+# Lines of one order share this id and are written next to each other
+ORDER_COLUMN = "transaction_id"
+
+# Target size of one CSV byte-range shard for parallel readers
+CSV_SHARD_BYTES = 64 * 1024 * 1024
+# Rows per column-store shard (roughly CSV_SHARD_BYTES of text)
+COLUMN_SHARD_ROWS = 1_000_000
+
+SALES_SOURCES = ["csv", "parquet", "columns"]
+
+# Data rows between entries of the CSV row-offset index written by fix_sales_csv.py
+CSV_INDEX_ROWS = 10_000
+# Bytes hashed at the start and at the indexed end of the CSV to tell whether an index still applies
+INDEX_FINGERPRINT_BYTES = 64 * 1024
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError("Parquet sales storage needs pyarrow. Install it with `pip install pyarrow`.")
+
+
+def sales_schema():
+    """Canonical Arrow schema for raw sales partitions."""
+    require_pyarrow()
+    return pa.schema([
+        ("date", pa.date32()),
+        ("store_id", pa.int32()),
+        ("sku_id", pa.int32()),
+        ("customer_id", pa.int32()),  # Null for walk-ins
+        ("quantity", pa.int16()),
+        ("unit_price", pa.float64()),
+        ("total_value", pa.float64()),
+        ("channel", pa.dictionary(pa.int8(), pa.string())),
+        ("discount_pct", pa.int8()),
+        ("transaction_id", pa.int64()),
+    ])
+
+
+def month_key(date):
+    return f"{date.year:04d}-{date.month:02d}"
+
+
+def partition_path(base_dir, month, part_id):
+    return Path(base_dir) / f"month={month}" / f"part-{part_id:05d}.parquet"
+
+
+def sales_frame_to_table(df):
+    """Convert a generated sales frame to an Arrow table with the canonical schema."""
+    require_pyarrow()
+    return pa.Table.from_pandas(df[SALES_COLUMNS], preserve_index=False).cast(sales_schema())
+
+
+class MonthlyPartitionWriter:
+    """
+    Append day-sized sales frames to month partitions.
+    Days must arrive in date order; a new file is opened whenever the month changes.
+    """
+
+    def __init__(self, base_dir, part_id):
+        require_pyarrow()
+        self.base_dir = Path(base_dir)
+        self.part_id = part_id
+        self.month = None
+        self.writer = None
+
+    def write(self, df, date):
+        month = month_key(date)
+        if month != self.month:
+            self.close()
+            path = partition_path(self.base_dir, month, self.part_id)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self.writer = pq.ParquetWriter(path, sales_schema(), compression=PARQUET_COMPRESSION)
+            self.month = month
+        self.writer.write_table(sales_frame_to_table(df))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def list_sales_partitions(base_dir=None, months=None):
+    """Return Parquet part files in month order, optionally limited to months like '2025-04'."""
+    base_dir = Path(base_dir or config.SALES_PARQUET_DIR)
+    if not base_dir.is_dir():
+        return []
+    wanted = set(months) if months else None
+    files = []
+    for month_dir in sorted(base_dir.glob("month=*")):
+        month = month_dir.name.split("=", 1)[1]
+        if wanted is None or month in wanted:
+            files.extend(sorted(month_dir.glob("part-*.parquet")))
+    return files
+
+
+def column_store_meta_path():
+    return Path(config.SALES_COLUMN_STORE_DIR) / "meta.json"
+
+
+def resolve_sales_source(source="auto"):
+    """
+    Pick 'csv', 'parquet' or 'columns'. Auto uses the most recently written
+    one that exists, so a column store converted from the raw data is used
+    until that data is regenerated.
+    """
+    if source == "auto":
+        written = {}
+        if Path(config.FILE_SALES).exists():
+            written["csv"] = Path(config.FILE_SALES).stat().st_mtime
+        partitions = list_sales_partitions()
+        if partitions:
+            written["parquet"] = max(path.stat().st_mtime for path in partitions)
+        if column_store_meta_path().exists():
+            written["columns"] = column_store_meta_path().stat().st_mtime
+        if not written:
+            return "csv"
+        return max(written, key=written.get)
+    if source not in SALES_SOURCES:
+        raise ValueError(f"Unknown sales source: {source}")
+    return source
+
+
+def read_parquet_chunks(files, columns, chunk_size, dtype_spec=None):
+    """Stream record batches from Parquet part files as pandas chunks."""
+    require_pyarrow()
+    for path in files:
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            chunk = batch.to_pandas(date_as_object=False)
+            if "date" in chunk.columns:
+                chunk["date"] = chunk["date"].astype("datetime64[ns]")
+            if dtype_spec:
+                chunk = chunk.astype({col: dtype for col, dtype in dtype_spec.items() if col in chunk.columns})
+            yield chunk
+
+
+def _next_order_start(f, size, column_index):
+    """
+    From a line start, skip forward to the first line whose order id differs
+    from the current line's, so an order is never split between shards.
+    """
+    order_id = f.readline().split(b",")[column_index]
+    while True:
+        position = f.tell()
+        line = f.readline()
+        if not line or line.split(b",")[column_index] != order_id:
+            return min(position, size)
+
+
+def csv_index_path(path=None):
+    """Sidecar row-offset index next to the sales CSV (bm_sales.csv.idx.npz)."""
+    return Path(str(path or config.FILE_SALES) + ".idx.npz")
+
+
+def _csv_fingerprint(path, end):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        digest.update(f.read(min(end, INDEX_FINGERPRINT_BYTES)))
+        f.seek(max(end - INDEX_FINGERPRINT_BYTES, 0))
+        digest.update(f.read(min(end, INDEX_FINGERPRINT_BYTES)))
+    return digest.hexdigest()
+
+
+def write_csv_index(path, offsets, rows, every=CSV_INDEX_ROWS):
+    """
+    Save the byte offsets of data rows 0, every, 2*every, ... of the CSV at
+    `path`, with its row count and a fingerprint of the indexed bytes.
+    """
+    size = Path(path).stat().st_size
+    with open(csv_index_path(path), "wb") as f:
+        np.savez(f, offsets=np.asarray(offsets, dtype=np.int64), rows=rows, every=every,
+                 size=size, fingerprint=_csv_fingerprint(path, size))
+
+
+def load_csv_index(path=None):
+    """
+    The row-offset index of the sales CSV as a dict (offsets, every, rows,
+    size), or None when there is none or the file was rewritten since.
+    Appending rows keeps it valid for the bytes it covers.
+    """
+    path = Path(path or config.FILE_SALES)
+    index_path = csv_index_path(path)
+    if not index_path.exists() or not path.exists():
+        return None
+    with np.load(index_path) as data:
+        size = int(data["size"])
+        if path.stat().st_size < size or _csv_fingerprint(path, size) != str(data["fingerprint"]):
+            return None
+        return {"offsets": data["offsets"], "every": int(data["every"]), "rows": int(data["rows"]), "size": size}
+
+
+def _indexed_row_start(index, offset):
+    """First indexed row start at or after `offset`, or None past the indexed rows."""
+    if index is None:
+        return None
+    position = np.searchsorted(index["offsets"], offset)
+    return int(index["offsets"][position]) if position < len(index["offsets"]) else None
+
+
+def plan_csv_shards(path=None, shard_bytes=CSV_SHARD_BYTES, start_offset=None):
+    """
+    Split the CSV into line-aligned byte ranges of roughly `shard_bytes`.
+    Each nominal boundary is moved forward to the next row start, taken from
+    the row-offset index when there is one (see fix_sales_csv.py) and found
+    with a single seek + readline otherwise, then past the remaining lines
+    of that order (order lines are contiguous), so planning never scans the
+    file. `start_offset` (a line start, e.g. a saved watermark) skips data
+    already read.
+    """
+    path = Path(path or config.FILE_SALES)
+    size = path.stat().st_size
+    index = load_csv_index(path)
+    with open(path, "rb") as f:
+        columns = f.readline().decode("utf-8").strip().split(",")
+        order_column = columns.index(ORDER_COLUMN) if ORDER_COLUMN in columns else None
+        bounds = [max(f.tell(), start_offset or 0)]
+        if bounds[0] >= size:
+            return []
+        while bounds[-1] + shard_bytes < size:
+            row_start = _indexed_row_start(index, bounds[-1] + shard_bytes)
+            if row_start is None:
+                f.seek(bounds[-1] + shard_bytes)
+                f.readline()
+            else:
+                f.seek(row_start)
+            if order_column is not None and f.tell() < size:
+                f.seek(_next_order_start(f, size, order_column))
+            if f.tell() >= size:
+                break
+            bounds.append(f.tell())
+        bounds.append(size)
+    return [
+        {"kind": "csv", "path": str(path), "start": start, "end": end, "columns": columns}
+        for start, end in zip(bounds[:-1], bounds[1:])
+    ]
+
+
+def _trailing_order_start(f, start, end, column_index, lookback=64 * 1024):
+    """
+    First line of the last order in the line range [start, end): step order
+    by order (see _next_order_start) through the last `lookback` bytes,
+    looking further back until an order boundary is in view.
+    """
+    while True:
+        low = max(start, end - lookback)
+        f.seek(low)
+        if low > start:
+            f.readline()
+        tail = start if low == start else None
+        position = f.tell()
+        while position < end:
+            f.seek(position)
+            position = _next_order_start(f, end, column_index)
+            if position < end:
+                tail = position
+        if tail is not None:
+            return tail
+        lookback *= 2
+
+
+def split_trailing_order(shards):
+    """
+    Split the last order of a CSV shard plan off into a shard of its own,
+    marked `held_back`. Rows appended later may continue that order, so an
+    incremental run keeps it out of its saved state and reads it again.
+    """
+    if not shards or shards[-1]["kind"] != "csv" or ORDER_COLUMN not in shards[-1]["columns"]:
+        return shards
+    last = shards[-1]
+    with open(last["path"], "rb") as f:
+        tail = _trailing_order_start(f, last["start"], last["end"], last["columns"].index(ORDER_COLUMN))
+    head = [dict(last, end=tail)] if tail > last["start"] else []
+    return shards[:-1] + head + [dict(last, start=tail, held_back=True)]
+
+
+def plan_sales_shards(source="auto", months=None):
+    """
+    Independent units of work over the raw sales, in file order: CSV byte
+    ranges or Parquet part files. The plan depends only on the data, so any
+    reducer that combines shard results in plan order gets the same answer
+    whatever the worker count.
+    """
+    source = resolve_sales_source(source)
+    if source == "parquet":
+        return [{"kind": "parquet", "path": str(path)} for path in list_sales_partitions(months=months)]
+    if source == "columns":
+        return plan_column_shards()
+    return plan_csv_shards()
+
+
+def plan_column_shards(start_row=0):
+    """Order-aligned row ranges over the column store, starting at `start_row`."""
+    store = ColumnStore(config.SALES_COLUMN_STORE_DIR)
+    return store.plan_shards(COLUMN_SHARD_ROWS, start_row, ORDER_COLUMN)
+
+
+def shard_nbytes(shard, columns):
+    """Bytes a reader pulls from storage for one shard (all of its columns for CSV and Parquet)."""
+    if shard["kind"] == "csv":
+        return shard["end"] - shard["start"]
+    if shard["kind"] == "parquet":
+        return Path(shard["path"]).stat().st_size
+    store = ColumnStore(shard["path"])
+    row_bytes = sum(np.dtype(store.meta["columns"][col]).itemsize for col in columns if col in store.meta["columns"])
+    return (shard["end"] - shard["start"]) * row_bytes
+
+
+def _read_shard_bytes(shard):
+    with open(shard["path"], "rb") as f:
+        f.seek(shard["start"])
+        return f.read(shard["end"] - shard["start"])
+
+
+def _line_bounds(data):
+    """Start and end offsets of the non-blank lines in CSV text (the CSV reader skips blank lines)."""
+    ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n")) + 1
+    if not data.endswith(b"\n"):
+        ends = np.append(ends, len(data))
+    starts = np.r_[0, ends[:-1]].astype(np.int64)
+    filled = ends - starts > 1
+    return starts[filled], ends[filled]
+
+
+def iter_shard_chunks(shard, columns, chunk_size, dtype_spec=None, lenient=False):
+    """
+    Yield pandas chunks for one shard from `plan_sales_shards`.
+    With `lenient`, a CSV shard the typed reader cannot parse (an embedded
+    header row, a non-numeric id) is re-read as text from the failing chunk
+    on, leaving the coercion to the caller (see validation.py).
+    """
+    if shard["kind"] == "parquet":
+        yield from read_parquet_chunks([shard["path"]], columns, chunk_size, dtype_spec)
+        return
+    if shard["kind"] == "columns":
+        store = ColumnStore(shard["path"])
+        yield from store.iter_chunks(columns, chunk_size, shard["start"], shard["end"], dtype_spec)
+        return
+
+    data = _read_shard_bytes(shard)
+    rows = 0
+    try:
+        for chunk in pd.read_csv(
+            io.BytesIO(data),
+            header=None,
+            names=shard["columns"],
+            chunksize=chunk_size,
+            usecols=columns,
+            dtype=dtype_spec,
+            parse_dates=['date'] if 'date' in columns else False
+        ):
+            rows += len(chunk)
+            yield chunk
+    except (ValueError, TypeError):
+        if not lenient:
+            raise
+        # Restart at the first row not yet yielded (blank lines are not rows, so skiprows would miscount)
+        starts, _ = _line_bounds(data)
+        yield from pd.read_csv(
+            io.BytesIO(data[starts[rows]:] if rows < len(starts) else b""),
+            header=None,
+            names=shard["columns"],
+            chunksize=chunk_size,
+            usecols=columns,
+            dtype=str
+        )
+
+
+def iter_whole_orders(chunks, order_column=ORDER_COLUMN):
+    """
+    Re-cut a chunk stream so no order is split between chunks: the lines of
+    each chunk's last order are held back and prepended to the next chunk.
+    """
+    carry = None
+    for chunk in chunks:
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        if len(chunk) == 0:
+            continue
+        order_ids = chunk[order_column].to_numpy()
+        order_starts = np.flatnonzero(order_ids[1:] != order_ids[:-1]) + 1
+        tail = int(order_starts[-1]) if len(order_starts) else 0
+        carry = chunk.iloc[tail:]
+        if tail:
+            yield chunk.iloc[:tail]
+    if carry is not None and len(carry):
+        yield carry
+
+
+class ShardRows:
+    """
+    Rows of one shard by position (data rows counted from the shard start,
+    as iter_shard_chunks yields them) with every column in SALES_COLUMNS:
+    the original text of CSV lines, stored values for Parquet and the column
+    store, blank where the data has no such column. Used to quarantine
+    rejected rows whole; nothing is read until the first call.
+    """
+
+    def __init__(self, shard):
+        self.shard = shard
+        self.data = None
+        self.table = None
+
+    def _csv_rows(self, rows):
+        if self.data is None:
+            self.data = _read_shard_bytes(self.shard)
+            self.line_starts, self.line_ends = _line_bounds(self.data)
+        text = b"\n".join(self.data[self.line_starts[row]:self.line_ends[row]].rstrip(b"\r\n") for row in rows)
+        return pd.read_csv(io.BytesIO(text + b"\n"), header=None, names=self.shard["columns"],
+                           dtype=str, keep_default_na=False)
+
+    def take(self, rows):
+        """The rows at positions `rows` as a frame with the SALES_COLUMNS columns."""
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.shard["kind"] == "csv":
+            frame = self._csv_rows(rows)
+        elif self.shard["kind"] == "parquet":
+            if self.table is None:
+                self.table = pq.read_table(self.shard["path"])
+            frame = self.table.take(pa.array(rows)).to_pandas(date_as_object=False)
+        else:
+            store = ColumnStore(self.shard["path"])
+            first = self.shard["start"] + int(rows.min())
+            frame = store.frame([col for col in SALES_COLUMNS if col in store.columns],
+                                first, self.shard["start"] + int(rows.max()) + 1).iloc[rows - rows.min()]
+        return frame.reindex(columns=SALES_COLUMNS).reset_index(drop=True)
+
+
+def iter_sales_chunks(columns, chunk_size, dtype_spec=None, source="auto", months=None):
+    """
+    Yield raw sales in chunks from whichever storage format is present.
+    `months` only applies to the Parquet dataset, where whole partitions are skipped.
+    """
+    for shard in plan_sales_shards(source, months):
+        yield from iter_shard_chunks(shard, columns, chunk_size, dtype_spec)
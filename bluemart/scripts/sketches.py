@@ -0,0 +1,223 @@
+"""
+BlueMart Heavy-Hitter Sketches
+Bounded-memory top-K summaries kept during the streaming pass.
+
+A HeavyHitterSketch keeps a weighted SpaceSaving summary per cell (here one
+cell per month x store x category): at most `capacity` items per cell, each
+with an estimated weight and an error. The usual guarantees hold for every
+cell:
+
+    estimate - error <= true weight <= estimate      for a tracked item
+    true weight <= floor                             for an untracked item
+
+where a cell's floor is its smallest estimate once it is full (0 before).
+Chunks are reduced exactly and buffered, and the buffer is combined into the
+summary in bulk. Combining two summaries (a buffer, another shard) sums
+estimates and errors item by item, charges an item missing from one side
+that side's floor, and keeps the `capacity` largest estimates per cell. That
+is the mergeable SpaceSaving combine, so shard sketches merge like the other
+aggregates and the result does not depend on the worker count.
+
+`top_items` answers a top-N query over any set of cells and reports whether
+the returned items are guaranteed to be the true top N.
+"""
+
+import numpy as np
+import pandas as pd
+
+SKETCH_CAPACITY = 128
+# Cell columns of the SKU revenue sketch table written by process_data
+SKU_CELL_COLUMNS = ['month', 'year', 'store_id', 'category']
+# Largest error, relative to the estimate, at which a sketch answer replaces the exact one
+TOP_N_TOLERANCE = 0.01
+# Reduce and combine the buffered chunk rows once this many are waiting
+BUFFER_ROWS = 1_000_000
+
+
+def _lookup(sorted_keys, values, query, default=0.0):
+    """values[i] where sorted_keys[i] == query, else `default`."""
+    if len(sorted_keys) == 0:
+        return np.full(len(query), default, dtype=np.float64)
+    pos = np.minimum(np.searchsorted(sorted_keys, query), len(sorted_keys) - 1)
+    found = sorted_keys[pos] == query
+    return np.where(found, values[pos], default)
+
+
+class HeavyHitterSketch:
+    """
+    Weighted SpaceSaving summaries for every cell of `cell_dims`
+    ([(name, cardinality)], packed like DenseKeyAggregator keys) over items
+    with codes in [0, items).
+    """
+
+    def __init__(self, cell_dims, items, capacity=SKETCH_CAPACITY):
+        self.dim_names = [name for name, _ in cell_dims]
+        self.radix = np.array([cardinality for _, cardinality in cell_dims], dtype=np.int64)
+        self.items = int(items)
+        if np.prod(self.radix.astype(float)) * self.items >= 2 ** 63:
+            raise ValueError("Cell and item cardinalities are too large to pack into an int64 key")
+        self.capacity = capacity
+        # (cell, item) keys in sorted order with their estimates and errors
+        self.keys = np.empty(0, dtype=np.int64)
+        self.counts = np.empty(0, dtype=np.float64)
+        self.errors = np.empty(0, dtype=np.float64)
+        self.buffer_keys = []
+        self.buffer_weights = []
+        self.buffered = 0
+
+    def __len__(self):
+        return len(self.keys)
+
+    def encode(self, codes):
+        key = np.zeros(len(codes[self.dim_names[0]]), dtype=np.int64)
+        for name, radix in zip(self.dim_names, self.radix):
+            key = key * radix + np.asarray(codes[name], dtype=np.int64)
+        return key
+
+    def decode(self, cells):
+        codes = {}
+        for name, radix in zip(reversed(self.dim_names), self.radix[::-1]):
+            cells, codes[name] = np.divmod(cells, radix)
+        return {name: codes[name] for name in self.dim_names}
+
+    def add(self, codes, items, weights):
+        """Buffer one chunk: `codes` maps each cell dimension to an array, `weights` must be >= 0."""
+        keys = self.encode(codes) * self.items + np.asarray(items, dtype=np.int64)
+        if len(keys) == 0:
+            return
+        self.buffer_keys.append(keys)
+        self.buffer_weights.append(np.asarray(weights, dtype=np.float64))
+        self.buffered += len(keys)
+        if self.buffered >= BUFFER_ROWS:
+            self.flush()
+
+    def flush(self):
+        """Reduce the buffered rows exactly and combine them into the summary."""
+        if not self.buffered:
+            return
+        uniq, inverse = np.unique(np.concatenate(self.buffer_keys), return_inverse=True)
+        weights = np.bincount(inverse, weights=np.concatenate(self.buffer_weights), minlength=len(uniq))
+        self.buffer_keys, self.buffer_weights, self.buffered = [], [], 0
+        # An exact summary has no untracked weight, so its floor is 0 everywhere
+        self._combine(uniq, weights, np.zeros(len(uniq)), np.empty(0, dtype=np.int64), np.empty(0))
+
+    def cell_floors(self):
+        """(cells, floors): the smallest estimate of every full cell, sorted by cell."""
+        cells = self.keys // self.items
+        uniq, starts, sizes = np.unique(cells, return_index=True, return_counts=True)
+        full = sizes >= self.capacity
+        if not full.any():
+            return uniq[:0], np.empty(0)
+        minima = np.minimum.reduceat(self.counts, starts)
+        return uniq[full], minima[full]
+
+    def _combine(self, keys, counts, errors, floor_cells, floors):
+        """Combine the summary with another one given as sorted keys plus its cell floors."""
+        own_floor_cells, own_floors = self.cell_floors()
+        union = np.union1d(self.keys, keys)
+        cells = union // self.items
+
+        own_missing = _lookup(own_floor_cells, own_floors, cells)
+        other_missing = _lookup(floor_cells, floors, cells)
+        in_own = np.isin(union, self.keys, assume_unique=True)
+        in_other = np.isin(union, keys, assume_unique=True)
+        merged_counts = (np.where(in_own, _lookup(self.keys, self.counts, union), own_missing)
+                         + np.where(in_other, _lookup(keys, counts, union), other_missing))
+        merged_errors = (np.where(in_own, _lookup(self.keys, self.errors, union), own_missing)
+                         + np.where(in_other, _lookup(keys, errors, union), other_missing))
+
+        # Keep the `capacity` largest estimates per cell (ties go to the smaller item code)
+        order = np.lexsort((-merged_counts, cells))
+        sorted_cells = cells[order]
+        first = np.flatnonzero(np.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+        rank = np.arange(len(order)) - np.repeat(first, np.diff(np.r_[first, len(order)]))
+        keep = np.sort(order[rank < self.capacity])
+        self.keys, self.counts, self.errors = union[keep], merged_counts[keep], merged_errors[keep]
+
+    def merge(self, other, remap=None):
+        """Combine another sketch of the same layout into this one (`remap` is not used: cells have no channel)."""
+        self.flush()
+        other.flush()
+        floor_cells, floors = other.cell_floors()
+        self._combine(other.keys, other.counts, other.errors, floor_cells, floors)
+
+    def save(self, path):
+        self.flush()
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                keys=self.keys,
+                counts=self.counts,
+                errors=self.errors,
+                radix=self.radix,
+                dim_names=np.array(self.dim_names),
+                items=self.items,
+                capacity=self.capacity
+            )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            sketch = cls(list(zip(data["dim_names"].tolist(), data["radix"].tolist())),
+                         int(data["items"]), int(data["capacity"]))
+            sketch.keys = data["keys"]
+            sketch.counts = data["counts"]
+            sketch.errors = data["errors"]
+        return sketch
+
+    def same_layout(self, other):
+        return (isinstance(other, HeavyHitterSketch) and self.dim_names == other.dim_names
+                and np.array_equal(self.radix, other.radix) and self.items == other.items
+                and self.capacity == other.capacity)
+
+    def to_frame(self):
+        """Decoded cell codes, item code, estimate and error, one row per tracked item."""
+        self.flush()
+        cells, items = np.divmod(self.keys, self.items)
+        frame = pd.DataFrame(self.decode(cells))
+        frame['item'] = items
+        frame['estimate'] = self.counts
+        frame['error'] = self.errors
+        return frame
+
+
+def top_items(sketch_df, capacity, n, cell_columns, item_column, weight_column='revenue', filters=None):
+    """
+    Top `n` items over the cells selected by `filters` ({column: values}) from
+    a decoded sketch table. Returns (frame, guaranteed): the frame has the
+    item, its estimated weight and its error, largest first; `guaranteed` is
+    True when no other item can outweigh any of the returned ones.
+    """
+    rows = sketch_df
+    if filters:
+        mask = np.ones(len(rows), dtype=bool)
+        for col, values in filters.items():
+            mask &= rows[col].isin(values).to_numpy()
+        rows = rows[mask]
+    if len(rows) == 0:
+        return pd.DataFrame(columns=[item_column, weight_column, 'error']), True
+
+    # Per-cell floors: an item missing from a full cell may still have up to its floor there
+    cell_id = rows.groupby(cell_columns, observed=True, sort=False).ngroup().to_numpy()
+    sizes = np.bincount(cell_id)
+    minima = np.full(len(sizes), np.inf)
+    np.minimum.at(minima, cell_id, rows[weight_column].to_numpy(dtype=np.float64))
+    floors = np.where(sizes >= capacity, minima, 0.0)
+    total_floor = floors.sum()
+
+    items = pd.DataFrame({
+        item_column: rows[item_column].to_numpy(),
+        weight_column: rows[weight_column].to_numpy(dtype=np.float64),
+        'error': rows['error'].to_numpy(dtype=np.float64),
+        'floor': floors[cell_id],
+    }).groupby(item_column, observed=True).sum()
+    # Cells that do not track an item contribute their floor to its estimate and error
+    items[weight_column] += total_floor - items['floor']
+    items['error'] += total_floor - items['floor']
+    items = items.drop(columns='floor').sort_values(weight_column, ascending=False, kind='stable')
+
+    top = items.head(n)
+    lower_bound = (top[weight_column] - top['error']).min()
+    rest_upper = items[weight_column].iloc[n] if len(items) > n else 0.0
+    guaranteed = bool(lower_bound >= max(rest_upper, total_floor)) if len(top) else True
+    return top.reset_index(), guaranteed
@@ -0,0 +1,201 @@
+"""
+BlueMart Sales Validation
+Vectorized data-quality checks run on every chunk inside process_data.
+
+Each chunk is checked column-wise and every failing row gets the first
+reason that applies, in this order:
+
+    embedded_header    a copy of the CSV header line (e.g. from appending files)
+    unparseable        a required field is empty or not a number, or the row
+                       brings more distinct channels than the aggregates can key
+    bad_date           the date is missing, not a date or outside the range
+                       the month and day keys can encode
+    unknown_id         store_id or sku_id is not in the master data
+    negative_quantity  quantity below zero
+    total_mismatch     total_value differs from unit_price x quantity by more than a cent
+
+Failing rows are left out of every aggregate and appended to a quarantine
+file (data/processed/quarantine/sales_rejects.csv) with every column of
+sales_io.SALES_COLUMNS as stored (the original text for CSV) and their
+reason; the counts per reason go into the run's metrics and run report. CSV shards that
+cannot be parsed with the fast typed reader are re-read as text (see
+sales_io.iter_shard_chunks), so this is also where those rows get coerced.
+
+Sales from the generator before it derived total_value from the line's
+quantity fail total_mismatch on about two thirds of their rows. For such
+datasets process_data.py takes --no-total-check (skip the check) or
+--total-tolerance (widen it).
+"""
+
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REJECT_REASONS = ['embedded_header', 'unparseable', 'bad_date', 'unknown_id', 'negative_quantity', 'total_mismatch']
+# Columns that must hold a number on every row (customer_id is blank for walk-ins)
+REQUIRED_NUMERIC = ['store_id', 'sku_id', 'quantity', 'unit_price', 'total_value', 'transaction_id']
+# Text columns that must not be empty
+REQUIRED_TEXT = ['channel']
+# total_value is unit_price x quantity rounded to cents
+TOTAL_TOLERANCE = 0.01
+REJECTS_FILE = "sales_rejects.csv"
+
+
+def _is_text(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return False
+    return pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series)
+
+
+def coerce_chunk(chunk, dtype_spec):
+    """
+    Parse text columns of a leniently read chunk. Returns the coerced frame
+    plus masks of embedded header rows and of fields that failed to parse.
+    Already typed columns pass through unchanged.
+    """
+    header = np.zeros(len(chunk), dtype=bool)
+    unparseable = np.zeros(len(chunk), dtype=bool)
+    coerced = {}
+    for col in chunk.columns:
+        series = chunk[col]
+        if not _is_text(series):
+            coerced[col] = series
+            continue
+        header |= (series == col).to_numpy()
+        if col == 'date':
+            coerced[col] = pd.to_datetime(series, errors='coerce', format='ISO8601')
+        elif dtype_spec.get(col) == 'category':
+            # Cast once the bad rows are gone so header text never becomes a category
+            coerced[col] = series
+        else:
+            numbers = pd.to_numeric(series, errors='coerce')
+            unparseable |= (numbers.isna() & series.notna()).to_numpy()
+            coerced[col] = numbers
+    return pd.DataFrame(coerced, index=chunk.index), header, unparseable
+
+
+def channel_overflow(channels, channel_vocab, max_channels):
+    """
+    Mask of rows whose channel would get a code of `max_channels` or more
+    from `channel_vocab`. New channels get codes in sorted order, as in
+    Vocabulary.encode, so the first ones that fit keep their rows.
+    """
+    new = sorted(set(channels.dropna().unique()) - set(channel_vocab.codes))
+    room = max(max_channels - len(channel_vocab), 0)
+    if len(new) <= room:
+        return np.zeros(len(channels), dtype=bool)
+    return channels.isin(new[room:]).to_numpy()
+
+
+def validate_chunk(chunk, sku_lookup, store_lookup, dtype_spec, total_tolerance=TOTAL_TOLERANCE,
+                   channel_vocab=None, max_channels=None, date_range=None):
+    """
+    Split a chunk into rows that pass every check (cast to `dtype_spec`) and
+    rejected rows, which keep their original values plus a `reason` column
+    and are indexed by their position in the chunk. A `total_tolerance` of
+    None skips the total_mismatch check. With a `channel_vocab`, rows whose
+    channel would not get a code below `max_channels` are unparseable, and
+    with a `date_range` (first, end) dates outside [first, end) are bad_date.
+    """
+    typed, header, unparseable = coerce_chunk(chunk, dtype_spec)
+    for col in REQUIRED_NUMERIC + REQUIRED_TEXT:
+        if col in typed.columns:
+            unparseable |= typed[col].isna().to_numpy()
+    if channel_vocab is not None and max_channels is not None:
+        unparseable |= channel_overflow(typed['channel'], channel_vocab, max_channels)
+
+    checks = {'embedded_header': header, 'unparseable': unparseable & ~header}
+    bad_date = typed['date'].isna()
+    if date_range is not None:
+        first, end = (pd.Timestamp(bound) for bound in date_range)
+        bad_date |= (typed['date'] < first) | (typed['date'] >= end)
+    checks['bad_date'] = bad_date.to_numpy()
+
+    # Comparisons on missing values come out False, so those rows only fail the checks above
+    store_ids = typed['store_id'].fillna(-1).to_numpy(dtype=np.int64)
+    sku_ids = typed['sku_id'].fillna(-1).to_numpy(dtype=np.int64)
+    checks['unknown_id'] = ~(store_lookup.contains(store_ids) & sku_lookup.contains(sku_ids))
+    quantity = typed['quantity'].to_numpy(dtype=np.float64, na_value=np.nan)
+    checks['negative_quantity'] = quantity < 0
+    if total_tolerance is not None and 'unit_price' in typed.columns:
+        unit_price = typed['unit_price'].to_numpy(dtype=np.float64, na_value=np.nan)
+        total_value = typed['total_value'].to_numpy(dtype=np.float64, na_value=np.nan)
+        checks['total_mismatch'] = np.abs(total_value - unit_price * quantity) > total_tolerance + 1e-9
+
+    reason = np.full(len(chunk), -1, dtype=np.int8)
+    for code in reversed(range(len(REJECT_REASONS))):
+        failed = checks.get(REJECT_REASONS[code])
+        if failed is not None:
+            reason[failed] = code
+    bad = reason >= 0
+    if not bad.any():
+        return typed.astype({col: dtype for col, dtype in dtype_spec.items() if col in typed.columns}), None
+
+    rejects = chunk[bad].set_axis(np.flatnonzero(bad))
+    rejects['reason'] = np.array(REJECT_REASONS)[reason[bad]]
+    clean = typed[~bad].astype({col: dtype for col, dtype in dtype_spec.items() if col in typed.columns})
+    return clean, rejects
+
+
+def reject_counts(rejects):
+    """{f'rejected_{reason}': rows} for every reason, zero when none."""
+    counts = rejects['reason'].value_counts() if rejects is not None else {}
+    return {f"rejected_{reason}": int(counts.get(reason, 0)) for reason in REJECT_REASONS}
+
+
+def quarantine_dir(base_dir):
+    return Path(base_dir) / "quarantine"
+
+
+def part_path(base_dir, shard_index):
+    """Per-shard file workers append rejected rows to."""
+    return quarantine_dir(base_dir) / "parts" / f"part-{shard_index:05d}.csv"
+
+
+def write_rejects(path, rejects):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rejects.to_csv(path, mode='a', header=not path.exists(), index=False)
+
+
+def reset_parts(base_dir):
+    """Drop part files left behind by an interrupted run."""
+    shutil.rmtree(quarantine_dir(base_dir) / "parts", ignore_errors=True)
+
+
+def collect_rejects(base_dir, append=False, keep_bytes=None, held_back=None):
+    """
+    Concatenate the shard part files (in shard order) into the quarantine
+    file. A full run replaces the file; an incremental run first cuts it back
+    to `keep_bytes`, dropping the rows of an order it reads again, then
+    appends. Returns the file path (None when nothing was rejected) and the
+    file size before the rows of shard `held_back` (the whole file without one).
+    """
+    parts = sorted((quarantine_dir(base_dir) / "parts").glob("part-*.csv"))
+    target = quarantine_dir(base_dir) / REJECTS_FILE
+    if append and keep_bytes is not None and target.exists():
+        os.truncate(target, min(keep_bytes, target.stat().st_size))
+    if target.exists() and (not append or target.stat().st_size == 0):
+        target.unlink()
+    if not parts:
+        return (target if target.exists() else None), (target.stat().st_size if target.exists() else 0)
+    held_back_part = part_path(base_dir, held_back).name if held_back is not None else None
+    kept = None
+    write_header = not target.exists()
+    with open(target, "ab") as out:
+        for part in parts:
+            with open(part, "rb") as f:
+                header_line = f.readline()
+                if write_header:
+                    out.write(header_line)
+                    write_header = False
+                if part.name == held_back_part:
+                    kept = out.tell()
+                shutil.copyfileobj(f, out)
+        if kept is None:
+            kept = out.tell()
+    reset_parts(base_dir)
+    return target, kept
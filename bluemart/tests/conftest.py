@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# Lets the tests import the pipeline modules (`from scripts import ...`) and tests/helpers.py
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
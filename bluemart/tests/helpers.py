@@ -0,0 +1,80 @@
+"""
+Shared test helpers: a small synthetic dataset (two stores, three SKUs, two
+registered customers) and a runner for scripts/process_data.py on it.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+BLUEMART_DIR = Path(__file__).resolve().parents[1]
+
+SALES_HEADER = "date,store_id,sku_id,customer_id,quantity,unit_price,total_value,channel,discount_pct,transaction_id\n"
+PRICES = {1001: 10.00, 1002: 4.50, 1003: 2.25}
+
+
+def write_masters(raw_dir):
+    raw_dir.mkdir(parents=True, exist_ok=True)
+    (raw_dir / "bm_stores.csv").write_text(
+        "store_id,store_name,city,store_type,opening_date\n"
+        "1,BlueMart Store 01,Dubai,Mall,2017-01-01\n"
+        "2,BlueMart Store 02,Sharjah,Mall,2017-01-31\n")
+    (raw_dir / "bm_skus.csv").write_text(
+        "sku_id,sku_name,category,subcategory,unit_price,cost_price,brand\n"
+        "1001,Dairy_Cheese_1001,Dairy,Cheese,10.00,7.00,Premium\n"
+        "1002,Snacks_Nuts_1002,Snacks,Nuts,4.50,3.00,Premium\n"
+        "1003,Bakery_Bread_1003,Bakery,Bread,2.25,1.50,Value\n")
+    (raw_dir / "bm_promotions.csv").write_text(
+        "promo_name,start_date,end_date,discount_pct,promo_type,promo_id\n"
+        "Ramadan Sale 2025,2025-04-01,2025-05-01,20,Ramadan,1\n")
+    (raw_dir / "bm_customers.csv").write_text(
+        "cust_id,age,gender,city,loyalty_segment,registration_date\n"
+        "1,30,Female,Dubai,Platinum,2025-01-01\n"
+        "2,40,Male,Sharjah,Gold,2025-01-01\n")
+
+
+def sales_lines(orders=300):
+    """Orders of one to three lines, every third a walk-in, spread over two months."""
+    lines = []
+    for order in range(1, orders + 1):
+        date = f"2025-0{1 + order % 2}-{1 + order % 28:02d}"
+        customer = "" if order % 3 == 0 else str(1 + order % 2)
+        channel = "Online" if order % 4 == 0 else "Store"
+        for sku in list(PRICES)[:1 + order % 3]:
+            quantity = 1 + (order + sku) % 4
+            total = PRICES[sku] * quantity
+            lines.append(f"{date},{1 + order % 2},{sku},{customer},{quantity},{PRICES[sku]:.2f},{total:.2f},{channel},0,{order}\n")
+    return lines
+
+
+def make_dataset(data_dir, lines):
+    """A data dir holding the masters and `lines` as bm_sales.csv."""
+    write_masters(data_dir / "raw")
+    (data_dir / "raw" / "bm_sales.csv").write_text(SALES_HEADER + "".join(lines))
+    return data_dir
+
+
+def run_script(name, data_dir, *args, check=True):
+    """Run scripts/`name` on `data_dir` without a run report."""
+    env = dict(os.environ, BLUEMART_DATA_DIR=str(data_dir))
+    return subprocess.run([sys.executable, str(BLUEMART_DIR / "scripts" / name), "--no-report", *args],
+                          env=env, check=check, capture_output=True, text=True)
+
+
+def process(data_dir, *args, source="csv"):
+    """Run process_data.py on `data_dir`; returns its stdout."""
+    return run_script("process_data.py", data_dir, "--source", source, *args).stdout
+
+
+def outputs(data_dir):
+    """Summary metrics and the sorted order counts of the last run."""
+    processed = data_dir / "processed"
+    with open(processed / "summary_metrics.json") as f:
+        summary = json.load(f)
+    order_counts = pd.read_parquet(processed / "order_counts.parquet")
+    order_counts = order_counts.sort_values(list(order_counts.columns)).reset_index(drop=True)
+    return summary, order_counts
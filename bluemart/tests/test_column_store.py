@@ -0,0 +1,40 @@
+"""
+Runs on the memory-mapped column store match runs on the CSV it was
+converted from, and conversion refuses sales it cannot encode.
+"""
+
+import pandas as pd
+import pytest
+
+from helpers import SALES_HEADER, make_dataset, outputs, process, run_script, sales_lines
+from scripts import validation
+
+BAD_ROW = "2025-01-05,1,1001,,2,10.00,25.00,Store,0,900001\n"  # total_mismatch
+
+
+def test_column_store_matches_csv(tmp_path):
+    lines = sales_lines()
+    lines = lines[:40] + [BAD_ROW] + lines[40:]
+    csv_dir, columns_dir = make_dataset(tmp_path / "csv", lines), make_dataset(tmp_path / "columns", lines)
+    process(csv_dir, "--full-rebuild")
+    run_script("build_column_store.py", columns_dir, "--source", "csv")
+    assert "columns sales data" in process(columns_dir, "--full-rebuild", source="columns")
+
+    csv_summary, csv_order_counts = outputs(csv_dir)
+    columns_summary, columns_order_counts = outputs(columns_dir)
+    assert columns_summary == pytest.approx(csv_summary)
+    pd.testing.assert_frame_equal(columns_order_counts, csv_order_counts)
+    # Rejected rows are quarantined with every column, whatever the source
+    quarantine = [pd.read_csv(data_dir / "processed" / "quarantine" / validation.REJECTS_FILE)
+                  for data_dir in (csv_dir, columns_dir)]
+    assert quarantine[0]['transaction_id'].tolist() == [900001]
+    pd.testing.assert_frame_equal(quarantine[1], quarantine[0])
+
+
+def test_conversion_refuses_embedded_headers(tmp_path):
+    lines = sales_lines(20)
+    data_dir = make_dataset(tmp_path / "data", lines[:10] + [SALES_HEADER] + lines[10:])
+    run = run_script("build_column_store.py", data_dir, "--source", "csv", check=False)
+    assert run.returncode == 1
+    assert "repeat the header line at data row 11" in run.stdout
+    assert "fix_sales_csv.py" in run.stdout
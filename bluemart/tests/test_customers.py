@@ -0,0 +1,91 @@
+"""
+Customer slots and loyalty tiers, CustomerAggregator merges, the
+per-customer RFM table, and how a run reports walk-ins and ids missing
+from the customer master.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from helpers import make_dataset, outputs, process, sales_lines
+from scripts import customers
+from scripts.dimensions import DenseLookup
+
+LOOKUP = DenseLookup(pd.DataFrame({'cust_id': [1, 2, 3], 'loyalty_segment': ['Gold', 'Silver', None]}),
+                     'cust_id', ['loyalty_segment'])
+
+
+def test_walk_ins_and_unknown_ids_get_their_own_slots():
+    ids = pd.Series([1, None, 2, 9, 3, -4], dtype='Int64')
+    slots = customers.customer_slots(LOOKUP, ids)
+    assert slots.tolist() == [1, LOOKUP.missing_slot, 2, customers.unknown_slot(LOOKUP), 3,
+                              customers.unknown_slot(LOOKUP)]
+    assert slots.max() < customers.slot_count(LOOKUP)
+    tiers = np.array(customers.tier_names(LOOKUP))[customers.tier_codes(LOOKUP, slots)]
+    assert tiers.tolist() == ['Gold', 'Walk-in', 'Silver', 'Unknown', 'Unknown', 'Unknown']
+
+
+def add_lines(aggregator, slots, days, channels, revenue, starts):
+    values = {'revenue': np.asarray(revenue, dtype=float), 'profit': np.zeros(len(slots)),
+              'quantity': np.ones(len(slots)), 'lines': np.ones(len(slots))}
+    aggregator.add(np.asarray(slots), np.asarray(days), np.asarray(channels), values, np.asarray(starts))
+
+
+def test_merged_shards_match_one_pass():
+    lines = ([1, 1, 2, 4], [100, 100, 101, 101], [0, 0, 1, 0], [5.0, 6.0, 7.0, 8.0], [0, 2, 3])
+    more = ([1, 2], [110, 90], [1, 1], [1.0, 2.0], [0, 1])
+
+    whole = customers.CustomerAggregator(customers.slot_count(LOOKUP))
+    add_lines(whole, *lines)
+    add_lines(whole, *more)
+
+    first, second = (customers.CustomerAggregator(customers.slot_count(LOOKUP)) for _ in range(2))
+    add_lines(first, *lines)
+    # The second shard saw the channels in the other order
+    add_lines(second, more[0], more[1], [0, 0], more[3], more[4])
+    first.merge(second, remap={'channel': [1]})
+
+    for attr in ('sums', 'channel_orders', 'first_day', 'last_day'):
+        np.testing.assert_array_equal(getattr(first, attr), getattr(whole, attr))
+    assert whole.orders().tolist() == [0, 2, 2, 0, 1, 0]
+    assert (whole.first_day[1], whole.last_day[1]) == (100, 110)
+    assert (whole.first_day[2], whole.last_day[2]) == (90, 101)
+
+
+def test_customer_table():
+    aggregator = customers.CustomerAggregator(customers.slot_count(LOOKUP))
+    add_lines(aggregator, [1, 1, 2, 4, 5], [100, 100, 101, 102, 103], [0, 0, 1, 0, 0],
+              [5.0, 6.0, 7.0, 8.0, 9.0], [0, 2, 3, 4])
+    table, as_of = customers.customer_table(aggregator, LOOKUP, ['Online', 'Store'])
+    # Walk-ins (slot 4) and unknown ids (slot 5) are never reported as customers
+    assert table['customer_id'].tolist() == [1, 2]
+    assert as_of == np.datetime64('1970-04-14')
+    assert table['monetary'].tolist() == [11.0, 7.0]
+    assert table['recency_days'].tolist() == [3, 2]
+    assert table['primary_channel'].astype(str).tolist() == ['Online', 'Store']
+    assert customers.walk_in_totals(aggregator, LOOKUP)['revenue'] == 8.0
+    assert customers.unknown_totals(aggregator, LOOKUP)['orders'] == 1
+
+
+def test_unknown_ids_stay_out_of_the_walk_in_tier(tmp_path):
+    lines = sales_lines(60)
+    unknown = [line.replace(",1,1001,1,", ",1,1001,9,") for line in lines if ",1,1001,1," in line]
+    assert unknown
+    known_dir = make_dataset(tmp_path / "known", [line for line in lines if line not in unknown])
+    mixed_dir = make_dataset(tmp_path / "mixed", [line for line in lines if line not in unknown] + unknown)
+    process(known_dir, "--full-rebuild")
+    process(mixed_dir, "--full-rebuild")
+    known, _ = outputs(known_dir)
+    mixed, _ = outputs(mixed_dir)
+
+    assert mixed["walk_in_orders"] == known["walk_in_orders"]
+    assert mixed["walk_in_revenue"] == pytest.approx(known["walk_in_revenue"])
+    unknown_revenue = sum(float(line.split(",")[6]) for line in unknown)
+    assert mixed["unknown_customer_revenue"] == pytest.approx(unknown_revenue)
+    assert mixed["unknown_customer_orders"] == len({line.split(",")[-1] for line in unknown})
+
+    loyalty = pd.read_parquet(mixed_dir / "processed" / "rollups" / "loyalty_month.parquet")
+    by_tier = loyalty.groupby('loyalty_segment', observed=True)['revenue'].sum()
+    assert by_tier['Unknown'] == pytest.approx(unknown_revenue)
+    assert by_tier['Walk-in'] == pytest.approx(known["walk_in_revenue"])
@@ -0,0 +1,52 @@
+"""
+Day offsets, DailySeries date-range slicing, and the daily table a run
+writes adding up to the run's totals.
+"""
+
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from helpers import make_dataset, outputs, process, sales_lines
+from scripts import daily
+
+
+def test_day_numbers():
+    days = daily.day_numbers(pd.Series(pd.to_datetime(['1970-01-01', '2025-03-22', None, '2149-06-06'])))
+    assert days.tolist() == [0, 20169, daily.NO_DAY, daily.DAY_RADIX - 1]
+    assert daily.day_numbers([datetime.date(2025, 3, 22)]).tolist() == [20169]
+    assert daily.day_dates([20169])[0] == np.datetime64('2025-03-22')
+
+
+def test_unsorted_table_is_refused():
+    with pytest.raises(ValueError):
+        daily.DailySeries(pd.DataFrame({'day': [2, 1], 'revenue': [1.0, 1.0]}))
+
+
+def test_slice_and_series():
+    days = daily.day_numbers(pd.to_datetime(['2025-01-01', '2025-01-01', '2025-01-03', '2025-01-05']))
+    frame = pd.DataFrame({'day': days, 'store_id': [1, 2, 1, 2],
+                          'revenue': [1.0, 2.0, 4.0, 8.0], 'profit': [0.5, 1.0, 2.0, 4.0]})
+    table = daily.DailySeries(frame)
+    assert table.date_range() == (datetime.date(2025, 1, 1), datetime.date(2025, 1, 5))
+    # Both bounds are inclusive, and dates between rows select nothing extra
+    assert table.slice('2025-01-01', '2025-01-03')['revenue'].tolist() == [1.0, 2.0, 4.0]
+    assert table.slice('2025-01-02', '2025-01-04')['revenue'].tolist() == [4.0]
+    assert table.slice(end='2024-12-31').empty and table.slice(start='2025-01-06').empty
+    assert table.query(filters={'store_id': [2]})['revenue'].tolist() == [2.0, 8.0]
+
+    series = table.series('2025-01-01', '2025-01-05')
+    assert series.index.tolist() == list(pd.date_range('2025-01-01', '2025-01-05', name='date'))
+    assert series['revenue'].tolist() == [3.0, 0.0, 4.0, 0.0, 8.0]
+
+
+def test_daily_table_matches_the_run_totals(tmp_path):
+    data_dir = make_dataset(tmp_path / "data", sales_lines())
+    process(data_dir, "--full-rebuild", "--workers", "2")
+    summary, _ = outputs(data_dir)
+    table = daily.DailySeries(pd.read_parquet(data_dir / "processed" / "daily_sales.parquet"))
+    assert table.frame['revenue'].sum() == pytest.approx(summary["total_revenue"])
+    assert table.frame['lines'].sum() == summary["total_lines"]
+    assert table.date_range() == (datetime.date(2025, 1, 1), datetime.date(2025, 2, 28))
@@ -0,0 +1,62 @@
+"""
+FilterIndex answers match a row-by-row isin, for bitmap and row-id columns,
+and QueryRouter gives the same rows with or without it.
+"""
+
+import calendar
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.filters import BITMAP_MAX_VALUES, FilterIndex
+from scripts.rollups import QueryRouter
+
+rng = np.random.default_rng(7)
+ROWS = 5000
+FRAME = pd.DataFrame({
+    'month': pd.Categorical(rng.choice(calendar.month_name[1:6], ROWS), categories=calendar.month_name[1:], ordered=True),
+    'channel': pd.Categorical(rng.choice(['Store', 'Online', None], ROWS, p=[0.6, 0.35, 0.05])),
+    'store_name': rng.choice([f"Store {i:02d}" for i in range(BITMAP_MAX_VALUES + 20)], ROWS),
+    'revenue': rng.uniform(0, 100, ROWS),
+})
+INDEX = FilterIndex(FRAME, ['month', 'channel', 'store_name'])
+
+
+def expected(filters):
+    mask = np.ones(ROWS, dtype=bool)
+    for col, values in filters.items():
+        mask &= FRAME[col].isin(values).to_numpy()
+    return np.flatnonzero(mask)
+
+
+def test_layout_and_values():
+    assert 'store_name' in INDEX.row_ids and 'channel' in INDEX.bitmaps
+    # Ordered categoricals keep their order; unused categories and missing values are left out
+    assert INDEX.values('month') == list(calendar.month_name[1:6])
+    assert set(INDEX.values('channel')) == {'Store', 'Online'}
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_select_matches_isin(seed):
+    pick = np.random.default_rng(seed)
+    filters = {}
+    for col in pick.choice(['month', 'channel', 'store_name'], pick.integers(1, 4), replace=False):
+        values = INDEX.values(col)
+        # Small and large selections exercise both sides of the complement
+        filters[col] = list(pick.choice(values, pick.integers(1, len(values) + 1), replace=False))
+    np.testing.assert_array_equal(INDEX.select(filters), expected(filters))
+
+
+def test_unknown_values_and_no_filter():
+    assert len(INDEX.select({'channel': ['Kiosk']})) == 0
+    np.testing.assert_array_equal(INDEX.select({'channel': ['Kiosk', 'Store']}), expected({'channel': ['Store']}))
+    assert INDEX.take(FRAME, {}) is FRAME
+    assert len(INDEX.select({})) == ROWS
+
+
+def test_router_uses_the_index_for_base_filters():
+    filters = {'store_name': ['Store 03', 'Store 40'], 'month': ['February']}
+    indexed = QueryRouter(FRAME, {}, INDEX).query(['revenue'], filters)
+    plain = QueryRouter(FRAME, {}).query(['revenue'], filters)
+    pd.testing.assert_frame_equal(indexed, plain)
@@ -0,0 +1,108 @@
+"""
+fix_sales_csv: duplicate headers are removed through the side file and
+redo journal, and a run interrupted at any point is finished by the next.
+"""
+
+import mmap
+
+import numpy as np
+import pytest
+
+from helpers import SALES_HEADER, make_dataset, run_script, sales_lines
+from scripts import fix_sales_csv, sales_io
+
+HEADER = SALES_HEADER.encode()
+
+
+def dirty_csv(path):
+    """A sales CSV with header copies mid-file and as its last line (no newline); returns the clean bytes."""
+    lines = [line.encode() for line in sales_lines(40)]
+    clean = HEADER + b"".join(lines)
+    path.write_bytes(HEADER + b"".join(lines[:5]) + HEADER + b"".join(lines[5:30]) + HEADER + HEADER
+                     + b"".join(lines[30:]) + HEADER.rstrip(b"\n"))
+    return clean
+
+
+def compact(path):
+    """Scan and stage the repair like fix_sales_csv, stopping before the CSV is touched."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        duplicates, offsets, rows = fix_sales_csv.scan_sales_csv(data, HEADER, every=7)
+        fix_sales_csv.write_compacted_tail(data, duplicates, len(HEADER), path)
+    return duplicates, offsets, rows
+
+
+@pytest.fixture(autouse=True)
+def small_blocks(monkeypatch):
+    # Blocks of a few lines, so duplicates and indexed rows straddle block boundaries
+    monkeypatch.setattr(fix_sales_csv, "SCAN_BLOCK_BYTES", 200)
+
+
+def test_scan_finds_duplicates_and_indexes_clean_rows(tmp_path):
+    path = tmp_path / "bm_sales.csv"
+    clean = dirty_csv(path)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        duplicates, offsets, rows = fix_sales_csv.scan_sales_csv(data, HEADER, every=7)
+    assert len(duplicates) == 4
+    assert rows == clean.count(b"\n") - 1
+    row_starts = np.flatnonzero(np.frombuffer(clean, dtype=np.uint8) == ord("\n"))[:-1] + 1
+    np.testing.assert_array_equal(offsets, row_starts[::7])
+
+
+def test_journal_replay_applies_the_repair(tmp_path):
+    path = tmp_path / "bm_sales.csv"
+    clean = dirty_csv(path)
+    compact(path)
+    # Interrupted after the journal: the CSV is untouched until the replay
+    assert fix_sales_csv.journal_path(path).exists()
+    assert path.read_bytes() != clean
+    assert fix_sales_csv.replay_journal(path)
+    assert path.read_bytes() == clean
+    assert not fix_sales_csv.journal_path(path).exists() and not fix_sales_csv.tail_path(path).exists()
+
+
+@pytest.mark.parametrize("copied", ["half", "all", "truncated"])
+def test_replay_after_an_interrupted_apply(tmp_path, copied):
+    path = tmp_path / "bm_sales.csv"
+    clean = dirty_csv(path)
+    duplicates, _, _ = compact(path)
+    tail = fix_sales_csv.tail_path(path).read_bytes()
+    with open(path, "r+b") as f:
+        f.seek(duplicates[0])
+        f.write(tail[:len(tail) // 2] if copied == "half" else tail)
+        if copied == "truncated":
+            f.truncate(duplicates[0] + len(tail))
+    assert fix_sales_csv.replay_journal(path)
+    assert path.read_bytes() == clean
+
+
+def test_leftovers_without_a_journal_are_dropped(tmp_path):
+    path = tmp_path / "bm_sales.csv"
+    dirty_csv(path)
+    before = path.read_bytes()
+    compact(path)
+    fix_sales_csv.journal_path(path).unlink()
+    assert not fix_sales_csv.replay_journal(path)
+    assert path.read_bytes() == before
+    assert not fix_sales_csv.tail_path(path).exists()
+
+
+def test_changed_csv_refuses_the_journal(tmp_path):
+    path = tmp_path / "bm_sales.csv"
+    dirty_csv(path)
+    compact(path)
+    with open(path, "ab") as f:
+        f.write(b"2025-03-01,1,1001,,1,10.00,10.00,Store,0,999\n")
+    with pytest.raises(ValueError):
+        fix_sales_csv.replay_journal(path)
+
+
+def test_script_finishes_an_interrupted_run(tmp_path):
+    data_dir = make_dataset(tmp_path / "data", [])
+    path = data_dir / "raw" / "bm_sales.csv"
+    clean = dirty_csv(path)
+    compact(path)
+    run = run_script("fix_sales_csv.py", data_dir, "--source", "csv")
+    assert "interrupted run" in run.stdout
+    assert path.read_bytes() == clean
+    index = np.load(sales_io.csv_index_path(path))
+    assert int(index["rows"]) == clean.count(b"\n") - 1
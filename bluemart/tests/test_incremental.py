@@ -0,0 +1,61 @@
+"""
+Incremental CSV runs must match a full rebuild, including when appended
+rows continue the order the previous run stopped in, and changed masters
+must force one.
+
+Run with `python -m pytest bluemart/tests`.
+"""
+
+import pandas as pd
+import pytest
+
+from helpers import SALES_HEADER, make_dataset, outputs, process, sales_lines, write_masters
+
+
+@pytest.mark.parametrize("workers", ["1", "2"])
+def test_appended_rows_continuing_the_last_order(tmp_path, workers):
+    lines = sales_lines()
+    # Cut between two lines of an order with three lines
+    split = max(i for i in range(1, len(lines) - 1)
+                if lines[i - 1].rsplit(",", 1)[1] == lines[i].rsplit(",", 1)[1] == lines[i + 1].rsplit(",", 1)[1])
+
+    full_dir, incremental_dir = tmp_path / "full", tmp_path / "incremental"
+    for data_dir in (full_dir, incremental_dir):
+        write_masters(data_dir / "raw")
+    (full_dir / "raw" / "bm_sales.csv").write_text(SALES_HEADER + "".join(lines))
+    process(full_dir, "--full-rebuild", "--workers", workers)
+
+    sales = incremental_dir / "raw" / "bm_sales.csv"
+    sales.write_text(SALES_HEADER + "".join(lines[:split]))
+    process(incremental_dir, "--full-rebuild", "--workers", workers)
+    with open(sales, "a") as f:
+        f.writelines(lines[split:])
+    assert "Incremental run" in process(incremental_dir, "--workers", workers)
+
+    full_summary, full_order_counts = outputs(full_dir)
+    incremental_summary, incremental_order_counts = outputs(incremental_dir)
+    assert incremental_summary["total_orders"] == full_summary["total_orders"] == 300
+    assert incremental_summary["walk_in_orders"] == full_summary["walk_in_orders"]
+    assert incremental_summary == pytest.approx(full_summary)
+    pd.testing.assert_frame_equal(incremental_order_counts, full_order_counts)
+
+
+def test_master_changes(tmp_path):
+    data_dir = make_dataset(tmp_path / "data", sales_lines())
+    process(data_dir, "--full-rebuild")
+
+    # Promotions are not part of any aggregate, so editing them keeps the saved state
+    with open(data_dir / "raw" / "bm_promotions.csv", "a") as f:
+        f.write("Summer Sale 2025,2025-07-01,2025-08-01,10,Seasonal,2\n")
+    assert "Incremental run" in process(data_dir)
+
+    # A customer changing tier moves their sales, so the saved state is rebuilt
+    customers_file = data_dir / "raw" / "bm_customers.csv"
+    customers_file.write_text(customers_file.read_text().replace("1,30,Female,Dubai,Platinum", "1,30,Female,Dubai,Silver"))
+    assert "No usable watermark" in process(data_dir)
+    customer_aggregates = pd.read_parquet(data_dir / "processed" / "customer_aggregates.parquet")
+    assert customer_aggregates.set_index('customer_id')['loyalty_segment'].astype(str).to_dict() == {1: 'Silver', 2: 'Gold'}
+
+    # So does removing the optional customer master
+    customers_file.unlink()
+    assert "No usable watermark" in process(data_dir)
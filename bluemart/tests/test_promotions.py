@@ -0,0 +1,41 @@
+"""
+PromotionIndex overlap rules, and that process_data runs without a
+promotions calendar now that no aggregate uses it.
+"""
+
+import pandas as pd
+
+from helpers import make_dataset, outputs, process, sales_lines
+from scripts.promotions import PromotionIndex
+
+CALENDAR = pd.DataFrame({
+    'promo_name': ['Spring', 'Flash', 'Store 2 Week', 'Store 2 Priority'],
+    'start_date': ['2025-03-01', '2025-03-10', '2025-03-08', '2025-03-12'],
+    'end_date': ['2025-03-31', '2025-03-11', '2025-03-14', '2025-03-12'],
+    'discount_pct': [10, 30, 5, 1],
+    'store_id': [None, None, 2, 2],
+    'priority': [0, 0, 0, 1],
+})
+
+
+def test_chain_wide_tags():
+    index = PromotionIndex(CALENDAR)
+    dates = pd.to_datetime(['2025-02-28', '2025-03-01', '2025-03-10', '2025-03-11', '2025-03-12', '2025-03-31', '2025-04-01'])
+    # Flash beats Spring on a higher discount; end dates are inclusive
+    assert index.tag(dates).tolist() == [-1, 0, 1, 1, 0, 0, -1]
+    assert index.discounts(dates).tolist() == [0, 10, 30, 30, 10, 10, 0]
+
+
+def test_store_scoped_tags():
+    index = PromotionIndex(CALENDAR)
+    dates = pd.to_datetime(['2025-03-09', '2025-03-10', '2025-03-12', '2025-03-12', '2025-03-13'])
+    stores = [2, 2, 2, 1, 7]
+    # Store-scoped beats chain-wide at equal priority; priority beats both
+    assert index.tag(dates, stores).tolist() == [2, 2, 3, 0, 0]
+
+
+def test_process_data_without_promotions(tmp_path):
+    data_dir = make_dataset(tmp_path / "data", sales_lines(30))
+    (data_dir / "raw" / "bm_promotions.csv").unlink()
+    process(data_dir, "--full-rebuild")
+    assert outputs(data_dir)[0]["total_orders"] == 30
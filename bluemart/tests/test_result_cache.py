@@ -0,0 +1,81 @@
+"""
+ResultCache keys, LRU eviction under the byte budget, counters and copies.
+"""
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+from scripts.result_cache import ResultCache, estimate_nbytes, normalize_filters
+
+
+def array(value, size=100):
+    return np.full(size, value, dtype=np.float64)  # 800 bytes
+
+
+def test_filter_order_does_not_matter():
+    assert normalize_filters({'store': [2, 1], 'channel': ['Store']}) == \
+        normalize_filters({'channel': ['Store'], 'store': ['1', '2']})
+    cache = ResultCache(10_000)
+    calls = []
+    for filters in ({'store': [1, 2], 'month': ['May']}, {'month': ['May'], 'store': [2, 1]}):
+        cache.get_or_compute('kpis', filters, lambda: calls.append(1) or array(1))
+    assert len(calls) == 1
+    # Another widget, or the same one with other extra state, is its own entry
+    cache.get_or_compute('kpis', {'store': [1, 2], 'month': ['May']}, lambda: array(2), extra=('2025-01-01', None))
+    cache.get_or_compute('top_skus', {}, lambda: array(3))
+    assert cache.stats()['entries'] == 3
+
+
+def test_least_recently_used_is_evicted():
+    cache = ResultCache(max_bytes=3 * estimate_nbytes(array(0)))
+    for name in 'abc':
+        cache.get_or_compute(name, {}, lambda: array(0))
+    cache.get_or_compute('a', {}, lambda: array(0))  # 'a' is now the most recent
+    cache.get_or_compute('d', {}, lambda: array(0))
+    assert [key[0] for key in cache.entries] == ['c', 'a', 'd']
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (1, 4, 1)
+    assert stats['bytes'] == 3 * estimate_nbytes(array(0)) <= stats['max_bytes']
+    assert stats['hit_rate'] == 0.2
+
+
+def test_result_larger_than_the_budget_is_not_kept():
+    cache = ResultCache(max_bytes=1000)
+    cache.get_or_compute('small', {}, lambda: array(0, 10))
+    result = cache.get_or_compute('big', {}, lambda: array(1, 1000))
+    assert len(result) == 1000
+    assert [key[0] for key in cache.entries] == ['small']
+
+
+def test_frames_are_handed_out_as_copies():
+    cache = ResultCache(10_000)
+    first = cache.get_or_compute('table', {}, lambda: pd.DataFrame({'revenue': [1.0, 2.0]}))
+    first['revenue'] = first['revenue'].map("AED {:,.0f}".format)
+    second = cache.get_or_compute('table', {}, lambda: None)
+    assert second['revenue'].tolist() == [1.0, 2.0]
+
+
+def test_concurrent_sessions():
+    cache = ResultCache(50 * estimate_nbytes(array(0)))
+    errors = []
+
+    def session(seed):
+        rng = np.random.default_rng(seed)
+        try:
+            for widget in rng.integers(0, 80, 200):
+                value = cache.get_or_compute(int(widget), {}, lambda: array(widget))
+                assert value[0] == widget
+        except AssertionError as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=session, args=(seed,)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    stats = cache.stats()
+    assert stats['hits'] + stats['misses'] == 800
+    assert stats['bytes'] == sum(nbytes for _, nbytes in cache.entries.values()) <= stats['max_bytes']
@@ -0,0 +1,107 @@
+"""
+SpaceSaving guarantees of HeavyHitterSketch, across chunk flushes and shard
+merges, and top_items answers against exact totals.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from scripts.sketches import HeavyHitterSketch, top_items
+
+CELLS = [('store', 3)]
+ITEMS = 60
+CAPACITY = 8
+
+
+def stream(seed, rows=5000):
+    """Skewed item weights: a few heavy items per store and a long tail."""
+    rng = np.random.default_rng(seed)
+    stores = rng.integers(0, 3, rows)
+    items = np.minimum(rng.zipf(1.5, rows) - 1, ITEMS - 1)
+    weights = rng.uniform(0.5, 5.0, rows)
+    return stores, items, weights
+
+
+def add_in_chunks(sketch, stores, items, weights, chunk=700):
+    for start in range(0, len(items), chunk):
+        part = slice(start, start + chunk)
+        sketch.add({'store': stores[part]}, items[part], weights[part])
+        sketch.flush()
+
+
+def exact_totals(stores, items, weights):
+    totals = np.zeros((3, ITEMS))
+    np.add.at(totals, (stores, items), weights)
+    return totals
+
+
+def assert_guarantees(sketch, totals):
+    frame = sketch.to_frame()
+    for store in range(3):
+        cell = frame[frame['store'] == store]
+        assert len(cell) <= CAPACITY
+        truth = totals[store, cell['item'].to_numpy()]
+        assert (cell['estimate'].to_numpy() - cell['error'].to_numpy() <= truth + 1e-9).all()
+        assert (truth <= cell['estimate'].to_numpy() + 1e-9).all()
+        floor = cell['estimate'].min() if len(cell) >= CAPACITY else 0.0
+        untracked = np.setdiff1d(np.arange(ITEMS), cell['item'].to_numpy())
+        assert (totals[store, untracked] <= floor + 1e-9).all()
+
+
+def test_guarantees_across_flushes():
+    stores, items, weights = stream(1)
+    sketch = HeavyHitterSketch(CELLS, ITEMS, CAPACITY)
+    add_in_chunks(sketch, stores, items, weights)
+    assert_guarantees(sketch, exact_totals(stores, items, weights))
+
+
+def test_guarantees_after_merging_shards(tmp_path):
+    stores, items, weights = stream(2, rows=9000)
+    shards = []
+    for part in np.array_split(np.arange(len(items)), 3):
+        shard = HeavyHitterSketch(CELLS, ITEMS, CAPACITY)
+        add_in_chunks(shard, stores[part], items[part], weights[part])
+        shards.append(shard)
+    merged = HeavyHitterSketch(CELLS, ITEMS, CAPACITY)
+    for shard in shards:
+        merged.merge(shard)
+    assert_guarantees(merged, exact_totals(stores, items, weights))
+
+    merged.save(tmp_path / "sketch.npz")
+    loaded = HeavyHitterSketch.load(tmp_path / "sketch.npz")
+    assert loaded.same_layout(merged)
+    pd.testing.assert_frame_equal(loaded.to_frame(), merged.to_frame())
+
+
+def test_exact_below_capacity():
+    stores, items, weights = stream(3)
+    sketch = HeavyHitterSketch(CELLS, ITEMS, capacity=ITEMS)
+    add_in_chunks(sketch, stores, items, weights)
+    frame = sketch.to_frame()
+    totals = exact_totals(stores, items, weights)
+    assert (frame['error'] == 0).all()
+    np.testing.assert_allclose(frame['estimate'], totals[frame['store'], frame['item']])
+
+
+def test_top_items_over_cells():
+    stores, items, weights = stream(4, rows=20000)
+    sketch = HeavyHitterSketch(CELLS, ITEMS, CAPACITY)
+    add_in_chunks(sketch, stores, items, weights)
+    frame = sketch.to_frame().rename(columns={'estimate': 'revenue'})
+    totals = exact_totals(stores, items, weights)
+
+    top, guaranteed = top_items(frame, CAPACITY, 3, ['store'], 'item', filters={'store': [0, 2]})
+    true_weights = totals[[0, 2]].sum(axis=0)
+    assert guaranteed
+    assert top['item'].tolist() == list(np.argsort(-true_weights, kind='stable')[:3])
+    assert (top['revenue'] - top['error'] <= true_weights[top['item']] + 1e-9).all()
+    assert (true_weights[top['item']] <= top['revenue'] + 1e-9).all()
+
+    empty, guaranteed = top_items(frame, CAPACITY, 3, ['store'], 'item', filters={'store': [7]})
+    assert empty.empty and guaranteed
+
+
+def test_keys_must_fit_in_int64():
+    with pytest.raises(ValueError):
+        HeavyHitterSketch([('cell', 2 ** 40)], 2 ** 30)
@@ -0,0 +1,102 @@
+"""
+Rows validation.validate_chunk rejects, and that a run quarantines them
+instead of letting them reach the aggregates.
+"""
+
+import io
+
+import numpy as np
+import pandas as pd
+
+from helpers import SALES_HEADER, make_dataset, outputs, process, sales_lines
+from scripts import validation
+from scripts.dimensions import DenseLookup, Vocabulary
+
+DTYPE_SPEC = {'transaction_id': 'int64', 'customer_id': 'Int64', 'store_id': 'int32', 'sku_id': 'int32',
+              'quantity': 'int32', 'unit_price': 'float64', 'total_value': 'float32', 'channel': 'category'}
+SKUS = DenseLookup(pd.DataFrame({'sku_id': [1001, 1002], 'category': ['Dairy', 'Snacks']}), 'sku_id', ['category'])
+STORES = DenseLookup(pd.DataFrame({'store_id': [1, 2]}), 'store_id', [])
+
+EMPTY_CHANNEL = "2025-03-22,1,1001,5,2,10.00,20.00,,0,900001\n"
+DATE_RANGE = (np.datetime64('2000-01-01'), np.datetime64('2149-06-07'))
+
+
+def text_chunk(*lines):
+    """Rows as the lenient CSV reader returns them: every field as text."""
+    chunk = pd.read_csv(io.StringIO(SALES_HEADER + "".join(lines)), dtype=str)
+    return chunk.drop(columns='discount_pct')
+
+
+def reasons(chunk, **kwargs):
+    clean, rejects = validation.validate_chunk(chunk, SKUS, STORES, DTYPE_SPEC, **kwargs)
+    return len(clean), ([] if rejects is None else list(rejects['reason']))
+
+
+def test_first_failing_reason_wins():
+    chunk = text_chunk(
+        "2025-03-22,1,1001,,2,10.00,20.00,Store,0,1\n",
+        SALES_HEADER,
+        "2025-03-22,1,1001,,x,10.00,20.00,Store,0,2\n",
+        "2025-13-40,1,1001,,2,10.00,20.00,Store,0,3\n",
+        "2025-03-22,9,1001,,-2,10.00,-20.00,Store,0,4\n",
+        "2025-03-22,1,1002,,-2,4.50,-9.00,Store,0,5\n",
+        "2025-03-22,1,1002,,2,4.50,10.00,Store,0,6\n")
+    assert reasons(chunk) == (1, ['embedded_header', 'unparseable', 'bad_date', 'unknown_id',
+                                  'negative_quantity', 'total_mismatch'])
+    assert reasons(chunk, total_tolerance=None) == (2, validation.REJECT_REASONS[:-1])
+
+
+def test_empty_channel_is_unparseable():
+    clean, rejects = validation.validate_chunk(text_chunk(EMPTY_CHANNEL), SKUS, STORES, DTYPE_SPEC,
+                                               channel_vocab=Vocabulary(), max_channels=256)
+    assert clean.empty
+    assert list(rejects['reason']) == ['unparseable']
+    assert rejects.index.tolist() == [0]
+
+
+def test_channels_past_the_radix_are_unparseable():
+    vocab = Vocabulary(['Online', 'Store'])
+    chunk = text_chunk(*(f"2025-03-22,1,1001,,2,10.00,20.00,{channel},0,{i}\n"
+                         for i, channel in enumerate(['Store', 'Kiosk', 'App', 'Online', 'Phone'])))
+    clean, rejects = validation.validate_chunk(chunk, SKUS, STORES, DTYPE_SPEC, channel_vocab=vocab, max_channels=3)
+    # One code is left: it goes to 'App', the first new channel in sorted order
+    assert list(clean['channel']) == ['Store', 'App', 'Online']
+    assert list(rejects['reason']) == ['unparseable', 'unparseable']
+    assert rejects['channel'].tolist() == ['Kiosk', 'Phone']
+    assert all(code < 3 for code in vocab.encode(clean['channel']))
+
+
+def test_dates_outside_the_key_range_are_bad_date():
+    dates = ['1960-01-05', '1999-12-31', '2000-01-01', '2149-06-06', '2149-06-07', '2199-12-31']
+    chunk = text_chunk(*(f"{date},1,1001,,2,10.00,20.00,Store,0,{i}\n" for i, date in enumerate(dates)))
+    clean, rejects = validation.validate_chunk(chunk, SKUS, STORES, DTYPE_SPEC, date_range=DATE_RANGE)
+    assert clean['transaction_id'].tolist() == [2, 3]
+    assert rejects['date'].tolist() == ['1960-01-05', '1999-12-31', '2149-06-07', '2199-12-31']
+    assert set(rejects['reason']) == {'bad_date'}
+
+    # Typed dates (Parquet and column-store sources) get the same check
+    typed = chunk.assign(date=pd.to_datetime(chunk['date']))
+    assert validation.validate_chunk(typed, SKUS, STORES, DTYPE_SPEC, date_range=DATE_RANGE)[1].index.tolist() == [0, 1, 4, 5]
+
+
+def test_run_quarantines_an_empty_channel(tmp_path):
+    lines = sales_lines(30)
+    data_dir = make_dataset(tmp_path / "data", lines[:10] + [EMPTY_CHANNEL] + lines[10:])
+    process(data_dir, "--full-rebuild")
+    summary, _ = outputs(data_dir)
+    assert summary["rejected_rows"] == 1
+    assert summary["total_orders"] == 30
+    rejects = pd.read_csv(data_dir / "processed" / "quarantine" / validation.REJECTS_FILE)
+    assert rejects[['transaction_id', 'reason']].values.tolist() == [[900001, 'unparseable']]
+
+
+def test_run_quarantines_dates_before_the_base_year(tmp_path):
+    lines = sales_lines(30)
+    old = "1960-01-05,1,1001,1,2,10.00,20.00,Store,0,900002\n"
+    data_dir = make_dataset(tmp_path / "data", [old] + lines)
+    process(data_dir, "--full-rebuild")
+    summary, order_counts = outputs(data_dir)
+    assert summary["rejected_rows"] == 1
+    assert order_counts['year'].min() == 2025
+    rejects = pd.read_csv(data_dir / "processed" / "quarantine" / validation.REJECTS_FILE)
+    assert rejects[['date', 'reason']].values.tolist() == [['1960-01-05', 'bad_date']]